@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The pipeline modules import each other relative to flows/, as they do in the worker
+FLOWS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flows')
+if FLOWS_DIR not in sys.path:
+    sys.path.insert(0, FLOWS_DIR)
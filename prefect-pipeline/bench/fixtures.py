@@ -0,0 +1,183 @@
+"""
+Deterministic synthetic fixtures shaped like the pages and payloads the pipeline consumes:
+IMDb listing and review pages (both review layouts) and TMDB JSON.
+Recorded pages in bench/fixtures/recorded/ (see record_fixtures.py) are used instead when present.
+"""
+from datetime import date, timedelta
+import argparse
+import json
+import os
+import random
+from bench import FLOWS_DIR  # noqa: F401  (puts flows/ on sys.path)
+from movie_crawling.utils import review_hash
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+RECORDED_DIR = os.path.join(FIXTURES_DIR, 'recorded')
+
+WORDS = ("movie film story acting plot great good bad boring amazing director scene character "
+         "script music visual ending performance cast slow fun dark beautiful terrible brilliant").split()
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def _human_count(n):
+    if n >= 1000000:
+        return f"{n / 1000000:.1f}M"
+    if n >= 1000:
+        return f"{n / 1000:.1f}K"
+    return str(n)
+
+def imdb_id(i):
+    return f"tt{1000000 + i}"
+
+def listing_html(num_movies, total_movies=None, seed=0):
+    """IMDb advanced search page with num_movies items."""
+    rng = random.Random(seed)
+    total_movies = total_movies if total_movies is not None else num_movies
+    items = ''.join(
+        f'<li class="ipc-metadata-list-summary-item"><div><a class="ipc-title-link-wrapper" href="/title/{imdb_id(i)}/?ref_=sr_t_{i + 1}">'
+        f'<h3 class="ipc-title__text">{i + 1}. {_text(rng, 3)}</h3></a></div></li>'
+        for i in range(num_movies)
+    )
+    return (f'<html><body><div id="__next"><main><div class="sc-total">1 - {min(num_movies, 50)} of {total_movies:,}</div>'
+            f'<ul class="ipc-metadata-list">{items}</ul></main></div></body></html>')
+
+def _review_all(rng, day):
+    up, down = rng.randint(0, 3000), rng.randint(0, 500)
+    return (
+        '<article class="user-review-item"><div>'
+        f'<span class="ipc-rating-star--rating">{rng.randint(1, 10)}</span>'
+        f'<h3 class="ipc-title__text">{_text(rng, 5)}</h3>'
+        f'<div class="ipc-html-content-inner-div">{_text(rng, rng.randint(40, 200))}</div>'
+        f'<ul><li><a data-testid="author-link" href="/user/ur{rng.randint(1, 10 ** 7)}/">user{rng.randint(1, 10 ** 6)}</a></li>'
+        f'<li class="review-date">{day.strftime("%b")} {day.day}, {day.year}</li></ul>'
+        f'<span class="ipc-voting__label__count--up">{_human_count(up)}</span>'
+        f'<span class="ipc-voting__label__count--down">{_human_count(down)}</span>'
+        '</div></article>'
+    )
+
+def _review_load_more(rng, day):
+    total = rng.randint(0, 200)
+    return (
+        '<div class="lister-item mode-detail imdb-user-review"><div class="review-container">'
+        f'<span class="rating-other-user-rating"><span>{rng.randint(1, 10)}</span></span>'
+        f'<a class="title" href="/review/rw{rng.randint(1, 10 ** 7)}/">{_text(rng, 5)}</a>'
+        f'<span class="display-name-link"><a href="/user/ur{rng.randint(1, 10 ** 7)}/">user{rng.randint(1, 10 ** 6)}</a></span>'
+        f'<span class="review-date">{day.day} {day.strftime("%B")} {day.year}</span>'
+        f'<div class="text show-more__control">{_text(rng, rng.randint(40, 200))}</div>'
+        f'<div class="actions text-muted">{rng.randint(0, total)} out of {total} found this helpful.</div>'
+        '</div></div>'
+    )
+
+def reviews_html(num_reviews, layout='all', total_reviews=None, seed=0, newest=date(2024, 11, 29)):
+    """IMDb review page with num_reviews reviews, newest first."""
+    rng = random.Random(seed)
+    total_reviews = total_reviews if total_reviews is not None else num_reviews
+    render = _review_all if layout == 'all' else _review_load_more
+    reviews = ''.join(render(rng, newest - timedelta(days=i // 5)) for i in range(num_reviews))
+    return (f'<html><body><div id="__next"><main><div data-testid="tturv-total-reviews">{total_reviews:,} reviews</div>'
+            f'<section>{reviews}</section></main></div></body></html>')
+
+def load_page(name, fallback):
+    """Use a recorded page if one exists, otherwise the synthetic fallback."""
+    path = os.path.join(RECORDED_DIR, name)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            return file.read()
+    return fallback()
+
+GENRES = [{'id': 28, 'name': 'Action'}, {'id': 35, 'name': 'Comedy'}, {'id': 18, 'name': 'Drama'},
+          {'id': 27, 'name': 'Horror'}, {'id': 10749, 'name': 'Romance'}, {'id': 878, 'name': 'Science Fiction'}]
+
+def tmdb_movie(i, seed=0):
+    rng = random.Random(seed * 1000003 + i)
+    return {
+        'id': 100000 + i, 'imdb_id': imdb_id(i), 'title': _text(rng, 3), 'budget': rng.randint(0, 2 * 10 ** 8),
+        'homepage': '', 'overview': _text(rng, 40), 'popularity': round(rng.uniform(0, 500), 3),
+        'poster_path': f'/poster{i}.jpg', 'release_date': (date(2024, 1, 1) + timedelta(days=i % 366)).isoformat(),
+        'revenue': rng.randint(0, 10 ** 9), 'runtime': rng.randint(70, 180), 'status': 'Released', 'tagline': '',
+        'vote_average': round(rng.uniform(1, 10), 1), 'vote_count': rng.randint(0, 20000),
+        'genres': rng.sample(GENRES, rng.randint(1, 3)),
+    }
+
+def tmdb_person(person_id):
+    rng = random.Random(person_id)
+    return {
+        'id': person_id, 'name': _text(rng, 2), 'gender': rng.randint(0, 3),
+        'birthday': (date(1950, 1, 1) + timedelta(days=rng.randint(0, 20000))).isoformat(), 'deathday': None,
+        'popularity': round(rng.uniform(0, 100), 3), 'place_of_birth': _text(rng, 2), 'known_for_department': 'Acting',
+    }
+
+def tmdb_credits(i, cast_size=10, people_pool=5000):
+    """Credits of a movie; people are drawn from a shared pool so they repeat across movies."""
+    rng = random.Random(i)
+    cast_ids = rng.sample(range(1, people_pool + 1), cast_size)
+    return {
+        'id': 100000 + i,
+        'cast': [{'id': person_id, 'character': _text(rng, 2), 'order': order, 'known_for_department': 'Acting'}
+                 for order, person_id in enumerate(cast_ids)],
+        'crew': [{'id': rng.randint(1, people_pool), 'job': 'Director', 'known_for_department': 'Directing'}],
+    }
+
+def synthetic_crawl(num_movies, reviews_per_movie=20, cast_size=10, seed=0):
+    """Raw collections of a crawl of num_movies movies, shaped as the crawler saves them in Mongo."""
+    rng = random.Random(seed)
+    collections = {'movie_genres': list(GENRES), 'movie_details': [], 'movie_reviews': [],
+                   'movie_actor_credits': [], 'movie_director_credits': [], 'person_details': []}
+    roles = {}
+    for i in range(num_movies):
+        movie = tmdb_movie(i, seed)
+        collections['movie_details'].append(movie)
+        credits = tmdb_credits(i, cast_size)
+        for actor in credits['cast']:
+            collections['movie_actor_credits'].append(dict(actor, movie_tmdb_id=movie['id']))
+            roles.setdefault(actor['id'], set()).add('actor')
+        for director in credits['crew']:
+            collections['movie_director_credits'].append(dict(director, movie_tmdb_id=movie['id']))
+            roles.setdefault(director['id'], set()).add('director')
+        for _ in range(reviews_per_movie):
+            review = {'Review Summary': _text(rng, 5), 'Review': _text(rng, 80), 'Rating': str(rng.randint(1, 10)),
+                      'Author': f'user{rng.randint(1, 10 ** 6)}', 'Date': f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}',
+                      'Helpful': rng.randint(0, 100), 'Not Helpful': rng.randint(0, 20)}
+            # One document per review, as etl.review_store saves them
+            collections['movie_reviews'].append(dict(review, **{'Movie ID': movie['imdb_id'],
+                                                               'review_hash': review_hash(movie['imdb_id'], review)}))
+    # Each person is fetched once per crawl
+    collections['person_details'] = [dict(tmdb_person(person_id), roles=sorted(person_roles))
+                                     for person_id, person_roles in roles.items()]
+    return collections
+
+def write_fixtures(out_dir, num_movies=1000):
+    """Write page and TMDB fixtures to disk for the local servers."""
+    os.makedirs(os.path.join(out_dir, 'imdb'), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'tmdb', 'movie'), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'tmdb', 'person'), exist_ok=True)
+
+    pages = {'listing_small.html': listing_html(50, 50), 'listing_medium.html': listing_html(1000),
+             'reviews_small.html': reviews_html(25), 'reviews_medium.html': reviews_html(1000),
+             'reviews_large.html': reviews_html(10000)}
+    for name, html in pages.items():
+        with open(os.path.join(out_dir, 'imdb', name), 'w', encoding='utf-8') as file:
+            file.write(html)
+
+    with open(os.path.join(out_dir, 'tmdb', 'genres.json'), 'w') as file:
+        json.dump({'genres': GENRES}, file)
+    people = set()
+    for i in range(num_movies):
+        credits = tmdb_credits(i)
+        people.update(member['id'] for member in credits['cast'] + credits['crew'])
+        with open(os.path.join(out_dir, 'tmdb', 'movie', f'{100000 + i}.json'), 'w') as file:
+            json.dump(tmdb_movie(i), file)
+        with open(os.path.join(out_dir, 'tmdb', 'movie', f'{100000 + i}_credits.json'), 'w') as file:
+            json.dump(credits, file)
+    for person_id in people:
+        with open(os.path.join(out_dir, 'tmdb', 'person', f'{person_id}.json'), 'w') as file:
+            json.dump(tmdb_person(person_id), file)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic fixtures to disk.")
+    parser.add_argument('--out', default=os.path.join(FIXTURES_DIR, 'synthetic'))
+    parser.add_argument('--movies', type=int, default=1000)
+    args = parser.parse_args()
+    write_fixtures(args.out, args.movies)
+    print(f"Fixtures written to {args.out}")
@@ -0,0 +1,80 @@
+"""
+Startup cost of the flow modules: imports each module in a fresh interpreter with -X importtime
+and reports its import time and its slowest direct imports.
+
+    python -m bench.import_time [main_flow etl.transform ...] [--top 10] [--json]
+"""
+from bench import FLOWS_DIR
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+
+# main_flow, then the modules its tasks import
+MODULES = ['main_flow', 'etl.fetch_data', 'etl.update_data', 'etl.refresh_data', 'etl.transform', 'etl.parquet_store',
+           'etl.review_features', 'etl.load_data']
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+def import_time(module):
+    """Import module in a fresh interpreter and return its -X importtime entries and the wall time in seconds."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=FLOWS_DIR,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise ImportError(f"{module}: {result.stderr.strip().splitlines()[-1]}")
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append({'name': name, 'depth': len(indent) // 2, 'self_us': int(self_us), 'cumulative_us': int(cumulative_us)})
+    return entries, elapsed
+
+def summarize(module, top=10):
+    """Import time of module and of its direct imports, slowest first."""
+    entries, elapsed = import_time(module)
+    # Children are printed before their parent: the direct imports of module precede it at depth 1
+    end = next(i for i, entry in enumerate(entries) if entry['name'] == module and entry['depth'] == 0)
+    start = max((i for i, entry in enumerate(entries[:end]) if entry['depth'] == 0), default=-1) + 1
+    children = [entry for entry in entries[start:end] if entry['depth'] == 1]
+    return {
+        'module': module,
+        'import_ms': entries[end]['cumulative_us'] / 1000,
+        'interpreter_ms': elapsed * 1000,
+        'slowest_imports': [{'name': entry['name'], 'ms': entry['cumulative_us'] / 1000}
+                            for entry in sorted(children, key=lambda entry: -entry['cumulative_us'])[:top]],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the import time of the flow modules.")
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--top', type=int, default=10, help="Direct imports listed per module")
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    reports = []
+    for module in args.modules:
+        try:
+            reports.append(summarize(module, args.top))
+        except ImportError as e:
+            reports.append({'module': module, 'error': str(e)})
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['module']}: not importable ({report['error']})\n")
+            continue
+        print(f"{report['module']}: {report['import_ms']:.0f} ms import, {report['interpreter_ms']:.0f} ms with interpreter startup")
+        for entry in report['slowest_imports']:
+            print(f"    {entry['ms']:8.1f} ms  {entry['name']}")
+        print()
+
+if __name__ == "__main__":
+    main()
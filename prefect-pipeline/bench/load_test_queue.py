@@ -0,0 +1,116 @@
+"""
+Load test of the distributed crawl: enqueues the movies of a simulated crawl run in the work queue of the
+local benchmark MongoDB (bench/docker-compose.yml), starts local crawl worker processes against the TMDB
+stand-in, and reports how fast they drain the run and whether competing workers processed a job twice
+(exits with 1 if they did).
+
+    python -m bench.load_test_queue --movies 500 --processes 4 --threads 2 --latency-ms 80 --timeout 600
+"""
+from bench import FLOWS_DIR
+from bench import fixtures
+from bench.mock_tmdb import start_server, add_config_arguments, config_from_args
+from etl.crawl_ledger import CrawlLedger
+from etl.work_queue import WorkQueue
+import argparse
+import json
+import os
+import pymongo
+import subprocess
+import sys
+import tempfile
+import time
+import logging
+
+RUN_KEY = 'bench_queue'
+
+def duplicate_processing(db, run_key=RUN_KEY):
+    """
+    Work done more than once by competing workers: every movie and every person of the run must be saved once.
+    Jobs leased again are reported apart, as they are also the retries of failed TMDB requests.
+    """
+    movie_docs = db['movie_details'].count_documents({})
+    person_docs = db['person_details'].count_documents({})
+    unique_movies = len(db['movie_details'].distinct('id'))
+    unique_people = len(db['crawl_people'].distinct('person_id', {'run_key': run_key}))
+    return {
+        'movie_details_docs': movie_docs,
+        'unique_movies': unique_movies,
+        'person_details_docs': person_docs,
+        'unique_people': unique_people,
+        'duplicate_docs': (movie_docs - unique_movies) + (person_docs - len(db['person_details'].distinct('id'))),
+        'jobs_leased_more_than_once': db['crawl_jobs'].count_documents({'run_key': run_key, 'attempts': {'$gt': 1}}),
+    }
+
+def run_load_test(config, processes, threads, tmdb_rate_limit, timeout=600):
+    mongo_uri = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27018')
+    client = pymongo.MongoClient(mongo_uri, serverSelectionTimeoutMS=2000)
+    client.drop_database('movie_bench_queue')
+    db = client['movie_bench_queue']
+    server = start_server(config)
+
+    ledger = CrawlLedger(db, RUN_KEY)
+    ledger.register_movies([{'Movie ID': fixtures.imdb_id(i), 'Title': f'Movie {i}'} for i in range(config.num_movies)])
+    queue = WorkQueue(db)
+    queue.enqueue(RUN_KEY, 'movie', [fixtures.imdb_id(i) for i in range(config.num_movies)])
+
+    # Reviews need Chrome and IMDb: these workers run the TMDB jobs only
+    env = dict(os.environ, MONGO_URI=mongo_uri, MONGODB_DATABASE='movie_bench_queue', TMDB_BASE_URL=server.base_url,
+               TMDB_API_KEY='bench', TMDB_RATE_LIMIT=str(tmdb_rate_limit), RAW_LAKE_DIR=tempfile.mkdtemp(prefix='bench_lake_'),
+               CRAWL_WORKER_POLL_SECONDS='0.2')
+    command = [sys.executable, os.path.join(FLOWS_DIR, 'crawl_worker.py'), '--threads', str(threads),
+               '--kinds', 'movie', 'person', '--run-key', RUN_KEY]
+    # Worker logs are kept to explain a crash
+    log_dir = tempfile.mkdtemp(prefix='bench_workers_')
+    logs = [open(os.path.join(log_dir, f'worker_{i}.log'), 'w') for i in range(processes)]
+    start = time.perf_counter()
+    workers = [subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=log) for log in logs]
+    try:
+        while db['crawl_jobs'].find_one({'run_key': RUN_KEY, 'kind': {'$in': ['movie', 'person']},
+                                         'status': {'$in': ['pending', 'leased']}}, {'_id': 1}):
+            exit_codes = [worker.poll() for worker in workers]
+            if None not in exit_codes:
+                raise RuntimeError(f"Every worker exited before the run was drained (exit codes {exit_codes}, logs in {log_dir}).")
+            if time.perf_counter() - start > timeout:
+                raise TimeoutError(f"The run was not drained after {timeout}s (worker logs in {log_dir}).")
+            time.sleep(0.2)
+        elapsed = time.perf_counter() - start
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+        for log in logs:
+            log.close()
+        server.shutdown()
+
+    jobs_per_worker = {row['_id']: row['count'] for row in db['crawl_jobs'].aggregate([
+        {'$match': {'run_key': RUN_KEY, 'kind': {'$in': ['movie', 'person']}}},
+        {'$group': {'_id': '$lease_owner', 'count': {'$sum': 1}}}])}
+    done = sum(queue.counts(RUN_KEY).get(kind, {}).get('done', 0) for kind in ('movie', 'person'))
+    return {
+        'movies': config.num_movies,
+        'processes': processes,
+        'threads': threads,
+        'total_time_s': round(elapsed, 2),
+        'jobs': queue.counts(RUN_KEY),
+        'jobs_per_s': round(done / elapsed, 1) if elapsed else None,
+        'busiest_worker_jobs': max(jobs_per_worker.values(), default=0),
+        'worker_threads_used': len(jobs_per_worker),
+        'tmdb_requests': server.snapshot()['requests'],
+        'duplicates': duplicate_processing(db),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test local crawl workers on the MongoDB work queue.")
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=2)
+    parser.add_argument('--tmdb-rate-limit', type=float, default=1000, help="TMDB_RATE_LIMIT of the workers")
+    parser.add_argument('--timeout', type=float, default=600, help="Seconds to wait for the workers to drain the run")
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    report = run_load_test(config_from_args(args), args.processes, args.threads, args.tmdb_rate_limit, args.timeout)
+    print(json.dumps(report, indent=2))
+    if report['duplicates']['duplicate_docs']:
+        sys.exit(1)
@@ -0,0 +1,75 @@
+"""
+Load test TMDBApi against the local TMDB stand-in: simulates the TMDB part of a weekly crawl
+(find -> details -> credits -> people) and reports requests/s and total crawl time.
+
+    python -m bench.load_test_tmdb --movies 1000 --workers 8 --rate-limit 40 --latency-ms 80
+"""
+from bench import FLOWS_DIR  # noqa: F401  (puts flows/ on sys.path)
+from bench import fixtures
+from bench.mock_tmdb import start_server, add_config_arguments, config_from_args
+from movie_crawling.tmdb_api import TMDBApi
+from etl.fetch_data import credited_roles
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import time
+import logging
+
+def crawl_movie(tmdb_api, index):
+    """Issue the TMDB calls the crawl makes for one movie, and return the ids of its people."""
+    tmdb_id = tmdb_api.find_tmdb_id_by_imdb_id(fixtures.imdb_id(index))
+    if not tmdb_id:
+        return None
+    tmdb_api.get_movie_details(tmdb_id)
+    credits = tmdb_api.get_cast_and_crew(tmdb_id)
+    return set(credited_roles(credits))
+
+def run_load_test(config, workers):
+    server = start_server(config)
+    tmdb_api = TMDBApi(api_key='bench', base_url=server.base_url)
+
+    def safe_crawl(index):
+        try:
+            return crawl_movie(tmdb_api, index)
+        except Exception as e:
+            logging.debug(f"Movie {index} failed: {e}")
+            return None
+
+    def safe_fetch_person(person_id):
+        try:
+            tmdb_api.get_person_details(person_id)
+        except Exception as e:
+            logging.debug(f"Person {person_id} failed: {e}")
+
+    start = time.perf_counter()
+    tmdb_api.get_movie_genres()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(safe_crawl, range(config.num_movies)))
+        # As the crawl does: each person once, after all movies
+        people = set().union(*(person_ids for person_ids in results if person_ids is not None))
+        list(executor.map(safe_fetch_person, people))
+    elapsed = time.perf_counter() - start
+
+    stats = server.snapshot()
+    server.shutdown()
+    return {
+        'movies': config.num_movies,
+        'workers': workers,
+        'movies_ok': sum(person_ids is not None for person_ids in results),
+        'movies_failed': sum(person_ids is None for person_ids in results),
+        'people': len(people),
+        'total_time_s': round(elapsed, 2),
+        'requests': stats['requests'],
+        'requests_per_s': round(stats['requests'] / elapsed, 1) if elapsed else None,
+        'status': stats['status'],
+        'endpoints': stats['endpoints'],
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test TMDBApi against the local TMDB stand-in.")
+    parser.add_argument('--workers', type=int, default=8)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # The retries of TMDBApi are counted by the server instead
+    print(json.dumps(run_load_test(config_from_args(args), args.workers), indent=2))
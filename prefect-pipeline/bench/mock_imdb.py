@@ -0,0 +1,81 @@
+"""
+Local stand-in for the IMDb review pages, serving /title/{id}/reviews/ from fixtures with configurable latency.
+Each movie shows its first --page-size reviews and a review count that grows by --growth per request.
+
+    python -m bench.mock_imdb --port 8766 --movies 100 --latency-ms 300
+    IMDB_BASE_URL=http://127.0.0.1:8766
+"""
+from bench.fixtures import reviews_html
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import re
+import threading
+import time
+
+REVIEWS_PATH_RE = re.compile(r'^/title/(tt\d+)/reviews/?(\?.*)?$')
+
+class MockIMDbServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, num_movies=100, total_reviews=1000, page_size=25, latency_ms=0.0, growth=0):
+        super().__init__(address, MockIMDbHandler)
+        self.totals = {f'tt{i:07d}': total_reviews for i in range(num_movies)}
+        self.page_size = page_size
+        self.latency_ms = latency_ms
+        self.growth = growth  # New reviews per request, to simulate active movies
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_total(self, imdb_id):
+        with self.lock:
+            self.requests += 1
+            total = self.totals[imdb_id]
+            self.totals[imdb_id] += self.growth
+        return total
+
+class MockIMDbHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.server.latency_ms / 1000)
+        match = REVIEWS_PATH_RE.match(self.path)
+        if not match or match.group(1) not in self.server.totals:
+            self.send_error(404)
+            return
+        total = self.server.next_total(match.group(1))
+        body = reviews_html(min(total, self.server.page_size), total_reviews=total).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_server(host='127.0.0.1', port=0, **config):
+    """Start the mock server on a background thread and return it (port 0 picks a free port)."""
+    server = MockIMDbServer((host, port), **config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local IMDb review page stand-in server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--movies', type=int, default=100)
+    parser.add_argument('--total-reviews', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--growth', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockIMDbServer((args.host, args.port), num_movies=args.movies, total_reviews=args.total_reviews,
+                            latency_ms=args.latency_ms, growth=args.growth)
+    print(f"Mock IMDb listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
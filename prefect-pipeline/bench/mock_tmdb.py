@@ -0,0 +1,213 @@
+"""
+Local stand-in for the TMDB API, serving /find, /movie/{id}, /movie/{id}/credits, /person/{id},
+/genre/movie/list and /movie|person/changes from fixtures, with configurable latency, errors and rate limiting.
+Details responses carry an ETag and answer If-None-Match with 304.
+
+    python -m bench.mock_tmdb --port 8765 --latency-ms 80 --rate-limit 40 --error-rate 0.01
+    TMDB_BASE_URL=http://127.0.0.1:8765/3
+"""
+from bench import fixtures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+
+class MockTMDBConfig:
+    def __init__(self, num_movies=1000, latency_ms=50.0, jitter_ms=20.0, error_rate=0.0, rate_429=0.0,
+                 rate_limit=None, retry_after=1, fixtures_dir=None, seed=0):
+        self.num_movies = num_movies
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate      # Share of requests answered with a random 5xx
+        self.rate_429 = rate_429          # Share of requests answered with 429, regardless of load
+        self.rate_limit = rate_limit      # Requests per second before 429s are sent (None = unlimited)
+        self.retry_after = retry_after    # Retry-After seconds of the random 429s
+        self.fixtures_dir = fixtures_dir  # Directory written by fixtures.write_fixtures, else generated on the fly
+        self.seed = seed
+        self.changed_share = 0.05         # Share of the movies and people listed by /changes
+
+class MockTMDBServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, MockTMDBHandler)
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.tokens = float(config.rate_limit or 0)
+        self.last_refill = time.monotonic()
+        self.stats = {'requests': 0, 'status': {}, 'endpoints': {}}
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/3"
+
+    def take_token(self):
+        """Token bucket of the simulated rate limit. Returns seconds to wait, 0 if the request may pass."""
+        if not self.config.rate_limit:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.config.rate_limit, self.tokens + (now - self.last_refill) * self.config.rate_limit)
+            self.last_refill = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.config.rate_limit
+
+    def record(self, endpoint, status):
+        with self.lock:
+            self.stats['requests'] += 1
+            self.stats['status'][str(status)] = self.stats['status'].get(str(status), 0) + 1
+            self.stats['endpoints'][endpoint] = self.stats['endpoints'].get(endpoint, 0) + 1
+
+    def snapshot(self):
+        with self.lock:
+            return json.loads(json.dumps(self.stats))
+
+class MockTMDBHandler(BaseHTTPRequestHandler):
+    ROUTES = [
+        ('changes', re.compile(r'^/3/(movie|person)/changes$')),
+        ('find', re.compile(r'^/3/find/(tt\d+)$')),
+        ('movie_credits', re.compile(r'^/3/movie/(\d+)/credits$')),
+        ('movie', re.compile(r'^/3/movie/(\d+)$')),
+        ('person', re.compile(r'^/3/person/(\d+)$')),
+        ('genres', re.compile(r'^/3/genre/movie/list$')),
+    ]
+
+    def log_message(self, format, *args):
+        pass  # Keep load tests quiet
+
+    def _send(self, endpoint, status, body=None, headers=None):
+        self.server.record(endpoint, status)
+        payload = json.dumps(body if body is not None else {'status_message': 'error'}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _fixture(self, *parts):
+        if not self.server.config.fixtures_dir:
+            return None
+        path = os.path.join(self.server.config.fixtures_dir, 'tmdb', *parts)
+        if os.path.exists(path):
+            with open(path) as file:
+                return json.load(file)
+        return None
+
+    def _changes(self, kind, page):
+        """A deterministic sample of the ids, 100 per page like TMDB."""
+        config = self.server.config
+        if kind == 'movie':
+            ids = [100000 + i for i in range(config.num_movies)]
+        else:
+            ids = list(range(1, 5001))  # People pool of fixtures.tmdb_credits
+        changed = [item_id for item_id in ids if random.Random(item_id).random() < config.changed_share]
+        total_pages = max(1, math.ceil(len(changed) / 100))
+        return {'results': [{'id': item_id, 'adult': False} for item_id in changed[(page - 1) * 100:page * 100]],
+                'page': page, 'total_pages': total_pages, 'total_results': len(changed)}
+
+    def _resolve(self, endpoint, key):
+        config = self.server.config
+        if endpoint == 'changes':
+            return self._changes(key, int(parse_qs(urlparse(self.path).query).get('page', ['1'])[0]))
+        if endpoint == 'genres':
+            return self._fixture('genres.json') or {'genres': fixtures.GENRES}
+        if endpoint == 'find':
+            index = int(key[2:]) - 1000000
+            return {'movie_results': [{'id': 100000 + index}] if 0 <= index < config.num_movies else []}
+
+        index = int(key) - 100000
+        if endpoint == 'movie':
+            return self._fixture('movie', f'{key}.json') or (fixtures.tmdb_movie(index) if 0 <= index < config.num_movies else None)
+        if endpoint == 'movie_credits':
+            return self._fixture('movie', f'{key}_credits.json') or (fixtures.tmdb_credits(index) if 0 <= index < config.num_movies else None)
+        if endpoint == 'person':
+            return self._fixture('person', f'{key}.json') or fixtures.tmdb_person(int(key))
+        return None
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/__stats':
+            return self._send('stats', 200, self.server.snapshot())
+
+        config = self.server.config
+        time.sleep(max(0.0, self.server.random.gauss(config.latency_ms, config.jitter_ms)) / 1000)
+
+        for endpoint, pattern in self.ROUTES:
+            match = pattern.match(path)
+            if match:
+                break
+        else:
+            return self._send('unknown', 404, {'status_code': 34, 'status_message': 'The resource you requested could not be found.'})
+
+        wait = self.server.take_token()
+        if wait:
+            return self._send(endpoint, 429, {'status_code': 25, 'status_message': 'Request count over limit.'},
+                              {'Retry-After': str(max(1, math.ceil(wait)))})
+        if self.server.random.random() < config.rate_429:
+            return self._send(endpoint, 429, {'status_code': 25}, {'Retry-After': str(config.retry_after)})
+        if self.server.random.random() < config.error_rate:
+            return self._send(endpoint, self.server.random.choice([500, 502, 503, 504]))
+
+        body = self._resolve(endpoint, match.group(1) if match.groups() else None)
+        if body is None:
+            return self._send(endpoint, 404, {'status_code': 34, 'status_message': 'The resource you requested could not be found.'})
+        if endpoint in ('movie', 'person'):
+            etag = '"%s"' % hashlib.md5(json.dumps(body, sort_keys=True).encode()).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                return self._send_not_modified(endpoint, etag)
+            return self._send(endpoint, 200, body, {'ETag': etag})
+        self._send(endpoint, 200, body)
+
+    def _send_not_modified(self, endpoint, etag):
+        self.server.record(endpoint, 304)
+        self.send_response(304)
+        self.send_header('ETag', etag)
+        self.end_headers()
+
+def start_server(config, host='127.0.0.1', port=0):
+    """Start the mock server on a background thread and return it (port 0 picks a free port)."""
+    server = MockTMDBServer((host, port), config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_config_arguments(parser):
+    parser.add_argument('--movies', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=20.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, default=None, help="Requests per second before 429s")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--fixtures', default=None, help="Directory written by bench.fixtures")
+
+def config_from_args(args):
+    return MockTMDBConfig(num_movies=args.movies, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                          error_rate=args.error_rate, rate_429=args.rate_429, rate_limit=args.rate_limit,
+                          retry_after=args.retry_after, fixtures_dir=args.fixtures)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local TMDB stand-in server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockTMDBServer((args.host, args.port), config_from_args(args))
+    print(f"Mock TMDB listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
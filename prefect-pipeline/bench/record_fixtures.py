@@ -0,0 +1,60 @@
+"""Record live IMDb pages and TMDB payloads once, so benchmarks can replay them offline."""
+from bench import FLOWS_DIR  # noqa: F401  (puts flows/ on sys.path)
+from bench.fixtures import RECORDED_DIR
+from movie_crawling.crawl_reviews import MovieReviewScraper
+from movie_crawling.review_probe import review_url
+from movie_crawling.crawl_movies import MoviesScraper
+from movie_crawling.tmdb_api import TMDBApi
+from dotenv import load_dotenv
+import argparse
+import json
+import os
+
+def record_listing(release_date_from, release_date_to, name):
+    scraper = MoviesScraper(release_date_from, release_date_to)
+    try:
+        scraper.ensure_driver()
+        scraper.driver.get(scraper.url)
+        with open(os.path.join(RECORDED_DIR, name), 'w', encoding='utf-8') as file:
+            file.write(scraper.driver.page_source)
+    finally:
+        scraper.close_driver()
+
+def record_reviews(imdb_id, name):
+    scraper = MovieReviewScraper(movie_id=imdb_id)
+    try:
+        scraper.ensure_driver()
+        scraper.driver.get(review_url(imdb_id))
+        scraper._load_reviews(scraper._get_total_reviews())
+        with open(os.path.join(RECORDED_DIR, name), 'w', encoding='utf-8') as file:
+            file.write(scraper.driver.page_source)
+    finally:
+        scraper.close_driver()
+
+def record_tmdb(imdb_id):
+    tmdb_api = TMDBApi(api_key=os.getenv('TMDB_API_KEY'))
+    tmdb_id = tmdb_api.find_tmdb_id_by_imdb_id(imdb_id)
+    credits = tmdb_api.get_cast_and_crew(tmdb_id)
+    payloads = {
+        'movie': tmdb_api.get_movie_details(tmdb_id),
+        'credits': credits,
+        'people': [tmdb_api.get_person_details(member['id']) for member in credits.get('cast', [])[:10]],
+    }
+    with open(os.path.join(RECORDED_DIR, f'tmdb_{imdb_id}.json'), 'w') as file:
+        json.dump(payloads, file)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record live fixtures for the benchmark suite.")
+    parser.add_argument('--listing', nargs=2, metavar=('FROM', 'TO'), default=['2024-01-01', '2024-01-07'])
+    parser.add_argument('--small', default='tt0000001', help="IMDb id of a title with a few reviews")
+    parser.add_argument('--medium', default='tt15239678', help="IMDb id of a title with ~1k reviews")
+    parser.add_argument('--large', default='tt0111161', help="IMDb id of a title with ~10k reviews")
+    args = parser.parse_args()
+
+    load_dotenv()
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+    record_listing(args.listing[0], args.listing[1], 'listing_small.html')
+    for size, imdb_id in (('small', args.small), ('medium', args.medium), ('large', args.large)):
+        record_reviews(imdb_id, f'reviews_{size}.html')
+        record_tmdb(imdb_id)
+    print(f"Recorded fixtures in {RECORDED_DIR}")
@@ -0,0 +1,378 @@
+"""
+Offline benchmarks of the pipeline stages at several data sizes.
+
+    python -m bench.run_bench [--quick] [--only reviews] [--save-baseline]
+
+Results are written to bench/results/ and compared against bench/results/baseline.json.
+Mongo/Postgres stages use the local databases of bench/docker-compose.yml and are skipped if unreachable.
+"""
+from bench import FLOWS_DIR  # Also puts flows/ on sys.path
+from bench.fixtures import listing_html, reviews_html, load_page, synthetic_crawl
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import atexit
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+BASELINE_PATH = os.path.join(RESULTS_DIR, 'baseline.json')
+
+REVIEW_SIZES = {'small': 25, 'medium': 1000, 'large': 10000}
+LISTING_SIZES = {'small': 50, 'medium': 1000, 'large': 10000}
+CRAWL_SIZES = {'small': 10, 'medium': 100, 'large': 1000}
+BROWSER_SIZES = {'small': 25, 'medium': 200, 'large': 1000}
+STARTUP_SIZES = {'small': 1}
+ASSET_LATENCY_S = 0.02
+
+BENCHMARKS = {}
+
+def benchmark(group, name):
+    """Register a benchmark: a function of the size that returns (setup, run) callables."""
+    def register(func):
+        BENCHMARKS[f'{group}.{name}'] = func
+        return func
+    return register
+
+def measure(setup, run, repeat):
+    """Run setup (untimed) then run (timed) repeat times and return the timings in seconds."""
+    timings = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+# --- Scraper parsing -------------------------------------------------------
+
+def _review_page(label, size, layout):
+    name = f'reviews_{label}.html' if layout == 'all' else f'reviews_{label}_load_more.html'
+    return load_page(name, lambda: reviews_html(size, layout))
+
+def _review_scraper():
+    from movie_crawling.crawl_reviews import MovieReviewScraper
+    return MovieReviewScraper(movie_id='tt_bench')
+
+@benchmark('reviews', 'extract_reviews')
+def bench_extract_reviews(label, size, layout='all'):
+    from bs4 import BeautifulSoup
+    html = _review_page(label, size, layout)
+
+    def run(scraper):
+        soup = BeautifulSoup(html, 'html.parser')
+        scraper._extract_reviews(soup, 'tt_bench', None, size)
+    return _review_scraper, run, size
+
+@benchmark('reviews', 'extract_reviews_load_more')
+def bench_extract_reviews_load_more(label, size):
+    return bench_extract_reviews(label, size, layout='load_more')
+
+@benchmark('reviews', 'parse_review')
+def bench_parse_review(label, size):
+    from bs4 import BeautifulSoup
+    articles = BeautifulSoup(_review_page(label, size, 'all'), 'html.parser').select('article.user-review-item')
+    scraper = _review_scraper()
+
+    def run(_):
+        for article in articles:
+            scraper._parse_review(article, 'all')
+    return lambda: None, run, len(articles)
+
+@benchmark('reviews', 'review_documents')
+def bench_review_documents(label, size):
+    """Write-time conversion of the scraped ReviewRecords into Mongo documents."""
+    from etl.review_store import review_documents
+    from movie_crawling.review_parser import parse_review_chunk
+    movie_info = {'Movie ID': 'tt_bench', 'Reviews': parse_review_chunk([_review_page(label, size, 'all')])}
+    return lambda: None, lambda _: review_documents(movie_info), len(movie_info['Reviews'])
+
+@benchmark('reviews', 'submit_to_parse_pool')
+def bench_submit_to_parse_pool(label, size):
+    """Time the browser thread spends handing the reviews to the parse pool (the parsing itself overlaps)."""
+    from bs4 import BeautifulSoup
+    from concurrent.futures import wait
+    from movie_crawling.parse_pool import PARSE_CHUNK_SIZE, submit_parse
+    articles = [str(article) for article in BeautifulSoup(_review_page(label, size, 'all'), 'html.parser').select('article.user-review-item')]
+    submit_parse(articles[:1]).result()  # Start the workers outside of the timings
+    futures = []
+
+    def run(_):
+        futures.extend(submit_parse(articles[start:start + PARSE_CHUNK_SIZE]) for start in range(0, len(articles), PARSE_CHUNK_SIZE))
+    atexit.register(lambda: wait(futures))
+    return lambda: None, run, len(articles)
+
+@benchmark('movies', 'extract_movie_data')
+def bench_extract_movie_data(label, size):
+    from bs4 import BeautifulSoup
+    from movie_crawling.crawl_movies import MoviesScraper
+    html = load_page(f'listing_{label}.html', lambda: listing_html(size))
+
+    def run(scraper):
+        scraper.extract_movie_data(BeautifulSoup(html, 'html.parser'), None)
+    return lambda: MoviesScraper('2024-01-01', '2024-01-07'), run, size
+
+@benchmark('probe', 'probe_review_count')
+def bench_probe_review_count(label, size):
+    """Review counts of size movies over plain HTTP from a local IMDb stand-in (what a refresh costs without a browser)."""
+    from bench.mock_imdb import start_server
+    from movie_crawling.review_probe import probe_review_count
+    server = start_server(num_movies=size)
+    atexit.register(server.shutdown)
+    imdb_ids = list(server.totals)
+
+    def run(_):
+        for imdb_id in imdb_ids:
+            probe_review_count(imdb_id, ttl=0, base_url=server.base_url)
+    return lambda: None, run, size
+
+# --- Browser ---------------------------------------------------------------
+
+def _page_with_assets(html, num_images):
+    """Add the images, fonts and third-party tags of a real IMDb page to a fixture page."""
+    images = ''.join(f'<img src="/img/{i}.jpg" width="100" height="150">' for i in range(num_images))
+    head = ('<link rel="preload" href="/font/ibm-plex-sans.woff2" as="font" crossorigin>'
+            '<script async src="/tag/googletagmanager.com/gtm.js"></script>')
+    return html.replace('<html><body>', f'<html><head>{head}</head><body>{images}', 1)
+
+class _PageHandler(BaseHTTPRequestHandler):
+    """Serve the page at / and every asset with some latency, like a CDN would."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == '/':
+            body, content_type = self.server.page, 'text/html; charset=utf-8'
+        else:
+            time.sleep(ASSET_LATENCY_S)
+            body, content_type = b'\0' * 20000, 'application/octet-stream'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def _bench_page_load(label, size, lean):
+    from movie_crawling.base_scraper import BaseScraper
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _PageHandler)
+    server.daemon_threads = True
+    server.page = _page_with_assets(_review_page(label, size, 'all'), size).encode('utf-8')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    atexit.register(server.shutdown)
+
+    os.environ['LEAN_BROWSER'] = '1' if lean else '0'
+    scraper = BaseScraper(start_driver=False)
+    driver = scraper.ensure_driver()  # Raises (and the benchmark is skipped) without Chrome
+    atexit.register(scraper.close_driver)
+    url = f'http://127.0.0.1:{server.server_address[1]}/'
+    return lambda: None, lambda _: driver.get(url), size
+
+@benchmark('browser', 'page_load_default')
+def bench_page_load_default(label, size):
+    return _bench_page_load(label, size, lean=False)
+
+@benchmark('browser', 'page_load_lean')
+def bench_page_load_lean(label, size):
+    return _bench_page_load(label, size, lean=True)
+
+# --- Transform -------------------------------------------------------------
+
+def _bench_mongo_db():
+    import pymongo
+    os.environ['MONGO_URI'] = os.getenv('BENCH_MONGO_URI', 'mongodb://localhost:27018')
+    os.environ['MONGODB_DATABASE'] = 'movie_bench'
+    client = pymongo.MongoClient(os.environ['MONGO_URI'], serverSelectionTimeoutMS=1000)
+    client.admin.command('ping')
+    return client['movie_bench']
+
+def _seed_mongo(db, collections):
+    for name in db.list_collection_names():
+        db[name].drop()
+    for name, documents in collections.items():
+        if documents:
+            db[name].insert_many([dict(document) for document in documents])
+
+@benchmark('transform', 'process_all_collections')
+def bench_process_all_collections(label, size, pushdown=False):
+    from etl.transform import MongoDataExtractor
+    db = _bench_mongo_db()
+    collections = synthetic_crawl(size)
+
+    def setup():
+        _seed_mongo(db, collections)
+        return MongoDataExtractor(pushdown=pushdown)
+    return setup, lambda extractor: extractor.process_all_collections(), sum(len(docs) for docs in collections.values())
+
+@benchmark('transform', 'process_all_collections_pushdown')
+def bench_process_all_collections_pushdown(label, size):
+    return bench_process_all_collections(label, size, pushdown=True)
+
+@benchmark('transform', 'process_all_collections_replay')
+def bench_process_all_collections_replay(label, size):
+    from etl.raw_lake import append_raw
+    from etl.transform import MongoDataExtractor
+    os.environ['RAW_LAKE_DIR'] = tempfile.mkdtemp(prefix='bench_lake_')
+    collections = synthetic_crawl(size)
+    for name, documents in collections.items():
+        append_raw(name, documents)
+
+    def run(extractor):
+        extractor.process_all_collections()
+    return lambda: MongoDataExtractor(replay=True), run, sum(len(docs) for docs in collections.values())
+
+# --- Review features -------------------------------------------------------
+
+@benchmark('features', 'score_texts')
+def bench_score_texts(label, size):
+    from etl.review_features import score_texts
+    texts = [review['Review'] for review in synthetic_crawl(1, reviews_per_movie=size)['movie_reviews']]
+    return lambda: None, lambda _: score_texts(texts), size
+
+# --- Load ------------------------------------------------------------------
+
+def _bench_postgres():
+    os.environ['POSTGRES_DB'] = os.getenv('BENCH_POSTGRES_DB', 'movie_bench')
+    os.environ['POSTGRES_USER'] = os.getenv('BENCH_POSTGRES_USER', 'bench')
+    os.environ['POSTGRES_PASSWORD'] = os.getenv('BENCH_POSTGRES_PASSWORD', 'bench')
+    os.environ['POSTGRES_HOST'] = os.getenv('BENCH_POSTGRES_HOST', 'localhost')
+    os.environ['POSTGRES_PORT'] = os.getenv('BENCH_POSTGRES_PORT', '5433')
+    from etl.load_data import create_connection
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Benchmark PostgreSQL is not reachable.")
+    conn.close()
+
+def _transformed_tables(size):
+    from etl.raw_lake import append_raw
+    from etl.transform import MongoDataExtractor
+    os.environ['RAW_LAKE_DIR'] = tempfile.mkdtemp(prefix='bench_lake_')
+    for name, documents in synthetic_crawl(size, reviews_per_movie=50).items():
+        append_raw(name, documents)
+    return MongoDataExtractor(replay=True).process_all_collections()
+
+@benchmark('load', 'load_data_to_postgres')
+def bench_load_data_to_postgres(label, size):
+    from etl.load_data import load_data_to_postgres, truncate_tables, TABLE_QUERIES
+    _bench_postgres()
+    tables = _transformed_tables(size)
+
+    def setup():
+        truncate_tables(list(TABLE_QUERIES))
+        for table_name in ('genre', 'movie'):
+            load_data_to_postgres(tables[table_name], table_name)
+
+    def run(_):
+        for table_name in ('movie_genre', 'actor', 'director', 'movie_cast', 'movie_direction', 'review'):
+            load_data_to_postgres(tables[table_name], table_name)
+    return setup, run, sum(len(tables[name]) for name in tables if name not in ('genre', 'movie'))
+
+# --- Worker startup --------------------------------------------------------
+
+def _bench_import(modules):
+    from bench.import_time import import_time
+    for module in modules:
+        import_time(module)  # Raises (and the benchmark is skipped) when a module is not importable here
+    command = [sys.executable, '-c', ''.join(f'import {module}; ' for module in modules)]
+    return lambda: None, lambda _: subprocess.run(command, cwd=FLOWS_DIR, check=True), len(modules)
+
+@benchmark('startup', 'import_main_flow')
+def bench_import_main_flow(label, size):
+    # What every flow run process pays before its first task
+    return _bench_import(['main_flow'])
+
+@benchmark('startup', 'import_etl_modules')
+def bench_import_etl_modules(label, size):
+    # What the tasks of a flow run import
+    from bench.import_time import MODULES
+    return _bench_import([module for module in MODULES if module != 'main_flow'])
+
+# --- Runner ----------------------------------------------------------------
+
+SIZES = {'reviews': REVIEW_SIZES, 'probe': CRAWL_SIZES, 'movies': LISTING_SIZES, 'browser': BROWSER_SIZES, 'transform': CRAWL_SIZES,
+         'features': REVIEW_SIZES, 'load': CRAWL_SIZES, 'startup': STARTUP_SIZES}
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+def run_benchmarks(only=None, quick=False, repeat=3):
+    results = []
+    for name, factory in BENCHMARKS.items():
+        group = name.split('.')[0]
+        if only and group not in only and name not in only:
+            continue
+        for label, size in SIZES[group].items():
+            if quick and label == 'large':
+                continue
+            try:
+                setup, run, items = factory(label, size)
+            except Exception as e:
+                print(f"SKIP {name} [{label}]: {str(e).splitlines()[0][:120]}")
+                break
+            timings = measure(setup, run, repeat)
+            median = statistics.median(timings)
+            results.append({'benchmark': name, 'size': label, 'items': items, 'repeat': repeat,
+                            'median_s': median, 'min_s': min(timings),
+                            'per_item_us': median / items * 1e6 if items else None})
+            print(f"{name:<45} {label:<7} {items:>8} items  median {median * 1000:10.1f} ms")
+    return results
+
+def compare(results, baseline, threshold):
+    """Return the benchmarks slower than threshold x their baseline median."""
+    previous = {(entry['benchmark'], entry['size']): entry['median_s'] for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        before = previous.get((entry['benchmark'], entry['size']))
+        if before and entry['median_s'] > before * threshold:
+            regressions.append((entry['benchmark'], entry['size'], before, entry['median_s']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline pipeline benchmarks.")
+    parser.add_argument('--only', nargs='*', help="Groups or benchmark names to run (e.g. reviews transform.process_all_collections)")
+    parser.add_argument('--quick', action='store_true', help="Skip the large sizes")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown factor reported as a regression")
+    parser.add_argument('--save-baseline', action='store_true')
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)  # Keep the scrapers' per-item logs out of the timings
+    results_dir = os.path.abspath(RESULTS_DIR)
+    os.chdir(tempfile.mkdtemp(prefix='bench_'))  # Scrapers write their logs relative to the cwd
+
+    results = run_benchmarks(args.only, args.quick, args.repeat)
+    report = {'timestamp': datetime.now(timezone.utc).isoformat(), 'revision': git_revision(),
+              'python': sys.version.split()[0], 'results': results}
+
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"results-{datetime.now().strftime('%Y%m%dT%H%M%S')}.json")
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {path}")
+
+    baseline_path = os.path.join(results_dir, os.path.basename(BASELINE_PATH))
+    if args.save_baseline:
+        with open(baseline_path, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    elif os.path.exists(baseline_path):
+        with open(baseline_path) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for name, size, before, after in regressions:
+            print(f"REGRESSION {name} [{size}]: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+import threading
+import time
+
+class CacheEntry:
+    __slots__ = ('value', 'expires_at', 'movie_ids', 'actor_ids', 'scope')
+
+    def __init__(self, value, expires_at, movie_ids, actor_ids, scope):
+        self.value = value
+        self.expires_at = expires_at
+        self.movie_ids = movie_ids  # Movies the result was computed from
+        self.actor_ids = actor_ids  # Actors the result was computed from
+        self.scope = scope          # Predicate on a changed movie: could it enter the result?
+
+class QueryCache:
+    """
+    LRU cache of query results with a TTL, invalidated by the movies and actors each result depends on.
+    Thread-safe; values must not be mutated by readers.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidated': 0, 'evicted': 0}
+        self.generation = 0  # Bumped by every invalidation
+
+    def get(self, key):
+        """Cached value of key, or None if missing or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry.value
+
+    def put(self, key, value, movie_ids=(), actor_ids=(), scope=None, generation=None):
+        """
+        Cache a result. generation is self.generation read before computing it: if an invalidation
+        ran in between, the result may predate the change and is not cached.
+        """
+        entry = CacheEntry(value, time.monotonic() + self.ttl, frozenset(movie_ids), frozenset(actor_ids), scope)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.stats['evicted'] += 1
+
+    def invalidate(self, movies=(), movie_ids=(), actor_ids=()):
+        """
+        Drop the results that depend on the changed movies or actors. movies are the current attributes of
+        the changed movies ({'movie_id', 'release_date', 'genre_ids', 'actor_ids'}), matched against the scopes.
+        Returns the number of results dropped.
+        """
+        movie_ids, actor_ids = set(movie_ids), set(actor_ids)
+        with self.lock:
+            stale = [key for key, entry in self.entries.items()
+                     if not entry.movie_ids.isdisjoint(movie_ids) or not entry.actor_ids.isdisjoint(actor_ids)
+                     or (entry.scope is not None and any(entry.scope(movie) for movie in movies))]
+            for key in stale:
+                del self.entries[key]
+            self.stats['invalidated'] += len(stale)
+            self.generation += 1
+        return len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.stats['invalidated'] += len(self.entries)
+            self.entries.clear()
+            self.generation += 1
+
+    def snapshot(self):
+        with self.lock:
+            return dict(self.stats, size=len(self.entries), maxsize=self.maxsize, ttl=self.ttl)
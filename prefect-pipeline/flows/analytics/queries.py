@@ -0,0 +1,103 @@
+from psycopg2.extras import RealDictCursor
+
+# Each query returns (result, movie_ids, actor_ids, scope): the movies and actors the result was computed
+# from, and a predicate telling whether a changed movie (see CHANGED_MOVIES_QUERY) could now be part of it.
+
+TOP_MOVIES_QUERY = """
+WITH top AS (
+    SELECT movie_id, title, release_date, vote_average, vote_count, popularity
+    FROM movie
+    WHERE release_date BETWEEN %(date_from)s AND %(date_to)s AND vote_count >= %(min_votes)s
+    ORDER BY vote_average DESC NULLS LAST, vote_count DESC
+    LIMIT %(limit)s
+)
+SELECT top.*, reviews.review_rating, reviews.review_count
+FROM top
+LEFT JOIN LATERAL (
+    SELECT AVG(rating) AS review_rating, COUNT(*) AS review_count FROM review WHERE review.movie_id = top.movie_id
+) reviews ON TRUE
+ORDER BY top.vote_average DESC NULLS LAST, top.vote_count DESC;
+"""
+
+ACTOR_FILMOGRAPHY_QUERY = """
+SELECT a.actor_id, a.name, m.movie_id, m.title, m.release_date, mc.character, m.vote_average, m.revenue,
+       (SELECT AVG(sentiment_score) FROM review_features rf WHERE rf.movie_id = m.movie_id) AS review_sentiment
+FROM actor a
+LEFT JOIN movie_cast mc ON mc.actor_id = a.actor_id
+LEFT JOIN movie m ON m.movie_id = mc.movie_id
+WHERE a.actor_id = %(actor_id)s
+ORDER BY m.release_date NULLS LAST, m.movie_id;
+"""
+
+GENRE_TRENDS_QUERY = """
+SELECT g.genre_id, g.name, EXTRACT(YEAR FROM m.release_date)::INTEGER AS year, COUNT(*) AS movies,
+       AVG(m.vote_average) AS avg_vote, AVG(m.popularity) AS avg_popularity, SUM(m.revenue) AS revenue,
+       ARRAY_AGG(m.movie_id) AS movie_ids
+FROM movie_genre mg
+JOIN genre g ON g.genre_id = mg.genre_id
+JOIN movie m ON m.movie_id = mg.movie_id
+WHERE m.release_date BETWEEN %(date_from)s AND %(date_to)s
+  AND (%(genre_id)s::INTEGER IS NULL OR g.genre_id = %(genre_id)s::INTEGER)
+GROUP BY g.genre_id, g.name, year
+ORDER BY g.name, year;
+"""
+
+# Current attributes of changed movies, matched against the scopes of the cached results
+CHANGED_MOVIES_QUERY = """
+SELECT m.movie_id, m.release_date,
+       ARRAY(SELECT genre_id FROM movie_genre WHERE movie_id = m.movie_id) AS genre_ids,
+       ARRAY(SELECT actor_id FROM movie_cast WHERE movie_id = m.movie_id) AS actor_ids
+FROM movie m
+WHERE m.movie_id = ANY(%(movie_ids)s);
+"""
+
+def fetch_all(conn, query, params):
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+def in_range(release_date, date_from, date_to):
+    return release_date is not None and date_from <= release_date <= date_to
+
+def top_movies(conn, date_from, date_to, limit=10, min_votes=100):
+    """Best rated movies released in the date range, with their IMDb review rating and count."""
+    rows = fetch_all(conn, TOP_MOVIES_QUERY, {'date_from': date_from, 'date_to': date_to, 'limit': limit, 'min_votes': min_votes})
+    scope = lambda movie: in_range(movie['release_date'], date_from, date_to)
+    return rows, [row['movie_id'] for row in rows], (), scope
+
+def actor_filmography(conn, actor_id):
+    """Movies of an actor with career stats, None if the actor is unknown."""
+    rows = fetch_all(conn, ACTOR_FILMOGRAPHY_QUERY, {'actor_id': actor_id})
+    if not rows:
+        return None, (), (actor_id,), lambda movie: actor_id in movie['actor_ids']
+
+    # An actor can play several characters in a movie: one entry per movie
+    movies = list({row['movie_id']: row for row in rows if row['movie_id'] is not None}.values())
+    votes = [movie['vote_average'] for movie in movies if movie['vote_average'] is not None]
+    sentiments = [movie['review_sentiment'] for movie in movies if movie['review_sentiment'] is not None]
+    release_dates = [movie['release_date'] for movie in movies if movie['release_date'] is not None]
+    result = {
+        'actor_id': actor_id,
+        'name': rows[0]['name'],
+        'movies': len(movies),
+        'first_release': min(release_dates, default=None),
+        'last_release': max(release_dates, default=None),
+        'avg_vote': sum(votes) / len(votes) if votes else None,
+        'total_revenue': sum(movie['revenue'] or 0 for movie in movies),
+        'avg_review_sentiment': sum(sentiments) / len(sentiments) if sentiments else None,
+        'filmography': [{key: movie[key] for key in ('movie_id', 'title', 'release_date', 'character', 'vote_average')}
+                        for movie in movies],
+    }
+    scope = lambda movie: actor_id in movie['actor_ids']
+    return result, [movie['movie_id'] for movie in movies], (actor_id,), scope
+
+def genre_trends(conn, date_from, date_to, genre_id=None):
+    """Movies released per genre and year in the date range, with their average vote, popularity and revenue."""
+    rows = fetch_all(conn, GENRE_TRENDS_QUERY, {'date_from': date_from, 'date_to': date_to, 'genre_id': genre_id})
+    movie_ids = [movie_id for row in rows for movie_id in row.pop('movie_ids')]
+    scope = lambda movie: (in_range(movie['release_date'], date_from, date_to)
+                           and (genre_id is None or genre_id in movie['genre_ids']))
+    return rows, movie_ids, (), scope
+
+def changed_movies(conn, movie_ids):
+    return fetch_all(conn, CHANGED_MOVIES_QUERY, {'movie_ids': list(movie_ids)})
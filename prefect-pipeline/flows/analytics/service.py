@@ -0,0 +1,192 @@
+"""
+Read-side query service over the PostgreSQL warehouse, with results cached in memory until the
+loader reports (NOTIFY on the movie_changes channel) that a movie they depend on changed.
+
+    cd flows && python -m analytics.service
+    curl 'localhost:8090/top-movies?from=2024-01-01&to=2024-12-31&limit=10'
+    curl 'localhost:8090/actors/287/filmography'
+    curl 'localhost:8090/genre-trends?from=2020-01-01&to=2024-12-31&genre_id=28'
+"""
+from analytics import queries
+from analytics.cache import QueryCache
+from config import load_config
+from etl.load_data import CHANGE_CHANNEL, connection_params
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from psycopg2.pool import ThreadedConnectionPool
+from urllib.parse import urlparse, parse_qs
+import json
+import logging
+import os
+import psycopg2
+import re
+import select
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+ACTOR_PATH_RE = re.compile(r'^/actors/(\d+)/filmography$')
+
+class AnalyticsService:
+    """Parameterized warehouse queries behind a QueryCache."""
+
+    def __init__(self, pool, cache):
+        self.pool = pool
+        self.cache = cache
+        self.connections = threading.BoundedSemaphore(pool.maxconn)  # getconn raises instead of waiting
+
+    def _cached(self, key, query, *args):
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        generation = self.cache.generation
+        with self.connections:
+            conn = self.pool.getconn()
+            try:
+                value, movie_ids, actor_ids, scope = query(conn, *args)
+                conn.rollback()  # End the read transaction
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self.pool.putconn(conn, close=True)  # Do not hand a broken connection out again
+                raise
+            except Exception:
+                conn.rollback()
+                self.pool.putconn(conn)
+                raise
+            self.pool.putconn(conn)
+        if value is not None:
+            self.cache.put(key, value, movie_ids, actor_ids, scope, generation)
+        return value
+
+    def top_movies(self, date_from, date_to, limit=10, min_votes=100):
+        return self._cached(('top_movies', date_from, date_to, limit, min_votes), queries.top_movies,
+                            date_from, date_to, limit, min_votes)
+
+    def actor_filmography(self, actor_id):
+        return self._cached(('actor_filmography', actor_id), queries.actor_filmography, actor_id)
+
+    def genre_trends(self, date_from, date_to, genre_id=None):
+        return self._cached(('genre_trends', date_from, date_to, genre_id), queries.genre_trends,
+                            date_from, date_to, genre_id)
+
+    def apply_changes(self, conn, payloads):
+        """Invalidate the results depending on the ids of the loader's notifications."""
+        movie_ids, actor_ids = set(), set()
+        for payload in payloads:
+            if payload.get('reset'):
+                self.cache.clear()
+                logging.info(f"Cache cleared: {payload['table']} truncated.")
+                return
+            if payload.get('key') == 'movie_id':
+                movie_ids.update(payload['ids'])
+            elif payload.get('key') == 'actor_id':
+                actor_ids.update(payload['ids'])
+
+        movies = queries.changed_movies(conn, movie_ids) if movie_ids else []
+        dropped = self.cache.invalidate(movies, movie_ids, actor_ids)
+        logging.info(f"{len(movie_ids)} movies and {len(actor_ids)} actors changed: {dropped} cached results dropped.")
+
+class ChangeListener(threading.Thread):
+    """LISTEN for the loader's change notifications and invalidate the cache accordingly."""
+
+    def __init__(self, service, reconnect_delay=5):
+        super().__init__(daemon=True)
+        self.service = service
+        self.reconnect_delay = reconnect_delay
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                logging.error(f"Change listener failed, reconnecting: {e}")
+            # Notifications may have been missed while disconnected
+            self.service.cache.clear()
+            time.sleep(self.reconnect_delay)
+
+    def listen(self):
+        conn = psycopg2.connect(**connection_params())
+        conn.set_session(autocommit=True)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANGE_CHANNEL};")
+            logging.info(f"Listening for changes on {CHANGE_CHANNEL}.")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                payloads = [json.loads(notify.payload) for notify in conn.notifies]
+                conn.notifies.clear()
+                if payloads:
+                    self.service.apply_changes(conn, payloads)
+        finally:
+            conn.close()
+
+def to_json(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class AnalyticsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        data = json.dumps(body, default=to_json).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            actor_match = ACTOR_PATH_RE.match(url.path)
+            if url.path == '/top-movies':
+                result = service.top_movies(date.fromisoformat(params['from']), date.fromisoformat(params['to']),
+                                            int(params.get('limit', 10)), int(params.get('min_votes', 100)))
+            elif url.path == '/genre-trends':
+                genre_id = int(params['genre_id']) if 'genre_id' in params else None
+                result = service.genre_trends(date.fromisoformat(params['from']), date.fromisoformat(params['to']), genre_id)
+            elif actor_match:
+                result = service.actor_filmography(int(actor_match.group(1)))
+            elif url.path == '/stats':
+                result = service.cache.snapshot()
+            else:
+                self._send(404, {'error': 'Not found'})
+                return
+        except (KeyError, ValueError) as e:
+            self._send(400, {'error': f"Invalid parameters: {e}"})
+            return
+        except Exception as e:
+            logging.error(f"Error serving {self.path}: {e}", exc_info=True)
+            self._send(500, {'error': str(e)})
+            return
+
+        if result is None:
+            self._send(404, {'error': 'Not found'})
+        else:
+            self._send(200, result)
+
+def create_server(service, host='0.0.0.0', port=8090):
+    server = ThreadingHTTPServer((host, port), AnalyticsHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+if __name__ == "__main__":
+    load_config()
+    cache = QueryCache(maxsize=int(os.getenv('ANALYTICS_CACHE_SIZE', '1024')), ttl=float(os.getenv('ANALYTICS_CACHE_TTL', '600')))
+    pool = ThreadedConnectionPool(1, int(os.getenv('ANALYTICS_DB_CONNECTIONS', '8')), **connection_params())
+    service = AnalyticsService(pool, cache)
+    ChangeListener(service).start()
+
+    server = create_server(service, port=int(os.getenv('ANALYTICS_PORT', '8090')))
+    logging.info(f"Analytics service listening on port {server.server_address[1]}.")
+    server.serve_forever()
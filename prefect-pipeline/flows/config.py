@@ -0,0 +1,15 @@
+from dotenv import load_dotenv
+import logging
+import threading
+
+_lock = threading.Lock()
+_loaded = False
+
+def load_config():
+    """Load the .env file and configure logging, once per process."""
+    global _loaded
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            logging.basicConfig(level=logging.INFO)
+            _loaded = True
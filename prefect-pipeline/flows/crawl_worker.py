@@ -0,0 +1,43 @@
+"""
+Crawl worker of the distributed mode: leases movie, review and person jobs from the crawl_jobs
+work queue in MongoDB and runs them, alongside any number of other workers.
+
+    python flows/crawl_worker.py --threads 4
+    python flows/crawl_worker.py --processes 4 --kinds movie person   # TMDB only, no browser
+"""
+from config import load_config
+from multiprocessing import get_context
+import argparse
+import os
+
+def run_worker(threads=1, kinds=None, run_key=None):
+    """Run the crawl jobs of the queue until stopped."""
+    from etl.fetch_data import work_crawl_queue
+    from movie_crawling.tmdb_api import TMDBApi
+    import pymongo
+
+    load_config()
+    client = pymongo.MongoClient(os.getenv('MONGO_URI'))
+    db_name = os.getenv('MONGODB_DATABASE', 'default_db_name').replace(' ', '_')
+    tmdb_api = TMDBApi(api_key=os.getenv('TMDB_API_KEY'))
+    work_crawl_queue(client[db_name], tmdb_api, threads=threads, run_key=run_key, kinds=kinds)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run crawl jobs from the MongoDB work queue.")
+    parser.add_argument('--threads', type=int, default=int(os.getenv('CRAWL_WORKER_THREADS', '2')),
+                        help="Jobs run in parallel per process")
+    parser.add_argument('--processes', type=int, default=1, help="Worker processes started on this machine")
+    parser.add_argument('--kinds', nargs='*', choices=['movie', 'reviews', 'person'], help="Job kinds to run (default: all)")
+    parser.add_argument('--run-key', help="Only run the jobs of this crawl run (e.g. 2024-01-01_2024-01-07)")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        run_worker(args.threads, args.kinds, args.run_key)
+    else:
+        context = get_context('spawn')
+        processes = [context.Process(target=run_worker, args=(args.threads, args.kinds, args.run_key))
+                     for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,70 @@
+from movie_crawling.crawl_movies import MoviesScraper
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+DATE_FORMAT = '%Y-%m-%d'
+
+def split_date_range(release_date_from, release_date_to, shard_days=7):
+    """Split a release date range into consecutive (from, to) shards of at most shard_days days."""
+    start = datetime.strptime(release_date_from, DATE_FORMAT)
+    end = datetime.strptime(release_date_to, DATE_FORMAT)
+    if shard_days < 1:
+        raise ValueError("shard_days must be at least 1")
+
+    shards = []
+    while start <= end:
+        shard_end = min(start + timedelta(days=shard_days - 1), end)
+        shards.append((start.strftime(DATE_FORMAT), shard_end.strftime(DATE_FORMAT)))
+        start = shard_end + timedelta(days=1)
+    return shards
+
+def merge_movies(movie_lists):
+    """Merge movie lists, keeping the first occurrence of every Movie ID."""
+    seen = set()
+    merged = []
+    for movies in movie_lists:
+        for movie in movies:
+            movie_id = movie.get('Movie ID')
+            if not movie_id or movie_id == 'N/A' or movie_id in seen:
+                continue
+            seen.add(movie_id)
+            merged.append(movie)
+    return merged
+
+def fetch_shard_movies(shard):
+    """Fetch the movie listing of one shard with its own browser."""
+    release_date_from, release_date_to = shard
+    scraper = MoviesScraper(release_date_from, release_date_to)
+    movies = scraper.fetch_movies(limit=None)
+    if not scraper.listing_complete:
+        raise RuntimeError(f"Listing stopped after {len(movies)} movies")
+    return movies
+
+def fetch_movies_sharded(release_date_from, release_date_to, shard_days=7, max_workers=4):
+    """
+    Fetch the movie listing of a date range shard by shard, with at most max_workers browsers at once.
+    Returns the merged, deduplicated movies and the shards that failed.
+    """
+    shards = split_date_range(release_date_from, release_date_to, shard_days)
+    logging.info(f"Backfilling {release_date_from} to {release_date_to} in {len(shards)} shards with {max_workers} workers.")
+
+    results = {}
+    failed_shards = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_shard_movies, shard): shard for shard in shards}
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                results[shard] = future.result()
+                logging.info(f"Shard {shard[0]} to {shard[1]}: {len(results[shard])} movies.")
+            except Exception as e:
+                logging.error(f"Error fetching shard {shard[0]} to {shard[1]}: {e}")
+                failed_shards.append(shard)
+
+    # Merge in shard order so the result does not depend on completion order
+    movies = merge_movies(results[shard] for shard in shards if shard in results)
+    logging.info(f"Backfill listing found {len(movies)} unique movies.")
+    return movies, failed_shards
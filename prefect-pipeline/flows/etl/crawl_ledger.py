@@ -0,0 +1,180 @@
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from pymongo import UpdateOne
+import argparse
+import os
+import pymongo
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Stages every movie goes through during a crawl, in processing order
+STAGES = ['mapped', 'details', 'credits', 'people', 'reviews']
+
+PENDING = 'pending'
+DONE = 'done'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+class CrawlLedger:
+    """Durable per-movie, per-stage progress of a crawl run, stored in MongoDB."""
+
+    def __init__(self, db, run_key):
+        self.run_key = run_key
+        self.movies = db['crawl_ledger']
+        self.runs = db['crawl_runs']
+        self.people = db['crawl_people']
+        self.movies.create_index([('run_key', 1), ('imdb_id', 1)], unique=True)
+        self.people.create_index([('run_key', 1), ('person_id', 1)], unique=True)
+        self.runs.create_index('run_key', unique=True)
+
+    @staticmethod
+    def make_run_key(release_date_from, release_date_to):
+        """Build the key identifying a crawl of a release date range."""
+        return f"{release_date_from}_{release_date_to}"
+
+    def _now(self):
+        return datetime.now(timezone.utc)
+
+    def is_listing_complete(self):
+        """Check if the movie listing of this run was already saved."""
+        run = self.runs.find_one({'run_key': self.run_key})
+        return bool(run and run.get('listing_complete'))
+
+    def mark_listing_complete(self):
+        """Mark the movie listing of this run as saved."""
+        self.runs.update_one(
+            {'run_key': self.run_key},
+            {'$set': {'listing_complete': True, 'listed_at': self._now()}},
+            upsert=True
+        )
+
+    def register_movies(self, movies):
+        """Add listed movies to the ledger, keeping the progress of known ones."""
+        operations = [
+            UpdateOne(
+                {'run_key': self.run_key, 'imdb_id': movie['Movie ID']},
+                {'$setOnInsert': {
+                    'title': movie.get('Title'),
+                    'stages': {stage: PENDING for stage in STAGES},
+                    'errors': {},
+                    'created_at': self._now()
+                }},
+                upsert=True
+            )
+            for movie in movies if movie.get('Movie ID') and movie.get('Movie ID') != 'N/A'
+        ]
+        if operations:
+            self.movies.bulk_write(operations, ordered=False)
+        logging.info(f"Registered {len(operations)} movies in crawl ledger {self.run_key}.")
+
+    def mark(self, imdb_id, stage, status, error=None, **fields):
+        """Record the status of one stage of a movie."""
+        update = {
+            f'stages.{stage}': status,
+            f'errors.{stage}': str(error) if error else None,
+            'updated_at': self._now()
+        }
+        update.update(fields)
+        self.movies.update_one({'run_key': self.run_key, 'imdb_id': imdb_id}, {'$set': update})
+
+    def skip_movie(self, imdb_id, reason):
+        """Mark every unfinished stage of a movie as skipped."""
+        movie = self.movies.find_one({'run_key': self.run_key, 'imdb_id': imdb_id}) or {}
+        stages = movie.get('stages', {})
+        for stage in STAGES:
+            if stages.get(stage) != DONE:
+                self.mark(imdb_id, stage, SKIPPED, error=reason)
+
+    def get_movie(self, imdb_id):
+        """Get the ledger entry of a movie."""
+        return self.movies.find_one({'run_key': self.run_key, 'imdb_id': imdb_id})
+
+    @staticmethod
+    def has_pending_stages(movie):
+        """Check if a ledger entry still has stages to run."""
+        return any(movie.get('stages', {}).get(stage) in (PENDING, FAILED, None) for stage in STAGES)
+
+    def pending_movies(self):
+        """Get ledger entries that still have stages to run."""
+        return [movie for movie in self.movies.find({'run_key': self.run_key}) if self.has_pending_stages(movie)]
+
+    def failed_movies(self):
+        """Get ledger entries with at least one failed stage."""
+        return [
+            movie for movie in self.movies.find({'run_key': self.run_key})
+            if FAILED in movie.get('stages', {}).values()
+        ]
+
+    def register_people(self, roles):
+        """Add the people credited in a movie ({person_id: {'actor', 'director'}}) to the run, merging their roles."""
+        operations = [
+            UpdateOne(
+                {'run_key': self.run_key, 'person_id': person_id},
+                {'$addToSet': {'roles': {'$each': sorted(person_roles)}}, '$setOnInsert': {'fetched_roles': []}},
+                upsert=True
+            )
+            for person_id, person_roles in roles.items()
+        ]
+        if operations:
+            self.people.bulk_write(operations, ordered=False)
+
+    def pending_people(self, person_ids=None, all_runs=False):
+        """
+        Get the people of the run (or of person_ids) not fetched yet, or credited in a new role since they were.
+        all_runs also returns the people earlier runs left pending, e.g. after a transient error.
+        """
+        query = {'$expr': {'$gt': [{'$size': {'$ifNull': ['$roles', []]}}, {'$size': {'$ifNull': ['$fetched_roles', []]}}]}}
+        if not all_runs:
+            query['run_key'] = self.run_key
+        if person_ids is not None:
+            query['person_id'] = {'$in': list(person_ids)}
+        return list(self.people.find(query))
+
+    def mark_people_fetched(self, people, error=None):
+        """Record that the details of people (ledger entries) were fetched, or skipped with error."""
+        operations = [
+            UpdateOne({'_id': person['_id']}, {'$set': {'fetched_roles': person['roles'], 'error': str(error) if error else None,
+                                                        'updated_at': self._now()}})
+            for person in people
+        ]
+        if operations:
+            self.people.bulk_write(operations, ordered=False)
+
+    def progress(self):
+        """Count movies per status for every stage."""
+        counts = {stage: {PENDING: 0, DONE: 0, FAILED: 0, SKIPPED: 0} for stage in STAGES}
+        for movie in self.movies.find({'run_key': self.run_key}, {'stages': 1}):
+            for stage in STAGES:
+                status = movie.get('stages', {}).get(stage, PENDING)
+                counts[stage][status] = counts[stage].get(status, 0) + 1
+        return counts
+
+    def log_progress(self):
+        """Log a one-line summary per stage."""
+        for stage, statuses in self.progress().items():
+            summary = ', '.join(f"{status}={count}" for status, count in statuses.items())
+            logging.info(f"[{self.run_key}] {stage}: {summary}")
+        people = self.people.count_documents({'run_key': self.run_key})
+        logging.info(f"[{self.run_key}] unique people: {people}, pending={len(self.pending_people())}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the progress of a movie crawl run.")
+    parser.add_argument('release_date_from')
+    parser.add_argument('release_date_to')
+    parser.add_argument('--failed', action='store_true', help="List the movies with failed stages")
+    args = parser.parse_args()
+
+    load_dotenv()  # Run as a script: flows/config.py is not importable from here
+    client = pymongo.MongoClient(os.getenv('MONGO_URI'))
+    db_name = os.getenv('MONGODB_DATABASE', 'default_db_name').replace(' ', '_')
+    ledger = CrawlLedger(client[db_name], CrawlLedger.make_run_key(args.release_date_from, args.release_date_to))
+
+    print(f"Listing complete: {ledger.is_listing_complete()}")
+    for stage, statuses in ledger.progress().items():
+        print(f"{stage:<8} " + '  '.join(f"{status}={count}" for status, count in statuses.items()))
+
+    if args.failed:
+        for movie in ledger.failed_movies():
+            errors = {stage: error for stage, error in movie.get('errors', {}).items() if error}
+            print(f"{movie['imdb_id']}: {errors}")
@@ -1,7 +1,11 @@
-from movie_crawling.crawl_movies import MoviesScraper
-from movie_crawling.crawl_reviews import MovieReviewScraper
 from movie_crawling.tmdb_api import TMDBApi  
-from dotenv import load_dotenv
+from etl.crawl_ledger import CrawlLedger, DONE, FAILED, SKIPPED
+from etl.work_queue import WorkQueue, work
+from etl.raw_lake import append_raw
+from etl.review_store import save_reviews
+from config import load_config
+from monitoring.metrics import movie_timer, record_documents_written
+from concurrent.futures import ThreadPoolExecutor
 from requests.exceptions import HTTPError
 import os
 import pymongo
@@ -9,39 +13,237 @@ import logging
 
 logging.basicConfig(level=logging.INFO)
 
+PEOPLE_BATCH_SIZE = 500  # People fetched per insert_many into person_details
+
 def configure():
     """Load environment variables."""
-    load_dotenv()
+    load_config()
 
 def save_to_mongo(data, collection_name, db):
-    """Save data to MongoDB collection."""
+    """Save data to MongoDB collection. Errors are raised so that the crawl stage is not marked done."""
     if not data:
         logging.warning(f"No data to save for {collection_name}.")
         return
+    # Keep a replayable copy of the raw payload before Mongo adds its _id
+    append_raw(collection_name, data)
     collection = db[collection_name]
     try:
         if isinstance(data, list):
             collection.insert_many(data, ordered=False)
         else:
             collection.insert_one(data)
+        record_documents_written(collection_name, len(data) if isinstance(data, list) else 1)
         logging.info(f"Inserted data into {collection_name}.")
     except Exception as e:
         logging.error(f"Error saving to {collection_name}: {e}")
+        raise
+
+def run_stage(ledger, imdb_id, stage, stages, func):
+    """Run one crawl stage of a movie unless the ledger already has it done."""
+    if stages.get(stage) in (DONE, SKIPPED):
+        return stages.get(stage) == DONE
+    try:
+        with movie_timer(imdb_id, stage):
+            func()
+        ledger.mark(imdb_id, stage, DONE)
+        return True
+    except Exception as e:
+        # Check if the error is an HTTP 404 error
+        if isinstance(e, HTTPError) and e.response.status_code == 404:
+            logging.warning(f"{stage} of movie {imdb_id} not found (404). Skipping.")
+            ledger.mark(imdb_id, stage, SKIPPED, error=e)
+        else:
+            logging.error(f"Error in stage {stage} of movie {imdb_id}: {e}")
+            ledger.mark(imdb_id, stage, FAILED, error=e)
+        return False
+
+def process_movie(entry, tmdb_api, db, ledger, queue=None):
+    """
+    Fetch and save every pending stage of a movie from the crawl ledger.
+    With a work queue, the review scrape and the people fetches are enqueued as jobs of their own.
+    """
+    imdb_id = entry['imdb_id']
+    stages = entry.get('stages', {})
+    tmdb_id = entry.get('tmdb_id')
+    logging.info(f"Processing movie: {imdb_id}")
+
+    if stages.get('mapped') != DONE:
+        try:
+            with movie_timer(imdb_id, 'mapped'):
+                tmdb_id = tmdb_api.find_tmdb_id_by_imdb_id(imdb_id)
+        except Exception as e:
+            logging.error(f"Error mapping IMDB ID {imdb_id}: {e}")
+            ledger.mark(imdb_id, 'mapped', FAILED, error=e)
+            return
+        if not tmdb_id:
+            logging.warning(f"TMDB ID not found for IMDB ID {imdb_id}. Skipping.")
+            ledger.skip_movie(imdb_id, 'TMDB ID not found')
+            return
+        ledger.mark(imdb_id, 'mapped', DONE, tmdb_id=tmdb_id)
+
+    # Fetch and save movie details
+    run_stage(ledger, imdb_id, 'details', stages,
+              lambda: save_to_mongo(tmdb_api.get_movie_details(tmdb_id), 'movie_details', db))
+
+    # Fetch and save reviews
+    if queue is None:
+        scrape_movie_reviews(imdb_id, stages, db, ledger)
+    elif stages.get('reviews') not in (DONE, SKIPPED):
+        queue.enqueue(ledger.run_key, 'reviews', [imdb_id], requeue_done=True)
+
+    # Fetch and save cast (actors) and crew (directors)
+    cast_and_crew = {}
+
+    def save_credits():
+        cast_and_crew.update(tmdb_api.get_cast_and_crew(tmdb_id) or {})
+        for actor in cast_and_crew.get('cast', []):
+            actor['movie_tmdb_id'] = tmdb_id
+            save_to_mongo(actor, 'movie_actor_credits', db)
+        for crew_member in cast_and_crew.get('crew', []):
+            if crew_member.get('job') == 'Director':
+                crew_member['movie_tmdb_id'] = tmdb_id
+                save_to_mongo(crew_member, 'movie_director_credits', db)
+
+    def register_people():
+        if not cast_and_crew:  # Credits were saved by an earlier run
+            cast_and_crew.update(tmdb_api.get_cast_and_crew(tmdb_id) or {})
+        # Details are fetched once per person for the whole run, see fetch_people
+        roles = credited_roles(cast_and_crew)
+        ledger.register_people(roles)
+        if queue is not None:
+            # People credited in a new role since their job was done are fetched again
+            pending = {person['person_id'] for person in ledger.pending_people(list(roles))}
+            queue.enqueue(ledger.run_key, 'person', [person_id for person_id in roles if person_id not in pending])
+            queue.enqueue(ledger.run_key, 'person', list(pending), requeue_done=True)
+
+    if run_stage(ledger, imdb_id, 'credits', stages, save_credits):
+        run_stage(ledger, imdb_id, 'people', stages, register_people)
+
+def scrape_movie_reviews(imdb_id, stages, db, ledger):
+    from movie_crawling.crawl_reviews import MovieReviewScraper  # Selenium: imported by the crawl only
+    return run_stage(ledger, imdb_id, 'reviews', stages,
+                     lambda: save_reviews(db, MovieReviewScraper(movie_id=imdb_id).fetch_reviews()))
+
+def credited_roles(cast_and_crew):
+    """Roles of the people credited in a movie: {person_id: {'actor', 'director'}}."""
+    roles = {}
+    for actor in cast_and_crew.get('cast', []):
+        roles.setdefault(actor['id'], set()).add('actor')
+    for crew_member in cast_and_crew.get('crew', []):
+        if crew_member.get('job') == 'Director':
+            roles.setdefault(crew_member['id'], set()).add('director')
+    return roles
+
+def fetch_people(tmdb_api, db, ledger, max_workers=1, people=None):
+    """
+    Fetch the details of every person of the run, and of the people earlier runs left pending, once, and save
+    them with their roles to person_details. people limits the fetch to these ledger entries.
+    """
+    people = ledger.pending_people(all_runs=True) if people is None else people
+    # A person pending in several runs is fetched once, with the roles of every run
+    entries = {}
+    for person in people:
+        entries.setdefault(person['person_id'], []).append(person)
+    person_ids = list(entries)
+    logging.info(f"Fetching the details of {len(person_ids)} people.")
+
+    def fetch_person(person_id):
+        try:
+            return person_id, tmdb_api.get_person_details(person_id), None
+        except HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                logging.warning(f"Person {person_id} not found (404). Skipping.")
+                return person_id, None, e
+            logging.error(f"Error fetching person {person_id}: {e}")
+        except Exception as e:
+            logging.error(f"Error fetching person {person_id}: {e}")
+        return person_id, None, None  # Left pending for the next run
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for start in range(0, len(person_ids), PEOPLE_BATCH_SIZE):
+            details_batch, fetched, skipped = [], [], []
+            for person_id, details, error in executor.map(fetch_person, person_ids[start:start + PEOPLE_BATCH_SIZE]):
+                if details:
+                    roles = sorted({role for person in entries[person_id] for role in person['roles']})
+                    details_batch.append(dict(details, roles=roles))
+                    fetched.extend(entries[person_id])
+                elif error is not None:
+                    skipped.extend(entries[person_id])
+            ledger.mark_people_fetched(skipped, error='Person not found (404)')
+            try:
+                save_to_mongo(details_batch, 'person_details', db)
+            except Exception:
+                continue  # Left pending for the next run
+            ledger.mark_people_fetched(fetched)
+
+def crawl_job_handlers(tmdb_api, db, queue):
+    """Handlers of the crawl jobs of a work queue: a job fails (and is retried) while a stage of it failed."""
+    ledgers = {}
+
+    def ledger_of(job):
+        if job['run_key'] not in ledgers:
+            ledgers[job['run_key']] = CrawlLedger(db, job['run_key'])
+        return ledgers[job['run_key']]
+
+    def movie_job(job):
+        ledger = ledger_of(job)
+        entry = ledger.get_movie(job['key'])
+        if entry is None:
+            logging.warning(f"Movie {job['key']} is not in crawl ledger {job['run_key']}. Skipping.")
+            return
+        process_movie(entry, tmdb_api, db, ledger, queue)
+        stages = ledger.get_movie(job['key']).get('stages', {})
+        failed = [stage for stage, status in stages.items() if status == FAILED and stage != 'reviews']
+        if failed:
+            raise RuntimeError(f"Stages {', '.join(failed)} of movie {job['key']} failed")
 
-def fetch_and_save_movie_data(release_date_from, release_date_to):
+    def reviews_job(job):
+        ledger = ledger_of(job)
+        entry = ledger.get_movie(job['key'])
+        if entry is None:
+            logging.warning(f"Movie {job['key']} is not in crawl ledger {job['run_key']}. Skipping.")
+            return
+        scrape_movie_reviews(job['key'], entry.get('stages', {}), db, ledger)
+        if ledger.get_movie(job['key'])['stages'].get('reviews') == FAILED:
+            raise RuntimeError(f"Review scrape of movie {job['key']} failed")
+
+    def person_job(job):
+        ledger = ledger_of(job)
+        fetch_people(tmdb_api, db, ledger, people=ledger.pending_people([job['key']]))
+        if ledger.pending_people([job['key']]):
+            raise RuntimeError(f"Details of person {job['key']} could not be fetched")
+
+    return {'movie': movie_job, 'reviews': reviews_job, 'person': person_job}
+
+def work_crawl_queue(db, tmdb_api, threads=1, run_key=None, kinds=None, drain=False):
+    """Run crawl jobs of the work queue (every kind, or only kinds) until stopped, or with drain until run_key is done."""
+    queue = WorkQueue(db)
+    handlers = crawl_job_handlers(tmdb_api, db, queue)
+    if kinds:
+        handlers = {kind: handler for kind, handler in handlers.items() if kind in kinds}
+    return work(queue, handlers, threads=threads, run_key=run_key, drain=drain)
+
+def fetch_and_save_movie_data(release_date_from, release_date_to, retry_failed_only=False, shard_days=None, max_workers=1,
+                              distributed=None):
+    """
+    Crawl the movies released in the date range. In distributed mode (CRAWL_DISTRIBUTED=1), the movies are
+    enqueued as jobs of the crawl_jobs work queue, run by this process and any crawl worker (flows/crawl_worker.py).
+    """
     configure()
+    if distributed is None:
+        distributed = os.getenv('CRAWL_DISTRIBUTED', '0') == '1'
     
     # Get API key and Mongo URI
     tmdb_api_key = os.getenv('TMDB_API_KEY')
     mongo_uri = os.getenv('MONGO_URI')
 
-    # Initialize MongoDB client and scrapers
+    # Initialize MongoDB client, TMDB API and crawl ledger
     client = pymongo.MongoClient(mongo_uri)
     db_name = os.getenv('MONGODB_DATABASE', 'default_db_name').replace(' ', '_')  
     db = client[db_name]
     tmdb_api = TMDBApi(api_key=tmdb_api_key)
-
-    scraper = MoviesScraper(release_date_from=release_date_from, release_date_to=release_date_to)
+    ledger = CrawlLedger(db, CrawlLedger.make_run_key(release_date_from, release_date_to))
+    queue = WorkQueue(db) if distributed else None
 
     # Check if movie_genres collection already exists
     if 'movie_genres' not in db.list_collection_names():
@@ -49,51 +251,70 @@ def fetch_and_save_movie_data(release_date_from, release_date_to):
     else:
         logging.info("Collection 'movie_genres' already exists. Skipping genre retrieval.")
 
-    # Fetch the full list of movies
-    movies = scraper.fetch_movies(limit=None)
+    processed_ids = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
 
-    # Process each movie 
-    for movie in movies:
-        logging.info(f"Processing movie: {movie.get('Movie ID')}")
-        
-        imdb_id = movie.get('Movie ID')
-        if not imdb_id:
-            logging.warning("Movie ID not found.")
-            continue
+        def submit(entry):
+            processed_ids.add(entry['imdb_id'])
+            if queue is not None:
+                queue.enqueue(ledger.run_key, 'movie', [entry['imdb_id']], requeue_done=True)
+            else:
+                futures.append(executor.submit(process_movie, entry, tmdb_api, db, ledger))
 
-        tmdb_id = tmdb_api.find_tmdb_id_by_imdb_id(imdb_id)
-        if not tmdb_id:
-            logging.warning(f"TMDB ID not found for IMDB ID {imdb_id}. Skipping.")
-            continue
+        if retry_failed_only:
+            movies = ledger.failed_movies()
+            logging.info(f"Retrying {len(movies)} movies with failed stages.")
+            if queue is not None:
+                queue.retry_failed(ledger.run_key)
+        else:
+            # Fetch the full list of movies, unless a previous run already saved it
+            if not ledger.is_listing_complete():
+                if shard_days:
+                    # Backfill mode: list the range shard by shard in parallel
+                    from etl.backfill import fetch_movies_sharded
+                    listed_movies, failed_shards = fetch_movies_sharded(release_date_from, release_date_to,
+                                                                        shard_days, max_workers)
+                    ledger.register_movies(listed_movies)
+                    listing_complete = not failed_shards
+                else:
+                    # Stream the listing and start processing each movie as soon as it is listed
+                    from movie_crawling.crawl_movies import MoviesScraper
+                    scraper = MoviesScraper(release_date_from=release_date_from, release_date_to=release_date_to)
+                    listed_movies = []
+                    try:
+                        for movie in scraper.iter_movies(limit=None):
+                            listed_movies.append(movie)
+                            ledger.register_movies([movie])
+                            entry = ledger.get_movie(movie['Movie ID'])
+                            if entry and entry['imdb_id'] not in processed_ids and ledger.has_pending_stages(entry):
+                                submit(entry)
+                    except Exception as e:
+                        # Crawl the movies listed so far; the next run lists the range again
+                        logging.error(f"Movie listing failed after {len(listed_movies)} movies: {e}")
+                    listing_complete = scraper.listing_complete
+                if listed_movies and listing_complete:
+                    ledger.mark_listing_complete()
+                else:
+                    logging.warning(f"Movie listing incomplete ({len(listed_movies)} movies listed). Not marking it complete.")
+            else:
+                logging.info("Movie listing already saved in crawl ledger. Resuming.")
+            movies = ledger.pending_movies()
+        ledger.log_progress()
 
-        try:
-            # Fetch and save movie details
-            movie_details = tmdb_api.get_movie_details(tmdb_id)
-            save_to_mongo(movie_details, 'movie_details', db)
-
-            # Fetch and save reviews
-            reviews = MovieReviewScraper(movie_id=imdb_id).fetch_reviews()
-            save_to_mongo(reviews, 'movie_reviews', db)
-
-            # Fetch and save cast (actors) and crew (directors)
-            cast_and_crew = tmdb_api.get_cast_and_crew(tmdb_id)
-            if cast_and_crew:
-                for actor in cast_and_crew.get('cast', []):
-                    actor['movie_tmdb_id'] = tmdb_id
-                    save_to_mongo(actor, 'movie_actor_credits', db)
-                    save_to_mongo(tmdb_api.get_person_details(actor['id']), 'actor_details', db)
-
-                for crew_member in cast_and_crew.get('crew', []):
-                    if crew_member.get('job') == 'Director':
-                        crew_member['movie_tmdb_id'] = tmdb_id
-                        save_to_mongo(crew_member, 'movie_director_credits', db)
-                        save_to_mongo(tmdb_api.get_person_details(crew_member['id']), 'director_details', db)
+        # Process each movie 
+        for entry in movies:
+            if entry['imdb_id'] not in processed_ids:
+                submit(entry)
+        for future in futures:
+            future.result()
 
-        except Exception as e:
-            # Check if the error is an HTTP 404 error
-            if isinstance(e, HTTPError) and e.response.status_code == 404:
-                logging.warning(f"Movie ID {tmdb_id} not found (404). Skipping.")
-            else:
-                logging.error(f"Error processing movie ID {tmdb_id}: {e}")
-    
-    logging.info("Finished processing all movies.")
\ No newline at end of file
+    if queue is not None:
+        # Work the queue alongside the crawl workers until every job of the run is done
+        work_crawl_queue(db, tmdb_api, max_workers, run_key=ledger.run_key, drain=True)
+        logging.info(f"Crawl jobs of {ledger.run_key}: {queue.counts(ledger.run_key)}")
+
+    # Every movie registered its people: fetch each of them once
+    fetch_people(tmdb_api, db, ledger, max_workers)
+    ledger.log_progress()
+    logging.info("Finished processing all movies.")
@@ -0,0 +1,14 @@
+from datetime import datetime, timezone
+
+class MongoHttpCache:
+    """ETags of TMDB responses and when they were fetched, for conditional requests (If-None-Match)."""
+
+    def __init__(self, db, collection_name='http_cache'):
+        self.collection = db[collection_name]
+
+    def get(self, key):
+        return self.collection.find_one({'_id': key})
+
+    def set(self, key, etag):
+        # A 304 means the rows saved from the last 200 are current: the body is not needed again
+        self.collection.replace_one({'_id': key}, {'etag': etag, 'fetched_at': datetime.now(timezone.utc)}, upsert=True)
@@ -1,22 +1,27 @@
 import psycopg2
 import pandas as pd
 import os
-from dotenv import load_dotenv
+import json
 import logging
 from psycopg2.extras import execute_values
+from etl.parquet_store import iter_table_batches, is_table_loaded, mark_table_loaded
+from monitoring.metrics import record_rows_loaded
 
 logging.basicConfig(level=logging.INFO)
 
+def connection_params():
+    return dict(
+        dbname=os.getenv('POSTGRES_DB'),
+        user=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        host=os.getenv('POSTGRES_HOST', 'localhost'),
+        port=os.getenv('POSTGRES_PORT', '5432')
+    )
+
 def create_connection():
     """Create a connection to the PostgreSQL database."""
     try:
-        conn = psycopg2.connect(
-            dbname=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD'),
-            host=os.getenv('POSTGRES_HOST', 'localhost'),
-            port=os.getenv('POSTGRES_PORT', '5432')
-        )
+        conn = psycopg2.connect(**connection_params())
         return conn
     except Exception as e:
         logging.error(f"Error connecting to PostgreSQL: {e}", exc_info=True)
@@ -39,20 +44,226 @@ def is_table_empty(conn, table_name):
         cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {table_name} LIMIT 1);")
         return not cursor.fetchone()[0]
 
-def filter_existing_ids(conn, table_name, column_name, ids):
-    """Filter out existing IDs from the database."""
-    query = f"SELECT {column_name} FROM {table_name} WHERE {column_name} = ANY(%s)"
-    with conn.cursor() as cursor:
-        cursor.execute(query, (ids,))
-        existing_ids = set(row[0] for row in cursor.fetchall())
-    return [id_ for id_ in ids if id_ not in existing_ids]
+# Table creation queries
+TABLE_QUERIES = {
+    'genre': """
+    CREATE TABLE IF NOT EXISTS genre (
+        genre_id INTEGER PRIMARY KEY,
+        name VARCHAR(20)
+    );""",
+    'movie': """
+    CREATE TABLE IF NOT EXISTS movie (
+        movie_id INTEGER PRIMARY KEY,
+        title TEXT,
+        budget BIGINT,
+        homepage TEXT,
+        overview TEXT,
+        popularity FLOAT,
+        poster_path TEXT,
+        release_date DATE,
+        revenue FLOAT,
+        runtime INTEGER,
+        status VARCHAR(50),
+        tagline TEXT,
+        vote_average FLOAT,
+        vote_count FLOAT
+    );""",
+    'movie_genre': """
+    CREATE TABLE IF NOT EXISTS movie_genre (
+        movie_id INTEGER,
+        genre_id INTEGER,
+        FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE,
+        FOREIGN KEY (genre_id) REFERENCES genre(genre_id) ON DELETE CASCADE
+    );""",
+    'actor': """
+    CREATE TABLE IF NOT EXISTS actor (
+        actor_id INTEGER PRIMARY KEY,
+        name VARCHAR(100),
+        gender VARCHAR(50),
+        birthday DATE,
+        deathday DATE,
+        popularity FLOAT,
+        place_of_birth TEXT
+    );""",
+    'director': """
+    CREATE TABLE IF NOT EXISTS director (
+        director_id INTEGER PRIMARY KEY,
+        name VARCHAR(100),
+        gender VARCHAR(50),
+        birthday DATE,
+        deathday DATE,
+        popularity FLOAT,
+        place_of_birth TEXT
+    );""",
+    'movie_cast': """
+    CREATE TABLE IF NOT EXISTS movie_cast (
+        actor_id INTEGER,
+        character VARCHAR(255),
+        order_num INTEGER,
+        movie_id INTEGER,
+        FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE,
+        FOREIGN KEY (actor_id) REFERENCES actor(actor_id) ON DELETE CASCADE
+    );""",
+    'movie_direction': """
+    CREATE TABLE IF NOT EXISTS movie_direction (
+        director_id INTEGER,
+        known_for_department VARCHAR(20),
+        movie_id INTEGER,
+        FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE,
+        FOREIGN KEY (director_id) REFERENCES director(director_id) ON DELETE CASCADE
+    );""",
+    'review': """
+    CREATE TABLE IF NOT EXISTS review (
+        movie_id INTEGER,
+        review_id VARCHAR(40),
+        review_summary TEXT,
+        review_text TEXT,
+        rating FLOAT,
+        author VARCHAR(100),
+        date DATE,
+        helpful FLOAT,
+        not_helpful FLOAT,
+        FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE
+    );""",
+    'review_features': """
+    CREATE TABLE IF NOT EXISTS review_features (
+        review_id VARCHAR(40) PRIMARY KEY,
+        movie_id INTEGER,
+        sentiment_score FLOAT,
+        sentiment_label VARCHAR(10),
+        language VARCHAR(10),
+        word_count INTEGER,
+        aspects TEXT,
+        keywords TEXT,
+        FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE
+    );"""
+}
+
+# Columns added to tables created by earlier versions
+TABLE_MIGRATIONS = {
+    'review': "ALTER TABLE review ADD COLUMN IF NOT EXISTS review_id VARCHAR(40);",
+}
+
+# Referenced tables first
+TABLE_CREATION_ORDER = ['genre', 'movie', 'movie_genre', 'actor', 'director',
+                        'movie_cast', 'movie_direction', 'review', 'review_features']
+# Tables whose rows reference the rows of other tables
+TABLE_DEPENDENCIES = {'movie_genre': ['movie', 'genre'], 'movie_cast': ['movie', 'actor'],
+                      'movie_direction': ['movie', 'director'], 'review': ['movie'], 'review_features': ['movie']}
 
-def create_tables_in_order(conn, table_queries):
+def create_tables_in_order(conn, table_queries=TABLE_QUERIES):
     """Create tables in a specified order."""
-    table_creation_order = ['genre', 'movie', 'movie_genre', 'actor', 'director', 
-                            'movie_cast', 'movie_direction', 'review']
-    for table_name in table_creation_order:
+    for table_name in TABLE_CREATION_ORDER:
         create_table_if_not_exists(conn, table_name, table_queries[table_name])
+    for table_name, migration_query in TABLE_MIGRATIONS.items():
+        create_table_if_not_exists(conn, table_name, migration_query)
+
+def truncate_tables(table_names):
+    """Empty the given tables (and the rows referencing them) before a rebuild."""
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Could not connect to PostgreSQL.")
+
+    try:
+        create_tables_in_order(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {', '.join(table_names)} CASCADE;")
+        notify_changes(conn, ', '.join(table_names), reset=True)
+        conn.commit()
+        logging.info(f"Truncated tables: {', '.join(table_names)}.")
+    finally:
+        conn.close()
+
+# Tables updated in place on refetch, keyed by their primary key
+UPSERT_KEYS = {'genre': 'genre_id', 'movie': 'movie_id', 'actor': 'actor_id', 'director': 'director_id',
+               'review_features': 'review_id'}
+# Tables whose rows of a movie are replaced as a whole when the movie is reloaded
+REPLACE_KEYS = {'movie_genre': 'movie_id'}
+
+def insert_dataframe(conn, data: pd.DataFrame, table_name: str, replaced=None):
+    """
+    Insert (or update) the rows of a DataFrame into a table, without committing.
+    replaced collects the keys already replaced by earlier batches of the same load.
+    """
+    if data.empty:
+        return 0
+
+    insert_query = f"INSERT INTO {table_name} ({', '.join(data.columns)}) VALUES %s"
+    if table_name in UPSERT_KEYS:
+        key = UPSERT_KEYS[table_name]
+        # A row can only be updated once per statement: keep the latest version of each id
+        data = data.drop_duplicates(subset=[key], keep='last')
+        updates = ', '.join(f"{column} = EXCLUDED.{column}" for column in data.columns if column != key)
+        insert_query += f" ON CONFLICT ({key}) DO UPDATE SET {updates}" if updates else f" ON CONFLICT ({key}) DO NOTHING"
+
+    with conn.cursor() as cursor:
+        if table_name in REPLACE_KEYS:
+            key = REPLACE_KEYS[table_name]
+            replaced = set() if replaced is None else replaced
+            keys = set(data[key].tolist()) - replaced
+            cursor.execute(f"DELETE FROM {table_name} WHERE {key} = ANY(%s)", (list(keys),))
+            replaced.update(keys)
+        execute_values(cursor, insert_query, data.values.tolist())
+    record_rows_loaded(table_name, len(data))
+    return len(data)
+
+# Readers of the warehouse (analytics cache) LISTEN on this channel for the ids changed by each load
+CHANGE_CHANNEL = 'movie_changes'
+CHANGE_KEYS = {'movie': 'movie_id', 'movie_genre': 'movie_id', 'movie_cast': 'movie_id', 'movie_direction': 'movie_id',
+               'review': 'movie_id', 'review_features': 'movie_id', 'actor': 'actor_id', 'director': 'director_id'}
+NOTIFY_IDS_PER_MESSAGE = 500  # NOTIFY payloads are limited to 8000 bytes
+
+def changed_ids(data: pd.DataFrame, table_name: str):
+    """Ids (movie_id, actor_id...) touched by loading the rows into the table."""
+    key = CHANGE_KEYS.get(table_name)
+    if key is None or key not in data.columns:
+        return set()
+    return {int(value) for value in data[key].dropna().unique()}
+
+def notify_changes(conn, table_name: str, ids=(), reset=False):
+    """Publish the changed ids on CHANGE_CHANNEL, without committing: listeners get them when the load commits."""
+    with conn.cursor() as cursor:
+        if reset:
+            cursor.execute("SELECT pg_notify(%s, %s);", (CHANGE_CHANNEL, json.dumps({'table': table_name, 'reset': True})))
+            return
+        key = CHANGE_KEYS.get(table_name)
+        ids = sorted(ids)
+        for start in range(0, len(ids), NOTIFY_IDS_PER_MESSAGE):
+            payload = {'table': table_name, 'key': key, 'ids': ids[start:start + NOTIFY_IDS_PER_MESSAGE]}
+            cursor.execute("SELECT pg_notify(%s, %s);", (CHANGE_CHANNEL, json.dumps(payload)))
+
+def select_existing_keys(table_name: str, column: str, keys, conn=None):
+    """Return the keys already present in a table, on conn (tables already created) or a new connection."""
+    if not keys:
+        return set()
+    if conn is not None:
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT {column} FROM {table_name} WHERE {column} = ANY(%s);", (list(keys),))
+            return {row[0] for row in cursor.fetchall()}
+
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Could not connect to PostgreSQL.")
+
+    try:
+        create_tables_in_order(conn)
+        return select_existing_keys(table_name, column, keys, conn)
+    finally:
+        conn.close()
+
+def select_ids(table_name: str):
+    """Return the ids held in a table with an id primary key (movie, actor, director)."""
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Could not connect to PostgreSQL.")
+
+    try:
+        create_tables_in_order(conn)
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT {UPSERT_KEYS[table_name]} FROM {table_name};")
+            return {row[0] for row in cursor.fetchall()}
+    finally:
+        conn.close()
 
 def load_data_to_postgres(data: pd.DataFrame, table_name: str):
     """Load data into PostgreSQL table."""
@@ -61,109 +272,13 @@ def load_data_to_postgres(data: pd.DataFrame, table_name: str):
         return
 
     try:
-        # Table creation queries 
-        table_queries = {
-            'genre': """
-            CREATE TABLE IF NOT EXISTS genre (
-                genre_id INTEGER PRIMARY KEY,
-                name VARCHAR(20)
-            );""",
-            'movie': """
-            CREATE TABLE IF NOT EXISTS movie (
-                movie_id INTEGER PRIMARY KEY,
-                title TEXT,
-                budget BIGINT,
-                homepage TEXT,
-                overview TEXT,
-                popularity FLOAT,
-                poster_path TEXT,
-                release_date DATE,
-                revenue FLOAT,
-                runtime INTEGER,
-                status VARCHAR(50),
-                tagline TEXT,
-                vote_average FLOAT,
-                vote_count FLOAT
-            );""",
-            'movie_genre': """
-            CREATE TABLE IF NOT EXISTS movie_genre (
-                movie_id INTEGER,
-                genre_id INTEGER,
-                FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE,
-                FOREIGN KEY (genre_id) REFERENCES genre(genre_id) ON DELETE CASCADE
-            );""",
-            'actor': """
-            CREATE TABLE IF NOT EXISTS actor (
-                actor_id INTEGER PRIMARY KEY,
-                name VARCHAR(100),
-                gender VARCHAR(50),
-                birthday DATE,
-                deathday DATE,
-                popularity FLOAT,
-                place_of_birth TEXT
-            );""",
-            'director': """
-            CREATE TABLE IF NOT EXISTS director (
-                director_id INTEGER PRIMARY KEY,
-                name VARCHAR(100),
-                gender VARCHAR(50),
-                birthday DATE,
-                deathday DATE,
-                popularity FLOAT,
-                place_of_birth TEXT
-            );""",
-            'movie_cast': """
-            CREATE TABLE IF NOT EXISTS movie_cast (
-                actor_id INTEGER,
-                character VARCHAR(255),
-                order_num INTEGER,
-                movie_id INTEGER,
-                FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE,
-                FOREIGN KEY (actor_id) REFERENCES actor(actor_id) ON DELETE CASCADE
-            );""",
-            'movie_direction': """
-            CREATE TABLE IF NOT EXISTS movie_direction (
-                director_id INTEGER,
-                known_for_department VARCHAR(20),
-                movie_id INTEGER,
-                FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE,
-                FOREIGN KEY (director_id) REFERENCES director(director_id) ON DELETE CASCADE
-            );""",
-            'review': """
-            CREATE TABLE IF NOT EXISTS review (
-                movie_id INTEGER,
-                review_summary TEXT,
-                review_text TEXT,
-                rating FLOAT,
-                author VARCHAR(100),
-                date DATE,
-                helpful FLOAT,
-                not_helpful FLOAT,
-                FOREIGN KEY (movie_id) REFERENCES movie(movie_id) ON DELETE CASCADE
-            );"""
-        }
-
         # Create the tables in order 
-        create_tables_in_order(conn, table_queries)
-
-        # Filter existing IDs for actor, director, and movie tables
-        if table_name in ['actor', 'director', 'movie']:
-            id_column = f"{table_name}_id"  # Dynamic ID column based on table name
-            data_ids = data[id_column].tolist()  # Get all IDs from the input data
-            filtered_ids = filter_existing_ids(conn, table_name, id_column, data_ids)  # Filter out existing IDs
-            
-            # Filter DataFrame to keep rows with ID not existed
-            data = data[data[id_column].isin(filtered_ids)]
-
-        # If there are not any new data, then insert 
-        if data.empty:
-            logging.info(f"No new data to load into {table_name}.")
-            return
+        create_tables_in_order(conn)
 
-        # Insert data into the table
-        insert_query = f"INSERT INTO {table_name} ({', '.join(data.columns)}) VALUES %s"
-        with conn.cursor() as cursor:
-            execute_values(cursor, insert_query, data.values.tolist())
+        if insert_dataframe(conn, data, table_name) == 0:
+            logging.info(f"No data to load into {table_name}.")
+            return
+        notify_changes(conn, table_name, changed_ids(data, table_name))
         conn.commit()
         logging.info(f"Data loaded successfully into {table_name}.")
     except Exception as e:
@@ -171,3 +286,56 @@ def load_data_to_postgres(data: pd.DataFrame, table_name: str):
         conn.rollback()
     finally:
         conn.close()
+
+def load_parquet_to_postgres(table_dir: str, table_name: str):
+    """Stream a staged Parquet table into PostgreSQL row group by row group, in one transaction."""
+    if is_table_loaded(table_dir):
+        logging.info(f"{table_name} was already loaded from {table_dir}. Skipping.")
+        return
+
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Could not connect to PostgreSQL.")
+
+    try:
+        create_tables_in_order(conn)
+
+        rows_loaded = 0
+        replaced = set()
+        changed = set()
+        for batch in iter_table_batches(table_dir):
+            rows_loaded += insert_dataframe(conn, batch, table_name, replaced)
+            changed.update(changed_ids(batch, table_name))
+        notify_changes(conn, table_name, changed)
+        conn.commit()
+        mark_table_loaded(table_dir)
+        logging.info(f"Loaded {rows_loaded} rows into {table_name}.")
+    except Exception as e:
+        logging.error(f"Error loading data into {table_name}: {e}", exc_info=True)
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def load_tables(tables):
+    """
+    Load staged tables ({table_name: table_dir}) referenced tables first. A table that fails to load only stops
+    the tables depending on it; a single error naming the failed and skipped tables is raised at the end.
+    """
+    failed, skipped = [], []
+    for table_name in sorted(tables, key=lambda name: TABLE_CREATION_ORDER.index(name)):
+        missing = [parent for parent in TABLE_DEPENDENCIES.get(table_name, []) if parent in failed + skipped]
+        if missing:
+            logging.error(f"Skipping {table_name}: {', '.join(missing)} failed to load.")
+            skipped.append(table_name)
+            continue
+        try:
+            load_parquet_to_postgres(tables[table_name], table_name)
+        except Exception:
+            failed.append(table_name)
+
+    if failed:
+        message = f"Failed to load tables: {', '.join(failed)}"
+        if skipped:
+            message += f" (skipped as dependent: {', '.join(skipped)})"
+        raise RuntimeError(message)
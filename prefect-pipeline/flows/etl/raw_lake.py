@@ -0,0 +1,78 @@
+from datetime import datetime
+import glob
+import gzip
+import json
+import os
+import socket
+import threading
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+# Collections that are fetched once and needed by every replay, whatever the date range
+REFERENCE_COLLECTIONS = {'movie_genres'}
+
+_write_lock = threading.Lock()
+
+def get_lake_dir():
+    return os.getenv('RAW_LAKE_DIR', 'data/raw_lake')
+
+def append_raw(collection_name, data, lake_dir=None):
+    """
+    Append raw payloads to the lake as gzip-compressed JSON lines, partitioned by crawl date:
+    {lake_dir}/{collection_name}/dt=YYYY-MM-DD/part-{host}-{pid}.jsonl.gz
+    """
+    if not data:
+        return
+    documents = data if isinstance(data, list) else [data]
+
+    partition_dir = os.path.join(lake_dir or get_lake_dir(), collection_name, f"dt={datetime.now().strftime('%Y-%m-%d')}")
+    path = os.path.join(partition_dir, f"part-{socket.gethostname()}-{os.getpid()}.jsonl.gz")
+    try:
+        with _write_lock:
+            os.makedirs(partition_dir, exist_ok=True)
+            # Every append adds a new gzip member, which readers see as one stream
+            with gzip.open(path, 'at', encoding='utf-8') as file:
+                for document in documents:
+                    document = {key: value for key, value in document.items() if key != '_id'}
+                    file.write(json.dumps(document, default=str) + '\n')
+    except Exception as e:
+        logging.error(f"Error appending {collection_name} to raw lake: {e}")
+
+class RawLakeReader:
+    """Read raw payloads back from the lake, optionally limited to a crawl date range."""
+
+    def __init__(self, date_from=None, date_to=None, lake_dir=None):
+        self.lake_dir = lake_dir or get_lake_dir()
+        self.date_from = date_from
+        self.date_to = date_to
+
+    def collection_names(self):
+        """List the collections present in the lake."""
+        if not os.path.isdir(self.lake_dir):
+            return []
+        return sorted(name for name in os.listdir(self.lake_dir) if os.path.isdir(os.path.join(self.lake_dir, name)))
+
+    def _partitions(self, collection_name):
+        partitions = sorted(glob.glob(os.path.join(self.lake_dir, collection_name, 'dt=*')))
+        if collection_name in REFERENCE_COLLECTIONS:
+            return partitions
+        # Partition names are ISO dates, so string comparison follows date order
+        return [
+            partition for partition in partitions
+            if (self.date_from is None or os.path.basename(partition)[3:] >= self.date_from)
+            and (self.date_to is None or os.path.basename(partition)[3:] <= self.date_to)
+        ]
+
+    def iter_documents(self, collection_name):
+        """Yield the raw documents of a collection, oldest partition first."""
+        for partition in self._partitions(collection_name):
+            for path in sorted(glob.glob(os.path.join(partition, '*.jsonl.gz'))):
+                try:
+                    with gzip.open(path, 'rt', encoding='utf-8') as file:
+                        for line in file:
+                            if line.strip():
+                                yield json.loads(line)
+                except (EOFError, gzip.BadGzipFile, json.JSONDecodeError) as e:
+                    # A worker killed mid-append leaves a truncated last member
+                    logging.warning(f"Stopped reading truncated lake file {path}: {e}")
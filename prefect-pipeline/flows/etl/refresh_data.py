@@ -0,0 +1,90 @@
+from movie_crawling.tmdb_api import TMDBApi
+from etl.fetch_data import save_to_mongo
+from etl.http_cache import MongoHttpCache
+from etl.load_data import select_ids
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+MAX_CHANGES_DAYS = 14  # Longest window accepted by the TMDB /changes endpoints
+REFRESH_STATE_ID = 'tmdb_changes'
+
+def changes_windows(start_date, end_date):
+    """Split start_date..end_date ('YYYY-MM-DD') into windows the /changes endpoints accept."""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d')
+    while start <= end:
+        window_end = min(start + timedelta(days=MAX_CHANGES_DAYS - 1), end)
+        yield start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')
+        start = window_end + timedelta(days=1)
+
+def get_changed_ids(tmdb_api, kind, start_date, end_date):
+    ids = set()
+    for window_start, window_end in changes_windows(start_date, end_date):
+        ids |= tmdb_api.get_changed_ids(kind, window_start, window_end)
+    return ids
+
+def refresh_changed_details(db, tmdb_api_key, start_date=None, end_date=None, max_workers=4):
+    """
+    Refetch the details of the movies and people held in PostgreSQL that TMDB reports as changed since the last refresh.
+    Changed details are saved to the staging collections, so the next transform/load upserts them.
+    The ids whose refresh failed are kept in the refresh state and refetched first by the next run.
+    """
+    tmdb_api = TMDBApi(api_key=tmdb_api_key, http_cache=MongoHttpCache(db))
+    state = db['refresh_state'].find_one({'_id': REFRESH_STATE_ID}) or {}
+    end_date = end_date or datetime.now().strftime('%Y-%m-%d')
+    start_date = start_date or state.get('end_date') or \
+        (datetime.strptime(end_date, '%Y-%m-%d') - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    held_movie_ids, actor_ids, director_ids = select_ids('movie'), select_ids('actor'), select_ids('director')
+    # Their ETag may have been cached before the save failed: refetch them unconditionally
+    retry_movie_ids = set(state.get('failed_movie_ids', [])) & held_movie_ids
+    retry_person_ids = set(state.get('failed_person_ids', [])) & (actor_ids | director_ids)
+    movie_ids = (get_changed_ids(tmdb_api, 'movie', start_date, end_date) & held_movie_ids) - retry_movie_ids
+    person_ids = (get_changed_ids(tmdb_api, 'person', start_date, end_date) & (actor_ids | director_ids)) - retry_person_ids
+    logging.info(f"{len(movie_ids)} movies and {len(person_ids)} people changed between {start_date} and {end_date}, "
+                 f"{len(retry_movie_ids)} movies and {len(retry_person_ids)} people to retry.")
+
+    def refresh_movie(movie_id, if_changed=True):
+        # Conditional request: None when the details did not change since the cached response
+        details = tmdb_api.get_movie_details(movie_id, if_changed=if_changed)
+        if details:
+            save_to_mongo(details, 'movie_details', db)
+        return bool(details)
+
+    def refresh_person(person_id, if_changed=True):
+        details = tmdb_api.get_person_details(person_id, if_changed=if_changed)
+        if details:
+            roles = [role for role, ids in (('actor', actor_ids), ('director', director_ids)) if person_id in ids]
+            save_to_mongo(dict(details, roles=roles), 'person_details', db)
+        return bool(details)
+
+    def safe_refresh(refresh, item_id, if_changed):
+        """Refresh one id; returns (refreshed, failed)."""
+        try:
+            return refresh(item_id, if_changed), False
+        except Exception as e:
+            logging.error(f"Error refreshing {item_id}: {e}")
+            return False, True
+
+    def refresh_all(executor, refresh, retry_ids, changed_ids):
+        items = [(item_id, False) for item_id in retry_ids] + [(item_id, True) for item_id in changed_ids]
+        results = list(executor.map(lambda item: safe_refresh(refresh, *item), items))
+        failed = sorted(item_id for (item_id, _), (_, item_failed) in zip(items, results) if item_failed)
+        return sum(refreshed for refreshed, _ in results), failed
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        movies_refreshed, failed_movie_ids = refresh_all(executor, refresh_movie, retry_movie_ids, movie_ids)
+        people_refreshed, failed_person_ids = refresh_all(executor, refresh_person, retry_person_ids, person_ids)
+
+    db['refresh_state'].update_one(
+        {'_id': REFRESH_STATE_ID},
+        {'$set': {'end_date': end_date, 'failed_movie_ids': failed_movie_ids, 'failed_person_ids': failed_person_ids}},
+        upsert=True
+    )
+    total_movies, total_people = len(movie_ids) + len(retry_movie_ids), len(person_ids) + len(retry_person_ids)
+    logging.info(f"Refreshed {movies_refreshed}/{total_movies} movies and {people_refreshed}/{total_people} people, "
+                 f"{len(failed_movie_ids)} movies and {len(failed_person_ids)} people failed.")
+    return {'movies': movies_refreshed, 'people': people_refreshed}
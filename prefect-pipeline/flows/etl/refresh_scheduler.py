@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta, timezone
+from config import load_config
+import logging
+import math
+import os
+
+load_config()
+
+HISTORY_COLLECTION = 'review_count_history'
+
+TRACKED_MOVIES = int(os.getenv('TRACKED_POPULAR_MOVIES', '30'))  # Popular movies whose review counts are followed
+REFRESH_BUDGET = int(os.getenv('REVIEW_REFRESH_BUDGET', '10'))  # Browser sessions per update_reviews run
+MIN_EXPECTED_GAIN = float(os.getenv('REVIEW_REFRESH_MIN_GAIN', '3'))  # Fewer expected new reviews than this: skip
+MAX_REFRESH_INTERVAL_DAYS = float(os.getenv('REVIEW_REFRESH_MAX_INTERVAL_DAYS', '7'))  # Refresh at least this often anyway
+VELOCITY_WINDOW_DAYS = 28
+
+_indexed = set()
+
+def utcnow():
+    """Naive UTC now, the way MongoDB returns datetimes."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def ensure_history_indexes(db):
+    key = (id(db.client), db.name)
+    if key not in _indexed:
+        db[HISTORY_COLLECTION].create_index([('imdb_id', 1), ('observed_at', 1)])
+        _indexed.add(key)
+
+def record_review_count(db, imdb_id, total_reviews, observed_at=None):
+    """Append a review count read on the movie's review page to its history."""
+    ensure_history_indexes(db)
+    db[HISTORY_COLLECTION].insert_one({'imdb_id': imdb_id, 'total_reviews': total_reviews,
+                                       'observed_at': observed_at or utcnow()})
+
+def load_histories(db, imdb_ids, now=None):
+    """Recent review count history of each movie, oldest first."""
+    since = (now or utcnow()) - timedelta(days=VELOCITY_WINDOW_DAYS)
+    histories = {imdb_id: [] for imdb_id in imdb_ids}
+    cursor = db[HISTORY_COLLECTION].find({'imdb_id': {'$in': list(imdb_ids)}, 'observed_at': {'$gte': since}},
+                                         {'_id': 0}).sort('observed_at', 1)
+    for point in cursor:
+        histories[point['imdb_id']].append(point)
+    return histories
+
+def review_velocity(history):
+    """New reviews per day over the history, or None with fewer than two observations."""
+    # A count of 0 is also what a failed page read gives: only trust it if nothing else was seen
+    points = [point for point in history if point['total_reviews'] > 0] or history
+    if len(points) < 2:
+        return None
+    first, last = points[0], points[-1]
+    days = (last['observed_at'] - first['observed_at']).total_seconds() / 86400
+    if days <= 0:
+        return None
+    return max(last['total_reviews'] - first['total_reviews'], 0) / days
+
+def expected_gain(history, prior_velocity=None, now=None):
+    """
+    Reviews expected since the last observation. A single observation uses the prior velocity,
+    and the gain is inf when nothing is known yet.
+    """
+    if not history:
+        return math.inf
+    velocity = review_velocity(history)
+    if velocity is None:
+        velocity = prior_velocity
+    if velocity is None:
+        return math.inf
+    days = ((now or utcnow()) - history[-1]['observed_at']).total_seconds() / 86400
+    gain = velocity * days
+    if days >= MAX_REFRESH_INTERVAL_DAYS:
+        gain = max(gain, MIN_EXPECTED_GAIN)  # Catch growth the estimate could have missed
+    return gain
+
+def plan_refreshes(db, imdb_ids, budget=REFRESH_BUDGET, min_gain=MIN_EXPECTED_GAIN, now=None):
+    """
+    Pick the movies to refresh this run: never crawled movies first, then the highest expected review gain,
+    within the budget, skipping movies expected to have gained fewer than min_gain reviews.
+    """
+    histories = load_histories(db, imdb_ids, now)
+    # Movies seen only once are assumed to grow like the average tracked movie
+    velocities = [velocity for velocity in map(review_velocity, histories.values()) if velocity is not None]
+    prior_velocity = sum(velocities) / len(velocities) if velocities else None
+
+    gains = {imdb_id: expected_gain(history, prior_velocity, now) for imdb_id, history in histories.items()}
+    ranked = sorted((imdb_id for imdb_id in gains if gains[imdb_id] >= min_gain),
+                    key=lambda imdb_id: (bool(histories[imdb_id]), -gains[imdb_id]))
+
+    planned = ranked[:budget]
+    for imdb_id in planned:
+        logging.info(f"Refreshing reviews of {imdb_id} (expected gain: {gains[imdb_id]:.1f}).")
+    logging.info(f"Planned {len(planned)}/{len(gains)} review refreshes: {len(gains) - len(ranked)} with a negligible "
+                 f"expected gain, {len(ranked) - len(planned)} over the budget of {budget}.")
+    return planned
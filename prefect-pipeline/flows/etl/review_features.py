@@ -0,0 +1,123 @@
+from etl.parquet_store import iter_table_batches, write_table
+from etl.load_data import create_connection, create_tables_in_order, select_existing_keys
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter
+import pandas as pd
+import math
+import multiprocessing
+import os
+import re
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+CHUNK_SIZE = 2000  # Reviews per task sent to a worker process
+TOKEN_RE = re.compile(r"[a-zà-öø-ÿ']+")
+
+POSITIVE_WORDS = set("""
+amazing awesome beautiful beautifully best brilliant captivating charming clever compelling delightful
+effective emotional engaging enjoy enjoyable enjoyed entertaining epic excellent exceptional fantastic
+fun funny good gorgeous great gripping hilarious impressive incredible inspiring intense interesting love
+loved lovely magnificent masterpiece memorable moving must nice outstanding perfect perfectly phenomenal
+powerful recommend recommended refreshing remarkable satisfying solid spectacular strong stunning superb
+surprising sweet terrific thrilling touching unforgettable well wonderful worth
+""".split())
+NEGATIVE_WORDS = set("""
+annoying awful bad badly bland boring cheap cheesy clumsy confusing disappointing disappointment dull
+fail failed fails flat forgettable generic hate hated horrible lazy lame mediocre mess messy meh nonsense
+pointless poor poorly predictable ridiculous rushed shallow silly slow stupid tedious terrible unfunny
+uninspired unwatchable waste wasted weak worse worst
+""".split())
+NEGATIONS = {'not', 'no', 'never', "n't", "isn't", "wasn't", "don't", "doesn't", "didn't", 'nothing', 'hardly'}
+
+# Aspects of a movie a review can talk about, for aspect-based analysis
+ASPECTS = {
+    'acting': {'acting', 'actor', 'actors', 'actress', 'performance', 'performances', 'cast'},
+    'story': {'story', 'plot', 'storyline', 'narrative', 'twist', 'twists'},
+    'script': {'script', 'dialogue', 'dialogues', 'writing', 'written', 'screenplay'},
+    'direction': {'director', 'direction', 'directed', 'directing'},
+    'characters': {'character', 'characters', 'villain', 'hero', 'protagonist'},
+    'music': {'music', 'soundtrack', 'score', 'song', 'songs', 'sound'},
+    'visuals': {'visual', 'visuals', 'cinematography', 'effects', 'cgi', 'shot', 'shots', 'animation'},
+    'pacing': {'pacing', 'pace', 'paced', 'runtime', 'length', 'long'},
+    'ending': {'ending', 'finale', 'climax'},
+}
+ASPECT_WORDS = {word: aspect for aspect, words in ASPECTS.items() for word in words}
+
+STOPWORDS = {
+    'en': set("the and a to of is in it that this was for with as but his her on are be film movie i you".split()),
+    'es': set("el la los las de que y en un una es por con para no pero del película".split()),
+    'fr': set("le la les de des et un une est en que pour pas ce dans qui film très".split()),
+    'de': set("der die das und ist nicht ein eine zu mit den auf ich es sehr film".split()),
+    'it': set("il la di che e un una non per con del della sono molto film".split()),
+    'pt': set("o a os as de que e um uma é não em para com do da muito filme".split()),
+}
+ALL_STOPWORDS = set().union(*STOPWORDS.values())
+
+def detect_language(tokens):
+    """Language with the most stopwords among the tokens, 'unknown' when there is too little evidence."""
+    counts = {language: sum(token in words for token in tokens) for language, words in STOPWORDS.items()}
+    language = max(counts, key=counts.get)
+    return language if counts[language] >= 2 else 'unknown'
+
+def sentiment_score(tokens):
+    """Lexicon score in [-1, 1]; a negation flips the next three words."""
+    score, negated_until = 0, -1
+    for i, token in enumerate(tokens):
+        if token in NEGATIONS or token.endswith("n't"):
+            negated_until = i + 3
+            continue
+        polarity = (token in POSITIVE_WORDS) - (token in NEGATIVE_WORDS)
+        score += -polarity if i <= negated_until else polarity
+    return score / math.sqrt(score * score + 15)  # Same normalization as VADER
+
+def score_texts(texts):
+    """Features of a chunk of review texts (runs in a worker process)."""
+    features = []
+    for text in texts:
+        tokens = TOKEN_RE.findall((text or '').lower())
+        score = sentiment_score(tokens)
+        words = Counter(token for token in tokens if len(token) > 3 and token not in ALL_STOPWORDS)
+        features.append({
+            'sentiment_score': round(score, 4),
+            'sentiment_label': 'positive' if score >= 0.05 else 'negative' if score <= -0.05 else 'neutral',
+            'language': detect_language(tokens),
+            'word_count': len(tokens),
+            'aspects': ','.join(sorted({ASPECT_WORDS[token] for token in tokens if token in ASPECT_WORDS})) or None,
+            'keywords': ','.join(word for word, _ in words.most_common(5)) or None,
+        })
+    return features
+
+def build_review_features(review_dir, run_dir, max_workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Score the staged reviews that are not in review_features yet, on a process pool,
+    and stage the results as the review_features table. Returns its directory, or None.
+    """
+    max_workers = max_workers or int(os.getenv('REVIEW_FEATURE_WORKERS', os.cpu_count() or 1))
+    conn = create_connection()
+    if conn is None:
+        raise ConnectionError("Could not connect to PostgreSQL.")
+
+    chunks = []
+    try:
+        # One connection for the lookups of every row group
+        create_tables_in_order(conn)
+        # Spawned workers do not inherit the connection (or the threads) of this process
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            for batch in iter_table_batches(review_dir):
+                batch = batch[batch['review_id'].notna()].drop_duplicates(subset=['review_id'])
+                scored = select_existing_keys('review_features', 'review_id', batch['review_id'].tolist(), conn)
+                batch = batch[~batch['review_id'].isin(scored)]
+                for start in range(0, len(batch), chunk_size):
+                    chunk = batch.iloc[start:start + chunk_size]
+                    chunks.append((chunk[['review_id', 'movie_id']].reset_index(drop=True),
+                                   executor.submit(score_texts, chunk['review_text'].tolist())))
+
+            frames = [keys.join(pd.DataFrame(future.result())) for keys, future in chunks]
+    finally:
+        conn.close()
+
+    if not frames:
+        logging.info("No new reviews to score.")
+        return None
+    return write_table(pd.concat(frames, ignore_index=True), 'review_features', run_dir)
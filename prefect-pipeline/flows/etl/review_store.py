@@ -0,0 +1,55 @@
+from movie_crawling.utils import review_hash
+from movie_crawling.review_parser import review_to_dict
+from etl.raw_lake import append_raw
+from monitoring.metrics import record_documents_written
+from pymongo.errors import BulkWriteError
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+REVIEWS_COLLECTION = 'movie_reviews'
+DUPLICATE_KEY_ERROR = 11000
+
+_indexed = set()
+
+def ensure_review_indexes(db):
+    """One document per review, unique per movie and content hash."""
+    key = (id(db.client), db.name)
+    if key not in _indexed:
+        db[REVIEWS_COLLECTION].create_index([('Movie ID', 1), ('review_hash', 1)], unique=True)
+        _indexed.add(key)
+
+def review_documents(movie_info):
+    """Flatten the {'Movie ID', 'Reviews': [...]} result of the scraper into one document per review."""
+    movie_id = movie_info['Movie ID']
+    return [dict(review_to_dict(review), **{'Movie ID': movie_id, 'review_hash': review_hash(movie_id, review)})
+            for review in movie_info.get('Reviews', [])]
+
+def iter_flat_reviews(documents):
+    """Stream review documents, expanding the per-movie documents written before reviews were flattened."""
+    for document in documents:
+        if 'Reviews' in document:
+            yield from review_documents(document)
+        else:
+            yield document
+
+def save_reviews(db, movie_info):
+    """Insert the new reviews of a movie, skipping the ones already stored. Returns the number inserted."""
+    if not movie_info or not movie_info.get('Reviews'):
+        logging.warning(f"No reviews to save for {movie_info and movie_info.get('Movie ID')}.")
+        return 0
+
+    documents = review_documents(movie_info)
+    # Keep a replayable copy of the raw payload before Mongo adds its _id
+    append_raw(REVIEWS_COLLECTION, documents)
+    ensure_review_indexes(db)
+    try:
+        inserted = len(db[REVIEWS_COLLECTION].insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        # Reviews seen before hit the unique index; anything else is a real failure
+        if any(error['code'] != DUPLICATE_KEY_ERROR for error in e.details['writeErrors']):
+            raise
+        inserted = e.details['nInserted']
+    record_documents_written(REVIEWS_COLLECTION, inserted)
+    logging.info(f"Inserted {inserted}/{len(documents)} reviews of {movie_info['Movie ID']} into {REVIEWS_COLLECTION}.")
+    return inserted
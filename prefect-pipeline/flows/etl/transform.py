@@ -1,17 +1,28 @@
 import pymongo
 import pandas as pd
-from dotenv import load_dotenv
 import os
 import logging
 import numpy as np
+from config import load_config
+from etl.raw_lake import RawLakeReader
+from etl.review_store import REVIEWS_COLLECTION, iter_flat_reviews
+from etl.transform_pipelines import GENDERS, PIPELINES, PUSHDOWN_INDEXES, TABLE_COLUMNS
 
 logging.basicConfig(level=logging.INFO)
 
 class MongoDataExtractor:
-    def __init__(self):
-        """Initialize and configure MongoDB connection."""
-        load_dotenv()
-        self.db = self.connect_to_mongo()
+    def __init__(self, replay=False, replay_from=None, replay_to=None, pushdown=None):
+        """
+        Initialize and configure MongoDB connection.
+        In replay mode, collections are read from the raw lake instead (crawl dates replay_from..replay_to).
+        In pushdown mode (TRANSFORM_PUSHDOWN=1), the transforms run as MongoDB aggregation pipelines.
+        """
+        load_config()
+        self.lake = RawLakeReader(replay_from, replay_to) if replay else None
+        self.db = self.connect_to_mongo() if self.lake is None else None
+        if pushdown is None:
+            pushdown = os.getenv('TRANSFORM_PUSHDOWN', '0') == '1'
+        self.pushdown = pushdown and self.lake is None
 
     def connect_to_mongo(self):
         """Connect to MongoDB and return the database object."""
@@ -19,15 +30,65 @@ class MongoDataExtractor:
         db_name = os.getenv('MONGODB_DATABASE', 'default_db_name').replace(' ', '_')
         return client[db_name]
 
+    def collection_names(self):
+        """List the collections of the data source."""
+        if self.lake is not None:
+            return self.lake.collection_names()
+        return self.db.list_collection_names()
+
     def load_collection_as_dataframe(self, collection_name):
         """Load MongoDB collection into a DataFrame."""
-        data = list(self.db[collection_name].find({}))
+        if self.lake is not None:
+            data = self.lake.iter_documents(collection_name)
+        else:
+            data = self.db[collection_name].find({})
+        if collection_name == REVIEWS_COLLECTION:
+            data = iter_flat_reviews(data)  # One row per review, also for the older per-movie documents
+        data = list(data)
         if not data:
             logging.warning(f"No data found in collection: {collection_name}")
         return pd.DataFrame(data)
 
+    def can_push_down(self, collection):
+        """Pushdown covers every collection, except reviews still holding older per-movie documents."""
+        if not self.pushdown or collection not in PIPELINES:
+            return False
+        if collection == REVIEWS_COLLECTION:
+            return self.db[collection].find_one({'Reviews': {'$exists': True}}, {'_id': 1}) is None
+        return True
+
+    def aggregate_collection(self, collection):
+        """Run the pipelines of a collection and return its tables (empty when the collection is)."""
+        for index_collection, keys in PUSHDOWN_INDEXES.items():
+            self.db[index_collection].create_index(keys)
+
+        tables = {}
+        for table, pipeline in PIPELINES[collection].items():
+            cursor = self.db[collection].aggregate(pipeline, allowDiskUse=True, batchSize=10000)
+            df = pd.DataFrame.from_records(cursor, columns=TABLE_COLUMNS[table])
+            if not df.empty:
+                tables[table] = self.finish_table(table, df)
+        if not tables:
+            logging.warning(f"No data found in collection: {collection}")
+        return tables
+
+    def finish_table(self, table, df):
+        """Cleanups of the aggregated rows that are cheaper in pandas than in the pipeline."""
+        if table in ('actor', 'director'):
+            df = df.replace({'gender': GENDERS})
+        elif table in ('movie', 'movie_cast', 'movie_direction'):
+            df = df.replace({np.nan: None, '': None})
+        elif table == 'review':
+            df['rating'] = pd.to_numeric(df['rating'].replace('No rating', None), errors='coerce')
+            df = df.replace({np.nan: None})
+        if table in ('movie_cast', 'movie_direction', 'review'):
+            df = df.drop_duplicates()  # '' and None are the same value once replaced
+        return df.reset_index(drop=True)
+
     def check_and_mark_processed(self, collection):
         """Check if a collection is processed and mark it if not."""
+        if self.lake is not None:
+            return False  # A replay rebuilds everything
         if not self.db['processing_flags'].find_one({'collection': collection}):
             self.db['processing_flags'].insert_one({'collection': collection})
             return False
@@ -37,7 +98,7 @@ class MongoDataExtractor:
         """Load and transform all specified collections from MongoDB."""
         def transform_movie_reviews(df, movie_details_df):
             """Transform movie reviews"""
-            required_columns = ['Movie ID', 'Reviews']
+            required_columns = ['Movie ID', 'review_hash']
             
             # Check for required columns in the DataFrame
             missing_columns = [col for col in required_columns if col not in df.columns]
@@ -49,26 +110,23 @@ class MongoDataExtractor:
             imdb_id_to_movie_id = dict(zip(movie_details_df['imdb_id'], movie_details_df['id']))
 
             # Check if the top_popular_movies_details collection exists
-            if 'top_popular_movies_details' in self.db.list_collection_names():
+            if 'top_popular_movies_details' in self.collection_names():
                 top_movie_details_df = self.load_collection_as_dataframe('top_popular_movies_details')[['id', 'imdb_id']]
                 top_imdb_id_to_movie_id = dict(zip(top_movie_details_df['imdb_id'], top_movie_details_df['id']))
             else:
                 top_imdb_id_to_movie_id = {}
 
             # Check if the top_popular_movies collection exists
-            if 'top_popular_movies' in self.db.list_collection_names():
+            if self.lake is None and 'top_popular_movies' in self.collection_names():
                 top_popular_movies_collection = self.db['top_popular_movies']
             else:
                 top_popular_movies_collection = None
 
-            reviews_data = []  # List to store transformed review data
-
-            # Iterate over each row in the df
-            for index, row in df.iterrows():
-                movie_id = row['Movie ID']
-                reviews = row['Reviews']
+            # Map each IMDb id once, not once per review
+            movie_ids = {}
+            for movie_id in df['Movie ID'].unique():
                 mapped_movie_id = imdb_id_to_movie_id.get(movie_id)
-                
+
                 if mapped_movie_id is None:
                     mapped_movie_id = top_imdb_id_to_movie_id.get(movie_id)
 
@@ -79,34 +137,45 @@ class MongoDataExtractor:
                     if mapped_movie_id is None:
                         logging.warning(f"Movie ID {movie_id} not found in both movie_details and top_popular_movies_details.")
                         continue  # Skip if the Movie ID is not found
-
-                # Iterate over each review and extract relevant information
-                for review in reviews:
-                    reviews_data.append({
-                        'movie_id': mapped_movie_id,
-                        'review_summary': review.get('Review Summary'),
-                        'review_text': review.get('Review'),
-                        'rating': review.get('Rating'),
-                        'author': review.get('Author'),
-                        'date': review.get('Date') if review.get('Date') != "" else None,  
-                        'helpful': review.get('Helpful'),
-                        'not_helpful': review.get('Not Helpful')
-                    })
-
-            reviews_df = pd.DataFrame(reviews_data)    
+                movie_ids[movie_id] = mapped_movie_id
+
+            df = df.drop_duplicates(subset=['Movie ID', 'review_hash'])
+            df = df[df['Movie ID'].isin(movie_ids.keys())]
+            columns = {'Review Summary': 'review_summary', 'Review': 'review_text', 'Rating': 'rating', 'Author': 'author',
+                       'Date': 'date', 'Helpful': 'helpful', 'Not Helpful': 'not_helpful'}
+            reviews_df = df.reindex(columns=list(columns)).rename(columns=columns)
+            reviews_df.insert(0, 'movie_id', df['Movie ID'].map(movie_ids))
+            reviews_df.insert(1, 'review_id', df['review_hash'])
+            reviews_df['date'] = reviews_df['date'].replace('', None)
             reviews_df['rating'] = reviews_df['rating'].replace('No rating', None)
             reviews_df['rating'] = pd.to_numeric(reviews_df['rating'], errors='coerce')
-            reviews_df = reviews_df.replace({np.nan: None})
+            reviews_df = reviews_df.replace({np.nan: None}).reset_index(drop=True)
             reviews_df.drop_duplicates(inplace=True)
 
             return {'review': reviews_df}
 
+        def person_table(df, id_column):
+            """Actor or director rows of person details, keeping the last fetched version of each person."""
+            return (df[['id', 'name', 'gender', 'birthday', 'deathday', 'popularity', 'place_of_birth']]
+                    .rename(columns={'id': id_column})
+                    .replace({'gender': GENDERS})
+                    .drop_duplicates(subset=[id_column], keep='last'))
+
+        def add_tables(collection_data):
+            """Add transformed tables; people staged in both layouts are merged, the newer person_details last."""
+            for table, table_df in collection_data.items():
+                if table in ('actor', 'director') and table in transformed_data:
+                    table_df = (pd.concat([transformed_data[table], table_df])
+                                .drop_duplicates(subset=[f'{table}_id'], keep='last').reset_index(drop=True))
+                transformed_data[table] = table_df
+
         # Define transformations for each collection
         transformations = {
             'movie_genres': lambda df: {
-                'genre': df.drop(columns=['_id']).rename(columns={'id': 'genre_id'}).drop_duplicates()
+                'genre': df.drop(columns=['_id'], errors='ignore').rename(columns={'id': 'genre_id'}).drop_duplicates()
             } if not self.check_and_mark_processed('movie_genres') else None,
             
+            # Refetched details come after the older ones: keep the last version of each id
             'movie_details': lambda df: {
                 'movie': df[['id', 'title', 'budget', 'homepage', 'overview', 'popularity', 'poster_path',
                             'release_date', 'revenue', 'runtime', 'status', 'tagline', 
@@ -115,27 +184,23 @@ class MongoDataExtractor:
                             .assign(poster_path=lambda x: x['poster_path'].apply(
                                 lambda p: f"https://image.tmdb.org/t/p/w500{p}" if p else None))
                             .replace({np.nan: None, '': None})
-                            .drop_duplicates(subset=['movie_id']),
+                            .drop_duplicates(subset=['movie_id'], keep='last'),
                 'movie_genre': pd.DataFrame(
                         [(row['id'], g['id']) for _, row in df.iterrows() for g in row['genres']], 
                         columns=['movie_id', 'genre_id']
                     ).drop_duplicates()
             },
 
-            'actor_details': lambda df: {
-                'actor': df[['id', 'name', 'gender', 'birthday', 'deathday', 'popularity', 'place_of_birth']]
-                            .rename(columns={'id': 'actor_id'})
-                            .replace({'gender': {0: 'Not set / not specified', 1: 'Female', 2: 'Male', 3: 'Non-binary'}})  
-                            .drop_duplicates(subset=['actor_id'])
+            # Per-role collections of older crawls
+            'actor_details': lambda df: {'actor': person_table(df, 'actor_id')},
+            'director_details': lambda df: {'director': person_table(df, 'director_id')},
+
+            # One document per person fetched, with the roles of their credits
+            'person_details': lambda df: {
+                table: person_table(df[df['roles'].apply(lambda roles: isinstance(roles, list) and table in roles)], f'{table}_id')
+                for table in ('actor', 'director')
             },
-            
-            'director_details': lambda df: {
-                'director': df[['id', 'name', 'gender', 'birthday', 'deathday', 'popularity', 'place_of_birth']]
-                            .rename(columns={'id': 'director_id'})
-                            .replace({'gender': {0: 'Not set / not specified', 1: 'Female', 2: 'Male', 3: 'Non-binary'}})
-                            .drop_duplicates(subset=['director_id'])
-            },  
-            
+
             'movie_actor_credits': lambda df: {
                 'movie_cast': df[['id', 'character', 'order', 'movie_tmdb_id']]
                             .rename(columns={'id': 'actor_id', 'order': 'order_num', 'movie_tmdb_id': 'movie_id'})
@@ -154,19 +219,31 @@ class MongoDataExtractor:
         }
 
         transformed_data = {}
-        # Load movie_details once to use for mapping
-        movie_details_df = self.load_collection_as_dataframe('movie_details')[['id', 'imdb_id']]
+        # Load movie_details once to use for mapping (the pushdown maps the ids in MongoDB)
+        if not self.can_push_down(REVIEWS_COLLECTION):
+            movie_details_df = self.load_collection_as_dataframe('movie_details')[['id', 'imdb_id']]
 
         # Process each collection and apply transformations
+        processed = []
         for collection, transform_func in transformations.items():
+            if self.can_push_down(collection):
+                if collection == 'movie_genres' and self.check_and_mark_processed('movie_genres'):
+                    continue
+                add_tables(self.aggregate_collection(collection))
+                processed.append(collection)
+                continue
+
             df = self.load_collection_as_dataframe(collection)
             if not df.empty:
                 collection_data = transform_func(df)
                 if collection_data is not None:
-                    transformed_data.update(collection_data)
+                    add_tables(collection_data)
+                processed.append(collection)
 
-                if collection not in ['movie_genres', 'processing_flags', 'top_popular_movies', 'top_popular_movies_details']:
-                    self.db[collection].delete_many({})
+        # Empty the staging collections once everything is transformed (the reviews lookup reads movie_details)
+        for collection in processed:
+            if self.lake is None and collection not in ['movie_genres', 'processing_flags', 'top_popular_movies', 'top_popular_movies_details']:
+                self.db[collection].delete_many({})
 
         # Check and mark processed for movie_genres at the end of processing
         self.check_and_mark_processed('movie_genres')
@@ -0,0 +1,106 @@
+"""
+Aggregation pipelines of the pushdown transform: MongoDB does the projections, the dedup of refetched
+versions, the genre unwinding and the imdb -> tmdb id lookup of the reviews, and only the final rows
+of each table reach Python. Requires MongoDB 5.0+ ($lookup with both localField and pipeline).
+"""
+from etl.review_store import REVIEWS_COLLECTION
+
+GENDERS = {0: 'Not set / not specified', 1: 'Female', 2: 'Male', 3: 'Non-binary'}
+POSTER_URL_PREFIX = 'https://image.tmdb.org/t/p/w500'
+
+TABLE_COLUMNS = {
+    'genre': ['genre_id', 'name'],
+    'movie': ['movie_id', 'title', 'budget', 'homepage', 'overview', 'popularity', 'poster_path', 'release_date',
+              'revenue', 'runtime', 'status', 'tagline', 'vote_average', 'vote_count'],
+    'movie_genre': ['movie_id', 'genre_id'],
+    'actor': ['actor_id', 'name', 'gender', 'birthday', 'deathday', 'popularity', 'place_of_birth'],
+    'director': ['director_id', 'name', 'gender', 'birthday', 'deathday', 'popularity', 'place_of_birth'],
+    'movie_cast': ['actor_id', 'character', 'order_num', 'movie_id'],
+    'movie_direction': ['director_id', 'known_for_department', 'movie_id'],
+    'review': ['movie_id', 'review_id', 'review_summary', 'review_text', 'rating', 'author', 'date', 'helpful', 'not_helpful'],
+}
+
+# Indexes the pipelines rely on: the review -> movie id lookups
+PUSHDOWN_INDEXES = {
+    'movie_details': [('imdb_id', 1)],
+    'top_popular_movies_details': [('imdb_id', 1)],
+}
+
+def latest_version(key, fields):
+    """One row per key with the fields of its last inserted version (refetched details come after the older ones)."""
+    return [
+        {'$sort': {'_id': 1}},
+        {'$group': {'_id': f'${key}', **{field: {'$last': f'${field}'} for field in fields}}},
+    ]
+
+def distinct_rows(fields):
+    """Deduplicate rows on all their fields. fields maps the output column to its source field."""
+    return [
+        {'$group': {'_id': {column: f'${source}' for column, source in fields.items()}}},
+        {'$replaceRoot': {'newRoot': '$_id'}},
+    ]
+
+def person_pipeline(id_column):
+    fields = ['name', 'gender', 'birthday', 'deathday', 'popularity', 'place_of_birth']
+    return latest_version('id', fields) + [
+        {'$project': {'_id': 0, id_column: '$_id', **{field: 1 for field in fields}}},
+    ]
+
+def lookup_movie_id(collection, output):
+    """Tmdb id of the review's movie, looked up by imdb_id in collection."""
+    return {'$lookup': {'from': collection, 'localField': 'Movie ID', 'foreignField': 'imdb_id',
+                        'pipeline': [{'$project': {'_id': 0, 'id': 1}}, {'$limit': 1}], 'as': output}}
+
+MOVIE_FIELDS = ['title', 'budget', 'homepage', 'overview', 'popularity', 'poster_path', 'release_date', 'revenue',
+                'runtime', 'status', 'tagline', 'vote_average', 'vote_count']
+
+PIPELINES = {
+    'movie_genres': {
+        'genre': latest_version('id', ['name']) + [{'$project': {'_id': 0, 'genre_id': '$_id', 'name': 1}}],
+    },
+    'movie_details': {
+        'movie': latest_version('id', MOVIE_FIELDS) + [
+            {'$project': {'_id': 0, 'movie_id': '$_id', **{field: 1 for field in MOVIE_FIELDS},
+                          'poster_path': {'$cond': [{'$in': ['$poster_path', [None, '']]}, None,
+                                                    {'$concat': [POSTER_URL_PREFIX, '$poster_path']}]}}},
+        ],
+        'movie_genre': [
+            {'$project': {'_id': 0, 'id': 1, 'genres.id': 1}},
+            {'$unwind': '$genres'},
+        ] + distinct_rows({'movie_id': 'id', 'genre_id': 'genres.id'}),
+    },
+    'actor_details': {'actor': person_pipeline('actor_id')},
+    'director_details': {'director': person_pipeline('director_id')},
+    'person_details': {
+        'actor': [{'$match': {'roles': 'actor'}}] + person_pipeline('actor_id'),
+        'director': [{'$match': {'roles': 'director'}}] + person_pipeline('director_id'),
+    },
+    'movie_actor_credits': {
+        'movie_cast': distinct_rows({'actor_id': 'id', 'character': 'character', 'order_num': 'order', 'movie_id': 'movie_tmdb_id'}),
+    },
+    'movie_director_credits': {
+        'movie_direction': distinct_rows({'director_id': 'id', 'known_for_department': 'known_for_department',
+                                          'movie_id': 'movie_tmdb_id'}),
+    },
+    # Flat review documents only: they are unique per (Movie ID, review_hash) by index already
+    REVIEWS_COLLECTION: {
+        'review': [
+            {'$match': {'Reviews': {'$exists': False}}},
+            lookup_movie_id('movie_details', 'details'),
+            lookup_movie_id('top_popular_movies_details', 'top_details'),
+            {'$project': {
+                '_id': 0,
+                'movie_id': {'$ifNull': [{'$arrayElemAt': ['$details.id', 0]}, {'$arrayElemAt': ['$top_details.id', 0]}]},
+                'review_id': '$review_hash',
+                'review_summary': '$Review Summary',
+                'review_text': '$Review',
+                'rating': '$Rating',
+                'author': '$Author',
+                'date': {'$cond': [{'$eq': ['$Date', '']}, None, '$Date']},
+                'helpful': '$Helpful',
+                'not_helpful': '$Not Helpful',
+            }},
+            {'$match': {'movie_id': {'$ne': None}}},
+        ],
+    },
+}
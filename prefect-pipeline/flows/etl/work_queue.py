@@ -0,0 +1,208 @@
+from datetime import datetime, timedelta, timezone
+from pymongo import ReturnDocument, UpdateOne
+from concurrent.futures import ThreadPoolExecutor
+import os
+import socket
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+VISIBILITY_TIMEOUT = float(os.getenv('CRAWL_JOB_VISIBILITY_TIMEOUT', '300'))  # Seconds a lease lasts without heartbeat
+MAX_ATTEMPTS = int(os.getenv('CRAWL_JOB_MAX_ATTEMPTS', '5'))
+RETRY_DELAY = float(os.getenv('CRAWL_JOB_RETRY_DELAY', '30'))  # Seconds before the first retry, doubled after each
+POLL_SECONDS = float(os.getenv('CRAWL_WORKER_POLL_SECONDS', '2'))
+
+class WorkQueue:
+    """
+    Jobs stored in MongoDB and leased atomically by any number of workers. A leased job is invisible to the
+    other workers until its lease expires: workers extend it while they run the job (LeaseHeartbeat), so
+    the jobs of a worker that died are leased again after visibility_timeout.
+    """
+
+    def __init__(self, db, name='crawl_jobs', visibility_timeout=VISIBILITY_TIMEOUT, max_attempts=MAX_ATTEMPTS,
+                 retry_delay=RETRY_DELAY):
+        self.jobs = db[name]
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.jobs.create_index([('run_key', 1), ('kind', 1), ('key', 1)], unique=True)
+        self.jobs.create_index([('status', 1), ('available_at', 1)])
+        self.jobs.create_index([('status', 1), ('lease_expires_at', 1)])
+
+    def _now(self):
+        return datetime.now(timezone.utc)
+
+    def enqueue(self, run_key, kind, keys, requeue_done=False):
+        """
+        Add a job of kind per key to the run. Jobs already in the queue are kept as they are, except with
+        requeue_done, for keys the crawl ledger still reports as pending: their done jobs are run again.
+        """
+        now = self._now()
+        operations = []
+        for key in keys:
+            if requeue_done:
+                operations.append(UpdateOne(
+                    {'run_key': run_key, 'kind': kind, 'key': key, 'status': DONE},
+                    {'$set': {'status': PENDING, 'attempts': 0, 'available_at': now, 'error': None}}
+                ))
+            operations.append(UpdateOne(
+                {'run_key': run_key, 'kind': kind, 'key': key},
+                {'$setOnInsert': {'status': PENDING, 'attempts': 0, 'available_at': now, 'created_at': now}},
+                upsert=True
+            ))
+        if operations:
+            self.jobs.bulk_write(operations, ordered=False)
+        return len(keys)
+
+    def lease(self, worker_id, run_key=None, kinds=None):
+        """Lease the next due job (pending, or leased by a worker whose lease expired), or return None."""
+        now = self._now()
+        query = {
+            '$or': [{'status': PENDING, 'available_at': {'$lte': now}},
+                    {'status': LEASED, 'lease_expires_at': {'$lte': now}}],
+            'attempts': {'$lt': self.max_attempts},
+        }
+        if run_key is not None:
+            query['run_key'] = run_key
+        if kinds:
+            query['kind'] = {'$in': list(kinds)}
+        return self.jobs.find_one_and_update(
+            query,
+            {'$set': {'status': LEASED, 'lease_owner': worker_id, 'leased_at': now,
+                      'lease_expires_at': now + timedelta(seconds=self.visibility_timeout)},
+             '$inc': {'attempts': 1}},
+            sort=[('available_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def heartbeat(self, job, worker_id):
+        """Extend the lease of a job. Returns False if the worker lost it."""
+        now = self._now()
+        result = self.jobs.update_one(
+            {'_id': job['_id'], 'status': LEASED, 'lease_owner': worker_id},
+            {'$set': {'lease_expires_at': now + timedelta(seconds=self.visibility_timeout), 'heartbeat_at': now}}
+        )
+        return result.modified_count == 1
+
+    def complete(self, job, worker_id):
+        """Mark a leased job as done. Returns False if the worker lost the lease in the meantime."""
+        result = self.jobs.update_one(
+            {'_id': job['_id'], 'status': LEASED, 'lease_owner': worker_id},
+            {'$set': {'status': DONE, 'error': None, 'finished_at': self._now()}}
+        )
+        return result.modified_count == 1
+
+    def fail(self, job, worker_id, error):
+        """Schedule a retry of a leased job with exponential backoff, or mark it failed after max_attempts."""
+        now = self._now()
+        update = {'error': str(error), 'finished_at': now}
+        if job['attempts'] >= self.max_attempts:
+            update['status'] = FAILED
+        else:
+            update['status'] = PENDING
+            update['available_at'] = now + timedelta(seconds=self.retry_delay * 2 ** (job['attempts'] - 1))
+        result = self.jobs.update_one({'_id': job['_id'], 'status': LEASED, 'lease_owner': worker_id}, {'$set': update})
+        return result.modified_count == 1
+
+    def reap_expired(self):
+        """Mark failed the expired leases of jobs that used all their attempts."""
+        result = self.jobs.update_many(
+            {'status': LEASED, 'lease_expires_at': {'$lte': self._now()}, 'attempts': {'$gte': self.max_attempts}},
+            {'$set': {'status': FAILED, 'error': 'Lease expired'}}
+        )
+        return result.modified_count
+
+    def retry_failed(self, run_key):
+        """Give the failed jobs of a run a new set of attempts."""
+        result = self.jobs.update_many(
+            {'run_key': run_key, 'status': FAILED},
+            {'$set': {'status': PENDING, 'attempts': 0, 'available_at': self._now()}}
+        )
+        return result.modified_count
+
+    def is_drained(self, run_key):
+        """Check if the run has no job left to run (pending, retrying or leased)."""
+        self.reap_expired()
+        return self.jobs.find_one({'run_key': run_key, 'status': {'$in': [PENDING, LEASED]}}, {'_id': 1}) is None
+
+    def counts(self, run_key):
+        """Count the jobs of a run per kind and status."""
+        counts = {}
+        for row in self.jobs.aggregate([{'$match': {'run_key': run_key}},
+                                        {'$group': {'_id': {'kind': '$kind', 'status': '$status'}, 'count': {'$sum': 1}}}]):
+            counts.setdefault(row['_id']['kind'], {})[row['_id']['status']] = row['count']
+        return counts
+
+class LeaseHeartbeat(threading.Thread):
+    """Extend the lease of a job every third of the visibility timeout while it runs."""
+
+    def __init__(self, queue, job, worker_id):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job = job
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.lost = False
+
+    def run(self):
+        while not self.stopped.wait(self.queue.visibility_timeout / 3):
+            try:
+                if not self.queue.heartbeat(self.job, self.worker_id):
+                    self.lost = True
+                    logging.warning(f"Lost the lease of job {self.job['kind']} {self.job['key']}.")
+                    return
+            except Exception as e:
+                logging.error(f"Heartbeat of job {self.job['kind']} {self.job['key']} failed: {e}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.join()
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def run_job(queue, handlers, job, worker_id):
+    """Run a leased job with its handler and record the outcome. Returns True if it succeeded."""
+    try:
+        with LeaseHeartbeat(queue, job, worker_id):
+            handlers[job['kind']](job)
+    except Exception as e:
+        logging.error(f"Job {job['kind']} {job['key']} failed (attempt {job['attempts']}/{queue.max_attempts}): {e}")
+        queue.fail(job, worker_id, e)
+        return False
+    queue.complete(job, worker_id)
+    return True
+
+def work(queue, handlers, worker_id=None, threads=1, run_key=None, drain=False, poll_seconds=POLL_SECONDS):
+    """
+    Lease and run the jobs of the kinds in handlers ({kind: handler(job)}) on threads threads.
+    Runs forever, or with drain until run_key has no job left. Returns the number of jobs that succeeded.
+    """
+    worker_id = worker_id or default_worker_id()
+
+    def work_thread(thread_id):
+        thread_worker_id = f"{worker_id}-{thread_id}"
+        succeeded = 0
+        while True:
+            job = queue.lease(thread_worker_id, run_key=run_key, kinds=list(handlers))
+            if job is not None:
+                succeeded += run_job(queue, handlers, job, thread_worker_id)
+            elif drain and queue.is_drained(run_key):
+                return succeeded
+            else:
+                time.sleep(poll_seconds)
+
+    logging.info(f"Worker {worker_id} running {', '.join(handlers)} jobs on {threads} threads.")
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        return sum(executor.map(work_thread, range(threads)))
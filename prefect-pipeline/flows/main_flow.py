@@ -1,22 +1,19 @@
 from prefect import task, flow, serve
 from prefect.client.schemas.schedules import IntervalSchedule
-from etl.fetch_data import fetch_and_save_movie_data
-from etl.update_data import update_reviews 
-from etl.transform import MongoDataExtractor  
-from etl.load_data import load_data_to_postgres  
-import pymongo
-import pandas as pd
+from config import load_config
+from monitoring.metrics import stage_timer, reset_run_summary, publish_run_artifact, start_metrics_server
 import os
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 import logging
-from dotenv import load_dotenv
 
-load_dotenv()
-logging.basicConfig(level=logging.INFO)
+# Every flow run process imports this module: the ETL modules (selenium, pandas, pymongo, psycopg2...)
+# are imported by the tasks that use them, see bench/import_time.py
+load_config()
 
 # Connect to MongoDB and TMDB API
 def connect_mongodb_and_tmdb_api():
+    import pymongo
     mongo_uri = os.getenv('MONGO_URI')
     client = pymongo.MongoClient(mongo_uri)
     db_name = os.getenv('MONGODB_DATABASE', 'default_db_name').replace(' ', '_')
@@ -26,51 +23,113 @@ def connect_mongodb_and_tmdb_api():
     return db, tmdb_api_key
 
 @task(retries=2)
-def fetch_movie_data(release_date_from, release_date_to):
+def fetch_movie_data(release_date_from, release_date_to, retry_failed_only=False, shard_days=None, max_workers=1,
+                     distributed=None):
     """Fetch movie data and save it to MongoDB."""
-    fetch_and_save_movie_data(release_date_from, release_date_to)
+    from etl.fetch_data import fetch_and_save_movie_data
+    with stage_timer('fetch'):
+        fetch_and_save_movie_data(release_date_from, release_date_to, retry_failed_only, shard_days, max_workers, distributed)
 
 @task(retries=2)
 def update_movie_reviews(release_date_from, release_date_to):
     """Check the existence of the top popular movies collection"""
+    from etl.update_data import update_reviews
     db, tmdb_api_key=connect_mongodb_and_tmdb_api()
-    update_reviews(db, tmdb_api_key, release_date_from, release_date_to)
+    with stage_timer('update_reviews'):
+        update_reviews(db, tmdb_api_key, release_date_from, release_date_to)
 
 @task(retries=2)
-def transform_data():
-    """Transform data from MongoDB into a format suitable for PostgreSQL."""
-    extractor = MongoDataExtractor()
-    transformed_data = extractor.process_all_collections()
-    return transformed_data
+def refresh_details():
+    """Refetch the movies and people that changed on TMDB since the last refresh."""
+    from etl.refresh_data import refresh_changed_details
+    db, tmdb_api_key=connect_mongodb_and_tmdb_api()
+    with stage_timer('refresh_details'):
+        refresh_changed_details(db, tmdb_api_key)
+
+@task(retries=2)
+def transform_data(replay=False, replay_from=None, replay_to=None):
+    """Transform data from MongoDB (or the raw lake when replaying) and stage each table as Parquet files."""
+    from etl.transform import MongoDataExtractor
+    from etl.parquet_store import create_run_dir, write_tables
+    with stage_timer('transform'):
+        extractor = MongoDataExtractor(replay=replay, replay_from=replay_from, replay_to=replay_to)
+        transformed_data = extractor.process_all_collections()
+
+        # Pass only the staging paths between tasks, not the DataFrames
+        run_dir = create_run_dir()
+        return {'run_dir': run_dir, 'tables': write_tables(transformed_data, run_dir)}
+
+@task(retries=2)
+def analyze_reviews(staged_data):
+    """Score sentiment, language and keywords of the staged reviews not scored yet."""
+    from etl.review_features import build_review_features
+    with stage_timer('review_features'):
+        review_dir = staged_data['tables'].get('review')
+        features_dir = build_review_features(review_dir, staged_data['run_dir']) if review_dir else None
+    if features_dir:
+        staged_data['tables']['review_features'] = features_dir
+    return staged_data
 
 @task(retries=2)
-def load_data(transformed_data):
-    """Load transformed data into PostgreSQL."""
-    for table_name, data in transformed_data.items():
-        if isinstance(data, pd.DataFrame) and not data.empty:
-            load_data_to_postgres(data, table_name)
+def load_data(staged_data):
+    """Load staged tables into PostgreSQL."""
+    from etl.load_data import load_tables
+    from etl.parquet_store import remove_run_dir
+    with stage_timer('load'):
+        try:
+            load_tables(staged_data['tables'])
+        except Exception:
+            # Tables already loaded are marked in the run dir and skipped on retry
+            logging.error(f"Keeping the staged tables in {staged_data['run_dir']} for a retry.")
+            raise
+    remove_run_dir(staged_data['run_dir'])
+
+@task
+def reset_tables():
+    """Empty the warehouse tables before a rebuild."""
+    from etl.load_data import truncate_tables, TABLE_QUERIES
+    truncate_tables(list(TABLE_QUERIES))
 
 @flow(name="manually-ETL-pipeline", log_prints=True)
-def manually_etl_pipeline(release_date_from, release_date_to):
-    fetch_movie_data(release_date_from, release_date_to)
-    transformed_data = transform_data()
+def manually_etl_pipeline(release_date_from, release_date_to, retry_failed_only=False, shard_days=None, max_workers=1,
+                          distributed=None):
+    # Set shard_days (e.g. 1 or 7) and max_workers for large backfills, distributed to share the crawl with the crawl workers
+    reset_run_summary()
+    fetch_movie_data(release_date_from, release_date_to, retry_failed_only, shard_days, max_workers, distributed)
+    transformed_data = analyze_reviews(transform_data())
     load_data(transformed_data)
+    publish_run_artifact("manually-ETL-pipeline")
 
 @flow(name="ETL-pipeline", log_prints=True)
 def movie_etl_pipeline():
     release_date_from = (datetime.now() - timedelta(days=6)).strftime('%Y-%m-%d')
     release_date_to = datetime.now().strftime('%Y-%m-%d')
 
+    reset_run_summary()
     fetch_movie_data(release_date_from, release_date_to)
     update_movie_reviews(release_date_from, release_date_to)
-    transformed_data = transform_data()
+    refresh_details()
+    transformed_data = analyze_reviews(transform_data())
     load_data(transformed_data)
+    publish_run_artifact("ETL-pipeline")
+
+@flow(name="replay-ETL-pipeline", log_prints=True)
+def replay_etl_pipeline(replay_from=None, replay_to=None, rebuild=True):
+    """Rebuild the PostgreSQL tables from the raw lake, without any network access to TMDB/IMDb."""
+    reset_run_summary()
+    if rebuild:
+        reset_tables()
+    staged_data = analyze_reviews(transform_data(replay=True, replay_from=replay_from, replay_to=replay_to))
+    load_data(staged_data)
+    publish_run_artifact("replay-ETL-pipeline")
 
 if __name__ == "__main__":
     """Main ETL pipeline for movie data"""
     pipeline_1 = manually_etl_pipeline.to_deployment(name="Manually ETL Pipeline",
                                                      tags=["pipeline1"],
-                                                     parameters={"release_date_from": '2024-01-01', "release_date_to": '2024-01-02'})
+                                                     parameters={"release_date_from": '2024-01-01', "release_date_to": '2024-01-02',
+                                                                 "retry_failed_only": False, "shard_days": None, "max_workers": 1,
+                                                                 "distributed": None})
     # Get time for schedule
     anchor_date_str = os.getenv("ANCHOR_DATE", "2024-11-29 10:00:00")  
     timezone_str = os.getenv("TIMEZONE", "Asia/Saigon")
@@ -94,4 +153,10 @@ if __name__ == "__main__":
         ]
     )
     
-    serve(pipeline_1, pipeline_2)
\ No newline at end of file
+    pipeline_3 = replay_etl_pipeline.to_deployment(name="Replay ETL Pipeline",
+                                                   tags=["pipeline3"],
+                                                   parameters={"replay_from": None, "replay_to": None, "rebuild": True})
+
+    # Prometheus endpoint of the serving process (METRICS_PORT, default 9108)
+    start_metrics_server()
+    serve(pipeline_1, pipeline_2, pipeline_3)
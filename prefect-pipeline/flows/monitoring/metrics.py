@@ -0,0 +1,160 @@
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, start_http_server
+from prometheus_client import multiprocess
+from contextlib import contextmanager
+import os
+import resource
+import threading
+import time
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+STAGE_BUCKETS = (1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+MOVIE_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram('pipeline_stage_seconds', 'Duration of pipeline stages.', ['stage'], buckets=STAGE_BUCKETS)
+MOVIE_STAGE_SECONDS = Histogram('pipeline_movie_stage_seconds', 'Duration of the crawl stages of one movie.', ['stage'], buckets=MOVIE_BUCKETS)
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests sent, by endpoint and status.', ['endpoint', 'status'])
+HTTP_RETRIES = Counter('http_retries_total', 'HTTP requests retried, by endpoint.', ['endpoint'])
+HTTP_RATE_LIMITED = Counter('http_rate_limited_total', 'HTTP 429 responses, by endpoint.', ['endpoint'])
+BROWSER_LAUNCHES = Counter('browser_launches_total', 'Chrome sessions started, by scraper.', ['scraper'])
+REVIEWS_PARSED = Counter('reviews_parsed_total', 'Reviews parsed from IMDb pages.')
+DOCUMENTS_WRITTEN = Counter('mongo_documents_written_total', 'Documents written to MongoDB, by collection.', ['collection'])
+ROWS_LOADED = Counter('postgres_rows_loaded_total', 'Rows loaded into PostgreSQL, by table.', ['table'])
+PEAK_RSS = Gauge('process_peak_rss_bytes', 'Peak resident set size of the process.', multiprocess_mode='max')
+
+_lock = threading.Lock()
+_server_started = False
+
+def _new_summary():
+    return {'started': time.time(), 'stages': {}, 'movie_stages': {}, 'slowest_movies': [], 'counters': {}}
+
+# In-process summary of the current flow run, published as a Prefect artifact
+_summary = _new_summary()
+
+def reset_run_summary():
+    """Start a new per-run summary (Prometheus metrics keep accumulating)."""
+    global _summary
+    with _lock:
+        _summary = _new_summary()
+
+def _add_timing(timings, key, seconds):
+    count, total, longest = timings.get(key, (0, 0.0, 0.0))
+    timings[key] = (count + 1, total + seconds, max(longest, seconds))
+
+def _count(name, amount=1):
+    with _lock:
+        _summary['counters'][name] = _summary['counters'].get(name, 0) + amount
+
+def update_peak_rss():
+    """Record the peak RSS of the process (ru_maxrss is in KB on Linux)."""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    PEAK_RSS.set(peak_rss)
+    return peak_rss
+
+@contextmanager
+def stage_timer(stage):
+    """Time a pipeline stage (fetch, update_reviews, transform, load...)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+        with _lock:
+            _add_timing(_summary['stages'], stage, seconds)
+        update_peak_rss()
+
+@contextmanager
+def movie_timer(imdb_id, stage):
+    """Time one crawl stage of one movie, keeping the slowest movies for the run summary."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        MOVIE_STAGE_SECONDS.labels(stage=stage).observe(seconds)
+        with _lock:
+            _add_timing(_summary['movie_stages'], stage, seconds)
+            slowest = _summary['slowest_movies']
+            slowest.append((seconds, imdb_id, stage))
+            slowest.sort(reverse=True)
+            del slowest[10:]
+
+def record_http_request(endpoint, status):
+    HTTP_REQUESTS.labels(endpoint=endpoint, status=str(status)).inc()
+    _count(f'http {endpoint} {status}')
+
+def record_http_retry(endpoint):
+    HTTP_RETRIES.labels(endpoint=endpoint).inc()
+    _count(f'http retries {endpoint}')
+
+def record_rate_limited(endpoint):
+    HTTP_RATE_LIMITED.labels(endpoint=endpoint).inc()
+    _count(f'http 429s {endpoint}')
+
+def record_browser_launch(scraper):
+    BROWSER_LAUNCHES.labels(scraper=scraper).inc()
+    _count(f'browser launches {scraper}')
+
+def record_reviews_parsed(count):
+    REVIEWS_PARSED.inc(count)
+    _count('reviews parsed', count)
+
+def record_documents_written(collection, count):
+    DOCUMENTS_WRITTEN.labels(collection=collection).inc(count)
+    _count(f'documents written {collection}', count)
+
+def record_rows_loaded(table, count):
+    ROWS_LOADED.labels(table=table).inc(count)
+    _count(f'rows loaded {table}', count)
+
+def start_metrics_server(port=None):
+    """
+    Expose the metrics in Prometheus format from this process.
+    With PROMETHEUS_MULTIPROC_DIR set, the metrics of the flow-run subprocesses are aggregated too.
+    """
+    global _server_started
+    if _server_started:
+        return
+    port = int(port or os.getenv('METRICS_PORT', '9108'))
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        start_http_server(port, registry=registry)
+    else:
+        start_http_server(port)
+    _server_started = True
+    logging.info(f"Serving Prometheus metrics on port {port}.")
+
+def run_summary_markdown(title):
+    """Render the current run summary as a Markdown report."""
+    peak_rss = update_peak_rss()
+    with _lock:
+        summary = {key: (dict(value) if isinstance(value, dict) else list(value) if isinstance(value, list) else value)
+                   for key, value in _summary.items()}
+
+    lines = [f"# {title}", "", f"Wall time: {time.time() - summary['started']:.1f} s, peak RSS: {peak_rss / 2 ** 20:.0f} MiB", ""]
+    for heading, timings in (("Stages", summary['stages']), ("Per-movie stages", summary['movie_stages'])):
+        if timings:
+            lines += [f"## {heading}", "", "| Stage | Count | Total (s) | Mean (s) | Max (s) |", "|---|---|---|---|---|"]
+            lines += [f"| {stage} | {count} | {total:.1f} | {total / count:.2f} | {longest:.1f} |"
+                      for stage, (count, total, longest) in sorted(timings.items())]
+            lines.append("")
+    if summary['slowest_movies']:
+        lines += ["## Slowest movies", "", "| Movie | Stage | Seconds |", "|---|---|---|"]
+        lines += [f"| {imdb_id} | {stage} | {seconds:.1f} |" for seconds, imdb_id, stage in summary['slowest_movies']]
+        lines.append("")
+    if summary['counters']:
+        lines += ["## Counters", "", "| Counter | Value |", "|---|---|"]
+        lines += [f"| {name} | {value} |" for name, value in sorted(summary['counters'].items())]
+    return '\n'.join(lines)
+
+def publish_run_artifact(flow_name):
+    """Attach the run summary to the current Prefect flow run as a Markdown artifact."""
+    from prefect.artifacts import create_markdown_artifact
+    try:
+        create_markdown_artifact(key=f"{flow_name.lower()}-metrics", markdown=run_summary_markdown(f"{flow_name} metrics"),
+                                 description="Stage timings and counters of this run")
+    except Exception as e:
+        logging.error(f"Error publishing metrics artifact: {e}")
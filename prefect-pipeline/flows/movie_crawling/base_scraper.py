@@ -1,16 +1,60 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
+from monitoring.metrics import record_browser_launch
+from functools import lru_cache
+import logging
+import os
+import shutil
+
+IMDB_BASE_URL = os.getenv('IMDB_BASE_URL', 'https://www.imdb.com').rstrip('/')  # Override to scrape a local fixture server
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Safari/537.36"
+
+# Requests the scrapers never need: images, fonts, media and ad/tracker domains
+BLOCKED_URL_PATTERNS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.m3u8',
+    '*doubleclick.net*', '*googlesyndication.com*', '*google-analytics.com*', '*googletagmanager.com*',
+    '*amazon-adsystem.com*', '*scorecardresearch.com*', '*facebook.net*', '*quantserve.com*', '*adsrvr.org*',
+    '*fls-na.amazon.com*', '*unagi.amazon.com*', '*cloudfront-labs.amazonaws.com*',
+]
+# Stylesheets are only blocked on request (LEAN_BROWSER_BLOCK_CSS=1): some layouts need them for the buttons to be clickable
+STYLESHEET_URL_PATTERNS = ['*.css']
+
+@lru_cache(maxsize=1)
+def get_chromedriver_path():
+    """Resolve the chromedriver binary once per process: pinned CHROMEDRIVER_PATH, else webdriver-manager, else PATH."""
+    pinned_path = os.getenv('CHROMEDRIVER_PATH')
+    if pinned_path:
+        return pinned_path
+    try:
+        return ChromeDriverManager().install()  # Checks the online versions, hence only once
+    except Exception as e:
+        local_path = shutil.which('chromedriver')
+        if local_path is None:
+            raise
+        logging.warning(f"webdriver-manager failed ({e}), using {local_path}.")
+        return local_path
+
+def is_lean_browser():
+    return os.getenv('LEAN_BROWSER', '1') != '0'
 
 class BaseScraper:
-    def __init__(self):
-        self.driver = self.init_driver()
+    def __init__(self, start_driver=True):
+        # Subclasses that can work over plain HTTP start the browser lazily
+        self.driver = self.init_driver() if start_driver else None
+
+    def ensure_driver(self):
+        """Start the browser if it is not running yet."""
+        if self.driver is None:
+            self.driver = self.init_driver()
+        return self.driver
 
     def init_driver(self):
-        # Auto download suitable chromedriver 
-        service = Service(ChromeDriverManager().install())
+        service = Service(get_chromedriver_path())
         options = webdriver.ChromeOptions()
-        
+
         # Set Chrome options to reduce memory usage
         options.add_argument("--headless")
         options.add_argument('--disable-extensions')
@@ -22,10 +66,35 @@ class BaseScraper:
         options.add_experimental_option("excludeSwitches", ["enable-automation"])
         options.add_experimental_option("useAutomationExtension", False)
         options.add_argument("--window-position=-2400,-2400")
-        options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/96.0.4664.45 Safari/537.36")
+        options.add_argument(f"user-agent={USER_AGENT}")
+
+        lean = is_lean_browser()
+        if lean:
+            # Lean profile: no image decoding and no background services
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+            options.add_argument("--disable-background-networking")
+            options.add_argument("--disable-default-apps")
+            options.add_argument("--disable-sync")
+            options.add_argument("--disable-features=Translate,MediaRouter,OptimizationHints")
+            options.add_argument("--mute-audio")
+            options.add_argument("--no-first-run")
 
         driver = webdriver.Chrome(service=service, options=options)
+        if lean:
+            self._block_requests(driver)
+        record_browser_launch(type(self).__name__)
         return driver
 
+    def _block_requests(self, driver):
+        """Drop the non-essential requests in the browser itself, through CDP."""
+        patterns = list(BLOCKED_URL_PATTERNS)
+        if os.getenv('LEAN_BROWSER_BLOCK_CSS') == '1':
+            patterns += STYLESHEET_URL_PATTERNS
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+
     def close_driver(self):
-        self.driver.quit()
+        if self.driver is not None:
+            self.driver.quit()
+            self.driver = None
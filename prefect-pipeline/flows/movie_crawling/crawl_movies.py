@@ -1,84 +1,154 @@
-from .base_scraper import BaseScraper
+from .base_scraper import BaseScraper, IMDB_BASE_URL, USER_AGENT
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import time
 import re
-from tqdm import tqdm  
+import requests
+from tqdm import tqdm
 from bs4 import BeautifulSoup
 from .utils import setup_movies_scraper_logger
-import math
+
+MOVIE_ITEM_SELECTOR = 'li.ipc-metadata-list-summary-item'
+PAGE_SIZE = 50  # Movies per listing page / 'See More' click
+SEE_MORE_XPATH = '//*[@id="__next"]/main/div[2]/div[3]/section/section/div/section/section/div[2]/div/section/div[2]/div[2]/div[2]/div/span/button'
+
+# Return the HTML of the movie items loaded after the first arguments[0] items
+NEW_MOVIE_ITEMS_SCRIPT = (
+    f"return Array.from(document.querySelectorAll('{MOVIE_ITEM_SELECTOR}'))"
+    ".slice(arguments[0]).map(e => e.outerHTML);"
+)
 
 class MoviesScraper(BaseScraper):
     def __init__(self, release_date_from, release_date_to):
-        super().__init__()
+        super().__init__(start_driver=False)  # Browser is only started when the first page is not enough
         self.release_date_from = release_date_from
         self.release_date_to = release_date_to
+        self.url = f'{IMDB_BASE_URL}/search/title/?title_type=feature&release_date={self.release_date_from},{self.release_date_to}'
         self.movie_data = []
+        self.listing_complete = False
         self.logger = setup_movies_scraper_logger()  # Initialize new logger
 
     def fetch_movies(self, limit=None):
-            try:
-                url = f'https://www.imdb.com/search/title/?title_type=feature&release_date={self.release_date_from},{self.release_date_to}'
-                self.driver.get(url)
-
-                try:
-                    # get the element that have the total of movies
-                    total_movies_elements = WebDriverWait(self.driver, 2).until(
-                        EC.presence_of_element_located((By.XPATH, 
-                            '//*[@id="__next"]/main/div[2]/div[3]/section/section/div/section/section/div[2]/div/section/div[2]/div[2]/div[1]/div[1]'))
-                    )
-                    total_movies_text = total_movies_elements.text.split()[-1]
-                    total_movies_found = int(total_movies_text.replace(',', '')) 
-                    self.logger.info("Total reviews found: %s", total_movies_found)
-
-                    if limit is None:
-                        limit = total_movies_found
-                    clicks = math.ceil((limit - 50) / 50)  
-                    self.logger.info("MoviesScraper initialized with %s clicks", clicks)
-
-                except Exception as e:
-                    self.logger.error(f"Error fetching total movies: {str(e)}")
-
-                # clicking for loading more movies
-                with tqdm(total=clicks, desc='Loading movies') as pbar:
-                    for _ in range(clicks):
-                        self.click_see_more_button()
-                        pbar.update(1)
-                        time.sleep(1)  # Optional wait time between clicks
-
-                 # After all clicks, extract movie data
-                html = self.driver.page_source
-                soup = BeautifulSoup(html, 'html.parser')
-                self.extract_movie_data(soup, limit)
-
-                self.logger.info("Completed fetching movies. Total movies: %d", len(self.movie_data))
-            except Exception as e:
-                self.logger.error("Error in fetch_movies: %s", str(e))
-            finally:
-                self.close_driver()
-            return self.movie_data
-
-
-    def click_see_more_button(self):
+        """Fetch the whole movie listing (up to limit movies) as a list. Check listing_complete for a partial listing."""
+        self.movie_data = list(self.iter_movies(limit))
+        self.logger.info("Completed fetching movies. Total movies: %d", len(self.movie_data))
+        return self.movie_data
+
+    def iter_movies(self, limit=None):
+        """
+        Yield movies page by page, stopping as soon as limit movies were yielded.
+        The first page is fetched over plain HTTP; a browser is only started to click 'See More'.
+        Errors are raised to the caller. listing_complete tells whether all limit movies (or, with no limit and
+        an unknown total, every movie up to the last 'See More') were yielded.
+        """
+        self.listing_complete = False
+        yielded = 0
+        total_movies_found = None
+        reached_end = False  # The listing ended without an error: partial page, or no 'See More' button left
+        failed = False
+        try:
+            movies, total_movies_found = self.fetch_first_page()
+            if total_movies_found is not None:
+                self.logger.info("Total movies found: %s", total_movies_found)
+                limit = total_movies_found if limit is None else min(limit, total_movies_found)
+
+            with tqdm(total=limit, desc='Loading movies') as pbar:
+                for movie in movies[:limit]:
+                    yield movie
+                yielded = len(movies[:limit])
+                pbar.update(yielded)
+
+                if limit is not None and yielded >= limit:
+                    return
+                if total_movies_found is None and 0 < len(movies) < PAGE_SIZE:
+                    reached_end = True
+                    return  # A partial first page is the whole listing
+
+                # Load the remaining pages in the browser, parsing only the newly loaded items
+                self.ensure_driver()
+                self.driver.get(self.url)
+                loaded = 0
+                while limit is None or yielded < limit:
+                    new_items = self.driver.execute_script(NEW_MOVIE_ITEMS_SCRIPT, loaded)
+                    start = loaded
+                    loaded += len(new_items)
+
+                    # Skip the movies already yielded from the HTTP page
+                    page = self.parse_movies(BeautifulSoup(''.join(new_items), 'html.parser'))
+                    page = page[max(yielded - start, 0):]
+                    if limit is not None:
+                        page = page[:limit - yielded]
+                    for movie in page:
+                        yield movie
+                    yielded += len(page)
+                    pbar.update(len(page))
+
+                    if limit is not None and yielded >= limit:
+                        break
+                    if not self.click_see_more_button(loaded):
+                        # A click that failed or timed out is not the end of the listing
+                        reached_end = not self.has_see_more_button()
+                        break
+        except Exception as e:
+            failed = True
+            self.logger.error("Error in iter_movies after %d movies: %s", yielded, str(e))
+            raise
+        finally:
+            self.close_driver()
+            if limit is not None and yielded >= limit:
+                self.listing_complete = not failed
+            else:
+                # Short of a known total, or of the caller's limit while the total is unknown
+                self.listing_complete = not failed and total_movies_found is None and reached_end
+            if not failed and not self.listing_complete:
+                self.logger.warning("Listing stopped after %d of %s movies.", yielded, limit or 'an unknown number of')
+
+    def fetch_first_page(self):
+        """
+        Fetch the first listing page over HTTP.
+        Returns the parsed movies and the total number of movies (None if unknown).
+        """
+        try:
+            response = requests.get(self.url, headers={'User-Agent': USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'}, timeout=10)
+            response.raise_for_status()
+        except Exception as e:
+            self.logger.warning("HTTP listing fetch failed, falling back to browser: %s", str(e))
+            return [], None
+
+        soup = BeautifulSoup(response.text, 'html.parser')
+        movies = self.parse_movies(soup)
+
+        # The total is rendered as e.g. "1-50 of 1,234"
+        match = re.search(r'\d[\d,]*\s*-\s*\d[\d,]*\s+of\s+(\d[\d,]*)', soup.get_text(' '))
+        total_movies_found = int(match.group(1).replace(',', '')) if match else None
+        if total_movies_found is None and len(movies) == 0:
+            self.logger.warning("No movies found in the HTTP listing page.")
+        return movies, total_movies_found
+
+    def click_see_more_button(self, loaded=0):
+        """Click 'See More' and wait until more than `loaded` movies are on the page."""
         try:
             see_more_button = WebDriverWait(self.driver, 10).until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="__next"]/main/div[2]/div[3]/section/section/div/section/section/div[2]/div/section/div[2]/div[2]/div[2]/div/span/button'))
+                EC.element_to_be_clickable((By.XPATH, SEE_MORE_XPATH))
             )
             self.driver.execute_script("arguments[0].scrollIntoView(); arguments[0].click();", see_more_button)
+            WebDriverWait(self.driver, 10).until(
+                lambda driver: driver.execute_script(f"return document.querySelectorAll('{MOVIE_ITEM_SELECTOR}').length") > loaded
+            )
             self.logger.info("Clicked 'Load More' button successfully.")
-            
+            return True
         except Exception as e:
             self.logger.warning(f"No more 'See More' buttons found")
-            return None
+            return False
 
-    def extract_movie_data(self, soup, limit):
-        movies = soup.select('li.ipc-metadata-list-summary-item')
-        
-        if limit is not None:
-            movies = movies[:limit]
+    def has_see_more_button(self):
+        """Check if the page still shows a 'See More' button."""
+        return bool(self.driver.find_elements(By.XPATH, SEE_MORE_XPATH))
 
-        for movie in movies:
+    def parse_movies(self, soup):
+        """Parse the movie items of a listing page (or fragment)."""
+        movies = []
+        for movie in soup.select(MOVIE_ITEM_SELECTOR):
             title_tag = movie.select_one('h3.ipc-title__text')
             link_tag = movie.select_one('a.ipc-title-link-wrapper')
 
@@ -92,8 +162,17 @@ class MoviesScraper(BaseScraper):
 
             title = re.sub(r'^\d+\.\s*', '', title)
 
-            self.movie_data.append({
+            movies.append({
                 'Movie ID': movie_id,
                 'Title': title,
             })
-        self.logger.info("Finished extraction of movie data.")
\ No newline at end of file
+        return movies
+
+    def extract_movie_data(self, soup, limit):
+        movies = self.parse_movies(soup)
+
+        if limit is not None:
+            movies = movies[:limit]
+
+        self.movie_data.extend(movies)
+        self.logger.info("Finished extraction of movie data.")
@@ -3,16 +3,37 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import time
-import re
 import math
 from bs4 import BeautifulSoup
-from datetime import datetime
-from .utils import setup_reviews_logger
+from .utils import setup_reviews_logger, review_hash
+from .review_parser import REVIEW_SELECTORS, button_type, convert_to_int, convert_date_format, parse_review, select_reviews
+from .parse_pool import PARSE_CHUNK_SIZE, submit_parse
+from .review_probe import probe_reviews, review_url
+from monitoring.metrics import record_reviews_parsed
+
+ALL_BUTTON_XPATH = '//*[@id="__next"]/main/div/section/div/section/div/div[1]/section[1]/div[3]/div/span[2]/button/span/span'
+MORE_BUTTON_XPATH = '//*[@id="__next"]/main/div/section/div/section/div/div[1]/section[1]/div[3]/div/span[1]/button/span/span'
+LOAD_MORE_XPATH = '//*[@id="load-more-trigger"]'
+REVIEWS_PER_PAGE = 25
+
+# Return the HTML of the last review loaded on the page
+LAST_REVIEW_SCRIPT = (
+    "const items = document.querySelectorAll(arguments[0]);"
+    "return items.length ? items[items.length - 1].outerHTML : null;"
+)
+# Return the HTML of the reviews loaded after the first arguments[1] ones, for the first layout found on the page
+NEW_REVIEWS_SCRIPT = (
+    "for (const selector of arguments[0]) {"
+    "  const items = document.querySelectorAll(selector);"
+    "  if (items.length) return Array.from(items).slice(arguments[1]).map(item => item.outerHTML);"
+    "}"
+    "return [];"
+)
 
 # ReviewsScraper class to fetch reviews for each movie
 class MovieReviewScraper(BaseScraper):
-    def __init__(self, movie_id, total_reviews=0, last_date_review=None):
-        super().__init__()  # Call the base class constructor
+    def __init__(self, movie_id, total_reviews=0, last_date_review=None, last_review_hash=None):
+        super().__init__(start_driver=False)  # Browser is started by fetch_reviews
         self.movie_id = movie_id
         self.clicks = 0  # Initialize click counter
         self.movie_info = { 
@@ -20,7 +41,14 @@ class MovieReviewScraper(BaseScraper):
             'Reviews': []
         }
         self.total_reviews = total_reviews
+        self.observed_total_reviews = None  # Review count read on the page, None until read
         self.last_date_review = last_date_review
+        # Watermark of the newest stored review: incremental crawls stop as soon as they reach it
+        self.last_review_hash = last_review_hash
+
+        # Reviews are parsed on the parse pool while the browser keeps loading pages
+        self.parse_futures = []
+        self.submitted_reviews = 0
 
         self.is_scraping = True  # Flag to manage scraping status
 
@@ -30,16 +58,28 @@ class MovieReviewScraper(BaseScraper):
     def fetch_reviews(self):
             total_reviews = 0
             try:
-                review_url = f"https://www.imdb.com/title/{self.movie_id}/reviews/?sort=submission_date%2Cdesc&dir=desc"
-                self.driver.get(review_url)
+                # Read the review count and the newest review over plain HTTP first: most refreshes have nothing new to load
+                probed_reviews, newest_review = probe_reviews(self.movie_id)
+                if probed_reviews is not None:
+                    self.observed_total_reviews = probed_reviews
+                    if probed_reviews == 0 or self._is_unchanged(probed_reviews, newest_review):
+                        self.logger.info("No new reviews found for Movie ID %s (%d reviews, probed)", self.movie_id, probed_reviews)
+                        return None
 
-                self.logger.info("Accessed URL: %s", review_url)
+                url = review_url(self.movie_id)
+                self.ensure_driver()
+                self.driver.get(url)
+
+                self.logger.info("Accessed URL: %s", url)
 
                 # Check if there are any reviews available
                 total_reviews = self._get_total_reviews()
+                self.observed_total_reviews = total_reviews
                 if total_reviews == 0:
                     self.logger.info("No reviews found for Movie ID %s", self.movie_id)
                     return None
+                if self.is_incremental():
+                    return self._fetch_new_reviews(total_reviews)
                 try:
                     if total_reviews <= self.total_reviews:
                         self.logger.info("No new reviews found for Movie ID %s", self.movie_id)
@@ -57,12 +97,8 @@ class MovieReviewScraper(BaseScraper):
                 wait_time = self._calculate_wait_time(10, self.clicks)  # Adjust wait time based on click count
                 time.sleep(wait_time)
 
-                # Extract reviews from the loaded page
-                html = self.driver.page_source
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Extract reviews for the current movie and accumulate total_reviews
-                self.movie_info, num_reviews = self._extract_reviews(soup, self.movie_id, self.last_date_review, new_reviews_count)
+                # Collect the reviews parsed while the pages were loading, plus the last ones
+                self.movie_info, num_reviews = self._collect_reviews()
 
                 if num_reviews == 0:
                     self.logger.warning(f"No reviews found for Movie ID: {self.movie_id}.")
@@ -72,17 +108,7 @@ class MovieReviewScraper(BaseScraper):
                     self.logger.warning('Missing %d reviews', total_reviews - num_reviews)
                 self.logger.info('Movie %s has %d/%d reviews', self.movie_id, num_reviews, total_reviews)
 
-                # self.movie_info['Last Date Review'] = self.movie_info['Reviews'][0]['Date'] #updating last date review
-                for i in range(len(self.movie_info['Reviews'])):
-                    if 'Date' in self.movie_info['Reviews'][i] and self.movie_info['Reviews'][i]['Date']:
-                        # self.movie_info['Last Date Review'] = self.movie_info['Reviews'][i]['Date'] #updating last date review
-                        self.last_date_review = self.movie_info['Reviews'][i]['Date'] #updating last date review
-
-                        break  
-                    else:
-                        self.logger.warning(f"Review {i} is missing a date.")
-                # self.movie_info['Total Reviews'] = num_reviews #updating new total reviews
-                # self.total_reviews = num_reviews #updating new total reviews
+                self._update_watermark()
 
 
             except Exception as e:
@@ -92,6 +118,91 @@ class MovieReviewScraper(BaseScraper):
                 self.is_scraping = False
             return self.movie_info
 
+    def is_incremental(self):
+        """Only reviews newer than the stored watermark are wanted."""
+        return self.last_date_review is not None or self.last_review_hash is not None
+
+    def _is_unchanged(self, probed_reviews, newest_review):
+        """
+        The probed page shows nothing new: no more reviews than stored, and the newest review is still the watermark.
+        The count alone is not enough, a deleted review and a new one leave it unchanged.
+        """
+        if not self.is_incremental() or newest_review is None or probed_reviews > (self.total_reviews or 0):
+            return False
+        if self.last_review_hash:
+            return review_hash(self.movie_id, newest_review) == self.last_review_hash
+        return newest_review.get('Date') == self.last_date_review
+
+    def _fetch_new_reviews(self, total_reviews):
+        """Incremental mode: load pages until the watermark shows up, then parse only what is above it."""
+        self.total_reviews = total_reviews
+        self._load_until_watermark(math.ceil(total_reviews / REVIEWS_PER_PAGE))
+
+        self.movie_info, num_reviews = self._collect_reviews()
+        if num_reviews == 0:
+            self.logger.info("No new reviews found for Movie ID %s", self.movie_id)
+            return None
+
+        self.logger.info('Movie %s has %d new reviews (%d in total)', self.movie_id, num_reviews, total_reviews)
+        self._update_watermark()
+        return self.movie_info
+
+    def _update_watermark(self):
+        """Move the watermark to the newest dated review just scraped."""
+        for i, review in enumerate(self.movie_info['Reviews']):
+            if review.get('Date') and review['Date'] != 'No date':
+                self.last_date_review = review['Date']  # Reviews are sorted by submission date, newest first
+                self.last_review_hash = review_hash(self.movie_id, review)
+                break
+            self.logger.warning(f"Review {i} is missing a date.")
+
+    def _is_at_or_before_watermark(self, review):
+        """True for the newest stored review and anything older."""
+        if self.last_review_hash and review_hash(self.movie_id, review) == self.last_review_hash:
+            return True
+        date = review.get('Date')
+        if self.last_date_review and date and date != 'No date':
+            # Same-day reviews may still be new: only a strictly older date ends the new reviews
+            return date < self.last_date_review
+        return False
+
+    def _last_loaded_review(self):
+        """Parse only the last review loaded on the page."""
+        for selector in REVIEW_SELECTORS:
+            html = self.driver.execute_script(LAST_REVIEW_SCRIPT, selector)
+            if html:
+                review = BeautifulSoup(html, 'html.parser').select_one(selector)
+                return self._parse_review(review, self._button_type(review))
+        return None
+
+    def _load_until_watermark(self, max_clicks):
+        """Click 'More' one page at a time, and stop as soon as the last loaded review is at or before the watermark."""
+        for _ in range(max_clicks):
+            last_review = self._last_loaded_review()
+            if last_review is None or self._is_at_or_before_watermark(last_review):
+                return
+            if not (self._click_button(MORE_BUTTON_XPATH, 'More') or self._click_button(LOAD_MORE_XPATH, 'Load More')):
+                return
+            self.clicks += 1
+
+    def _click_button(self, xpath, name, wait=5):
+        """Find and click a button if available."""
+        try:
+            button = WebDriverWait(self.driver, wait).until(
+                EC.element_to_be_clickable((By.XPATH, xpath))
+            )
+            self.driver.execute_script(
+                "arguments[0].scrollIntoView({block: 'center'}); arguments[0].click();", 
+                button
+            )
+            time.sleep(4)  # Wait for content to load after clicking
+            self.logger.info(f"Clicked '{name}' button successfully.")
+            self._submit_loaded_reviews()
+            return True
+        except Exception:
+            self.logger.info(f"No '{name}' button found.")
+            return False
+
     def _get_total_reviews(self):
         """Fetch the total number of reviews from the page."""
         try:
@@ -116,40 +227,25 @@ class MovieReviewScraper(BaseScraper):
                 return 0  # Default to 0 if neither element is found
 
     def _load_reviews(self, new_reviews_count):
-        def click_button(xpath, name, wait=5):
-            """Helper function to find and click a button if available."""
-            try:
-                button = WebDriverWait(self.driver, wait).until(
-                    EC.element_to_be_clickable((By.XPATH, xpath))
-                )
-                self.driver.execute_script(
-                    "arguments[0].scrollIntoView({block: 'center'}); arguments[0].click();", 
-                    button
-                )
-                time.sleep(4)  # Wait for content to load after clicking
-                self.logger.info(f"Clicked '{name}' button successfully.")
-                return True
-            except Exception:
-                self.logger.info(f"No '{name}' button found.")
-                return False
+        click_button = self._click_button
         if new_reviews_count <= 0:
             self.logger.info("No new reviews found for Movie ID %s", self.movie_id)
             return
         
         if new_reviews_count > 25:
             # 1. Try clicking the 'All' button first
-            if click_button('//*[@id="__next"]/main/div/section/div/section/div/div[1]/section[1]/div[3]/div/span[2]/button/span/span', 'All'):
+            if click_button(ALL_BUTTON_XPATH, 'All'):
                 self._scroll_to_load_all()  # Scroll if 'All' button is clicked
                 return  # Stop after 'All' is clicked
 
             # 2. Try clicking the 'More' button if it exists
-            if click_button('//*[@id="__next"]/main/div/section/div/section/div/div[1]/section[1]/div[3]/div/span[1]/button/span/span', 'More'):
+            if click_button(MORE_BUTTON_XPATH, 'More'):
                 return # Stop after 'More' is clicked
 
             # 3. Continuously click 'Load More' button until it no longer appears
-            clicks_needed = math.ceil(new_reviews_count / 25)
+            clicks_needed = math.ceil(new_reviews_count / REVIEWS_PER_PAGE)
             for _ in range(clicks_needed):
-                if not click_button('//*[@id="load-more-trigger"]', 'Load More'):
+                if not click_button(LOAD_MORE_XPATH, 'Load More'):
                     self.logger.info("No more 'Load More' buttons found.")
                     break # Exit the loop when 'Load More' is no longer available
             return
@@ -169,6 +265,7 @@ class MovieReviewScraper(BaseScraper):
 
             # Check if the new page height is the same as the previous one
             new_height = self.driver.execute_script("return document.body.scrollHeight")
+            self._submit_loaded_reviews()
             if new_height == last_height:  # Stop if no more content is being loaded
                 self.logger.info("Reached the bottom of the page, all reviews loaded.")
                 break
@@ -184,102 +281,64 @@ class MovieReviewScraper(BaseScraper):
         
         return base_wait_time + additional_wait_time
 
+    def _submit_loaded_reviews(self):
+        """Hand the HTML of the reviews loaded since the last call to the parse pool."""
+        try:
+            html_reviews = self.driver.execute_script(NEW_REVIEWS_SCRIPT, list(REVIEW_SELECTORS), self.submitted_reviews)
+        except Exception as e:
+            self.logger.warning("Could not read the loaded reviews: %s", e)
+            return
+        for start in range(0, len(html_reviews or []), PARSE_CHUNK_SIZE):
+            self.parse_futures.append(submit_parse(html_reviews[start:start + PARSE_CHUNK_SIZE]))
+        self.submitted_reviews += len(html_reviews or [])
+
+    def _collect_reviews(self):
+        """Submit the reviews loaded last, then gather every parsed chunk in page order."""
+        self._submit_loaded_reviews()
+        if not self.parse_futures:
+            self.logger.warning(f"No reviews found for {self.movie_id}.")
+            return self.movie_info, 0
+
+        parsed_reviews = (review for future in self.parse_futures for review in future.result())
+        count = self._add_reviews(parsed_reviews)
+        self.parse_futures = []
+        return self.movie_info, count
+
     def _extract_reviews(self, soup, movie_id, last_date, new_reviews_count):
-        # Attempt to extract reviews using the primary selector
-        reviews = soup.select('article.user-review-item')
+        reviews = select_reviews(soup)
+        if not reviews:  # If no reviews available
+            self.logger.warning(f"No reviews found for {movie_id}.")
+            return self.movie_info, 0  # Return 0 if no reviews found
 
-        # If no reviews found, try to load more reviews
-        if not reviews:  # Attempt to load more reviews
-            reviews = soup.select('div.lister-item.mode-detail.imdb-user-review')
-            if not reviews:  # If still no reviews available
-                self.logger.warning(f"No reviews found for {movie_id}.")
-                return 0  # Return 0 if no reviews found
+        parsed_reviews = (self._parse_review(review, self._button_type(review)) for review in reviews)
+        return self.movie_info, self._add_reviews(parsed_reviews)
 
-        # Parse reviews and add them to the movie_info['Reviews'] list
+    def _add_reviews(self, parsed_reviews):
+        """Add the parsed reviews to movie_info['Reviews'], up to the watermark. Returns how many were added."""
         count = 0
-        for review in reviews:
-            # Determine the button type (all vs. load more) based on the presence of specific elements
-            button_type = "load_more" if review.select_one('span.rating-other-user-rating span') else "all"
-            parsed_review = self._parse_review(review, button_type)
-            
+        for parsed_review in parsed_reviews:
             try:
-                if last_date is not None:
-                    # last_date = datetime.strptime(last_date, "%Y-%m-%d")
-                    # if parsed_review['Date'] <= last_date:
-                    #     break
-                    if count >= new_reviews_count:
-                        break
+                # Reviews are sorted newest first: everything from the watermark on is already stored
+                if self.is_incremental() and self._is_at_or_before_watermark(parsed_review):
+                    break
             except Exception:
                 self.logger.error(f"Error at comparison Date")
             # Append the parsed review to the 'Reviews' list
             self.movie_info['Reviews'].append(parsed_review)
             count += 1
 
-        self.logger.info(f"Processed {count} reviews for Movie ID: {movie_id}.")
-        return self.movie_info, count # Return the number of reviews processed
-    
-    def convert_to_int(self, human_readable):
-        """Convert human-readable numbers to integers."""
-        if 'K' in human_readable:
-            return int(float(human_readable.replace('K', '').strip()) * 1000)
-        elif 'M' in human_readable:
-            return int(float(human_readable.replace('M', '').strip()) * 1000000)
-        else:
-            return int(human_readable.strip())
+        record_reviews_parsed(count)
+        self.logger.info(f"Processed {count} reviews for Movie ID: {self.movie_id}.")
+        return count
 
-    def convert_date_format(self, date_str, button_type):
-        desired_format = "%Y-%m-%d"
+    def _button_type(self, review):
+        return button_type(review)
 
-        if button_type == "load_more":
-            current_format = "%d %B %Y"
-        elif button_type == "all":
-            current_format = "%b %d, %Y"
+    def convert_to_int(self, human_readable):
+        return convert_to_int(human_readable)
 
-        date_object = datetime.strptime(date_str, current_format)
-        return date_object.strftime(desired_format)
+    def convert_date_format(self, date_str, button_type):
+        return convert_date_format(date_str, button_type)
 
     def _parse_review(self, review, button_type):
-        """
-        Extract information from the review based on its type (load_more or all)
-        """
-        # Initialize helpful votes to 0
-        found_helpful = 0
-        not_helpful = 0
-
-        # Parse review based on the button type
-        if button_type == "load_more":
-            review_rating = review.select_one('span.rating-other-user-rating span').get_text(strip=True) if review.select_one('span.rating-other-user-rating span') else 'No rating'
-            # review_summary = review.select_one('a.title').get_text(strip=True) if review.select_one('a.title') else 'No summary'
-            review_summary = review.select_one('a.title').get_text(strip=True) if review.select_one('a.title') else 'No summary'
-            review_text = review.select_one('div.text.show-more__control').get_text(strip=True) if review.select_one('div.text.show-more__control') else 'No content'
-            author_tag = review.select_one('span.display-name-link a').get_text(strip=True) if review.select_one('span.display-name-link a') else 'Unknown Author'
-            review_date = self.convert_date_format(review.select_one('span.review-date').get_text(strip=True), button_type) if review.select_one('span.review-date') else 'No date'
-        else:
-            review_rating = review.select_one('span.ipc-rating-star--rating').get_text(strip=True) if review.select_one('span.ipc-rating-star--rating') else 'No rating'
-            review_summary = review.select_one('h3.ipc-title__text')
-            review_summary = review_summary.get_text(strip=True) if review_summary else 'No summary'
-            review_text = review.select_one('div.ipc-html-content-inner-div').get_text(strip=True) if review.select_one('div.ipc-html-content-inner-div') else 'No content'
-            author_tag = review.select_one('a[data-testid="author-link"]').get_text(strip=True) if review.select_one('a[data-testid="author-link"]') else 'Unknown Author'
-            review_date = self.convert_date_format(review.select_one('li.review-date').get_text(strip=True), button_type) if review.select_one('li.review-date') else 'No date'
-
-        # Extract helpful votes
-        if button_type == "load_more":
-            helpful_text = review.select_one('div.actions.text-muted').get_text(strip=True) if review.select_one('div.actions.text-muted') else ''
-            match = re.search(r'(\d+) out of (\d+) found this helpful', helpful_text)
-            if match:
-                found_helpful = int(match.group(1))
-                not_helpful = int(match.group(2)) - found_helpful
-        else:
-            found_helpful = self.convert_to_int(review.select_one('span.ipc-voting__label__count--up').get_text(strip=True)) if review.select_one('span.ipc-voting__label__count--up') else 0
-            not_helpful = self.convert_to_int(review.select_one('span.ipc-voting__label__count--down').get_text(strip=True)) if review.select_one('span.ipc-voting__label__count--down') else 0
-
-        # Return the review information in the expected format
-        return {
-            'Review Summary': review_summary,
-            'Review': review_text,
-            'Rating': review_rating,
-            'Author': author_tag,
-            'Date': review_date,
-            'Helpful': found_helpful,
-            'Not Helpful': not_helpful
-        }
\ No newline at end of file
+        return parse_review(review, button_type)
@@ -0,0 +1,42 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from .review_parser import parse_review_chunk
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+
+logging.basicConfig(level=logging.INFO)
+
+PARSE_CHUNK_SIZE = 200  # Reviews per parse task
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_parse_pool():
+    """
+    Process pool shared by every scraper of the process, sized to the cores (PARSE_WORKERS).
+    Returns None when PARSE_WORKERS=0, to parse on the calling thread instead.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv('PARSE_WORKERS', os.cpu_count() or 1))
+            if workers <= 0:
+                return None
+            # spawn: forking a process that runs browser threads is not safe
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+def submit_parse(html_chunk):
+    """Parse review HTML in a worker process and return a Future of the review dicts."""
+    pool = get_parse_pool()
+    if pool is not None:
+        try:
+            return pool.submit(parse_review_chunk, html_chunk)
+        except RuntimeError as e:  # Pool broken or shut down
+            logging.warning(f"Parse pool unavailable ({e}), parsing inline.")
+    future = Future()
+    future.set_result(parse_review_chunk(html_chunk))
+    return future
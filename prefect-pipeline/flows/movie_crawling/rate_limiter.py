@@ -0,0 +1,133 @@
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from email.utils import parsedate_to_datetime
+
+logging.basicConfig(level=logging.INFO)
+
+DEFAULT_RATE = 40.0         # Requests per second, below TMDB's upper limit of ~50/s
+MIN_RATE = 1.0
+ADDITIVE_INCREASE = 1.0     # Requests per second gained per second of requests without a 429
+MULTIPLICATIVE_DECREASE = 0.5
+IDLE_RESET = 60.0           # Seconds without requests after which the rate starts again from the maximum
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta seconds or HTTP date), None if missing."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def parse_rate_limit_reset(headers):
+    """Seconds until the rate-limit window resets when the remaining quota is exhausted, else None."""
+    for prefix in ('RateLimit', 'X-RateLimit'):
+        remaining = headers.get(f'{prefix}-Remaining')
+        reset = headers.get(f'{prefix}-Reset')
+        if remaining is None or reset is None:
+            continue
+        try:
+            if int(remaining) > 0:
+                return None
+            reset = float(reset)
+        except ValueError:
+            continue
+        # X-RateLimit-Reset is an epoch timestamp, RateLimit-Reset a delta in seconds
+        return max(0.0, reset - time.time()) if reset > 10 ** 9 else reset
+    return None
+
+class RateLimiter:
+    """
+    Token bucket with AIMD rate adaptation, shared by every thread and process of the worker.
+    The bucket lives in a small state file guarded by flock, so each request takes the lock only briefly.
+    """
+
+    def __init__(self, name, rate=None, min_rate=None, state_dir=None, idle_reset=None):
+        self.max_rate = float(rate or os.getenv('TMDB_RATE_LIMIT', DEFAULT_RATE))
+        self.min_rate = float(min_rate or os.getenv('TMDB_MIN_RATE', MIN_RATE))
+        self.idle_reset = float(idle_reset or os.getenv('TMDB_RATE_IDLE_RESET', IDLE_RESET))
+        state_dir = state_dir or os.getenv('RATE_LIMIT_STATE_DIR', tempfile.gettempdir())
+        os.makedirs(state_dir, exist_ok=True)
+        self.path = os.path.join(state_dir, f'{name}_rate_limit.json')
+
+    def _update(self, func):
+        """Apply func to the shared state under an exclusive lock and return its result."""
+        # A new open file description per call, so flock also serializes threads of this process
+        with open(self.path, 'a+') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                try:
+                    state = json.loads(file.read() or '{}')
+                except ValueError:
+                    state = {}
+                now = time.time()
+                if not state or now - state['updated'] > self.idle_reset:
+                    # The state file outlives runs: a new run does not inherit the rate a previous one slowed down to
+                    state = {'rate': self.max_rate, 'tokens': self.max_rate, 'updated': now,
+                             'blocked_until': state.get('blocked_until', 0.0)}
+                state['rate'] = min(state['rate'], self.max_rate)
+                state['tokens'] = min(state['rate'], state['tokens'] + (now - state['updated']) * state['rate'])
+                state['updated'] = now
+                result = func(state, now)
+                file.seek(0)
+                file.truncate()
+                file.write(json.dumps(state))
+                file.flush()
+                return result
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        def take(state, now):
+            if state['blocked_until'] > now:
+                return state['blocked_until'] - now
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0
+            return (1 - state['tokens']) / state['rate']
+
+        while True:
+            wait = self._update(take)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def on_success(self, headers=None):
+        """Additive increase, and pause everyone when the headers say the quota is used up."""
+        reset = parse_rate_limit_reset(headers or {})
+
+        def increase(state, now):
+            state['rate'] = min(self.max_rate, state['rate'] + ADDITIVE_INCREASE / state['rate'])
+            if reset:
+                state['blocked_until'] = max(state['blocked_until'], now + reset)
+        self._update(increase)
+
+    def on_rate_limited(self, retry_after=None):
+        """Multiplicative decrease, and pause everyone until Retry-After has passed."""
+        def decrease(state, now):
+            # Several in-flight requests get a 429 for the same burst: halve the rate only once per pause
+            if state['blocked_until'] <= now:
+                state['rate'] = max(self.min_rate, state['rate'] * MULTIPLICATIVE_DECREASE)
+            state['tokens'] = 0.0
+            state['blocked_until'] = max(state['blocked_until'], now + (retry_after or 1.0 / state['rate']))
+            return state['rate']
+        rate = self._update(decrease)
+        logging.warning(f"Rate limited, waiting {retry_after or 0:.1f} seconds and slowing down to {rate:.1f} requests/s.")
+
+_limiters = {}
+
+def get_rate_limiter(name='tmdb'):
+    """Rate limiter shared by the threads of this process (and other processes through its state file)."""
+    if name not in _limiters:
+        _limiters[name] = RateLimiter(name)
+    return _limiters[name]
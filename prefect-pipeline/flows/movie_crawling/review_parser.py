@@ -0,0 +1,129 @@
+from bs4 import BeautifulSoup
+from datetime import datetime
+from functools import lru_cache
+import re
+
+# Review items of the current ('all') and the older ('load_more') review page layouts
+REVIEW_SELECTORS = ('article.user-review-item', 'div.lister-item.mode-detail.imdb-user-review')
+
+# Mongo document field -> ReviewRecord attribute
+REVIEW_FIELDS = {
+    'Review Summary': 'summary',
+    'Review': 'text',
+    'Rating': 'rating',
+    'Author': 'author',
+    'Date': 'date',
+    'Helpful': 'helpful',
+    'Not Helpful': 'not_helpful',
+}
+
+class ReviewRecord:
+    """Compact scraped review, turned into the Mongo document format only at write time."""
+    __slots__ = tuple(REVIEW_FIELDS.values())
+
+    def __init__(self, summary, text, rating, author, date, helpful, not_helpful):
+        self.summary = summary
+        self.text = text
+        self.rating = rating
+        self.author = author
+        self.date = date
+        self.helpful = helpful
+        self.not_helpful = not_helpful
+
+    def __getstate__(self):
+        return tuple(getattr(self, attr) for attr in self.__slots__)
+
+    def __setstate__(self, state):
+        for attr, value in zip(self.__slots__, state):
+            setattr(self, attr, value)
+
+    def __eq__(self, other):
+        return isinstance(other, ReviewRecord) and self.__getstate__() == other.__getstate__()
+
+    def get(self, field, default=None):
+        """Read a field by its document name, like the review dicts."""
+        attr = REVIEW_FIELDS.get(field)
+        return getattr(self, attr) if attr else default
+
+    def to_dict(self):
+        return {field: getattr(self, attr) for field, attr in REVIEW_FIELDS.items()}
+
+def review_to_dict(review):
+    """Mongo document format of a review, whether a ReviewRecord or already a dict."""
+    return review.to_dict() if isinstance(review, ReviewRecord) else dict(review)
+
+def button_type(review):
+    """Layout of a review (all vs. load more), based on the presence of specific elements."""
+    return "load_more" if review.select_one('span.rating-other-user-rating span') else "all"
+
+# The same few hundred vote counts and dates repeat across reviews: parse each string once
+@lru_cache(maxsize=4096)
+def convert_to_int(human_readable):
+    """Convert human-readable numbers to integers."""
+    if 'K' in human_readable:
+        return int(float(human_readable.replace('K', '').strip()) * 1000)
+    elif 'M' in human_readable:
+        return int(float(human_readable.replace('M', '').strip()) * 1000000)
+    else:
+        return int(human_readable.strip())
+
+@lru_cache(maxsize=4096)
+def convert_date_format(date_str, button_type):
+    desired_format = "%Y-%m-%d"
+
+    if button_type == "load_more":
+        current_format = "%d %B %Y"
+    elif button_type == "all":
+        current_format = "%b %d, %Y"
+
+    date_object = datetime.strptime(date_str, current_format)
+    return date_object.strftime(desired_format)
+
+def parse_review(review, button_type):
+    """
+    Extract information from the review based on its type (load_more or all)
+    """
+    # Initialize helpful votes to 0
+    found_helpful = 0
+    not_helpful = 0
+
+    # Parse review based on the button type
+    if button_type == "load_more":
+        review_rating = review.select_one('span.rating-other-user-rating span').get_text(strip=True) if review.select_one('span.rating-other-user-rating span') else 'No rating'
+        review_summary = review.select_one('a.title').get_text(strip=True) if review.select_one('a.title') else 'No summary'
+        review_text = review.select_one('div.text.show-more__control').get_text(strip=True) if review.select_one('div.text.show-more__control') else 'No content'
+        author_tag = review.select_one('span.display-name-link a').get_text(strip=True) if review.select_one('span.display-name-link a') else 'Unknown Author'
+        review_date = convert_date_format(review.select_one('span.review-date').get_text(strip=True), button_type) if review.select_one('span.review-date') else 'No date'
+    else:
+        review_rating = review.select_one('span.ipc-rating-star--rating').get_text(strip=True) if review.select_one('span.ipc-rating-star--rating') else 'No rating'
+        review_summary = review.select_one('h3.ipc-title__text')
+        review_summary = review_summary.get_text(strip=True) if review_summary else 'No summary'
+        review_text = review.select_one('div.ipc-html-content-inner-div').get_text(strip=True) if review.select_one('div.ipc-html-content-inner-div') else 'No content'
+        author_tag = review.select_one('a[data-testid="author-link"]').get_text(strip=True) if review.select_one('a[data-testid="author-link"]') else 'Unknown Author'
+        review_date = convert_date_format(review.select_one('li.review-date').get_text(strip=True), button_type) if review.select_one('li.review-date') else 'No date'
+
+    # Extract helpful votes
+    if button_type == "load_more":
+        helpful_text = review.select_one('div.actions.text-muted').get_text(strip=True) if review.select_one('div.actions.text-muted') else ''
+        match = re.search(r'(\d+) out of (\d+) found this helpful', helpful_text)
+        if match:
+            found_helpful = int(match.group(1))
+            not_helpful = int(match.group(2)) - found_helpful
+    else:
+        found_helpful = convert_to_int(review.select_one('span.ipc-voting__label__count--up').get_text(strip=True)) if review.select_one('span.ipc-voting__label__count--up') else 0
+        not_helpful = convert_to_int(review.select_one('span.ipc-voting__label__count--down').get_text(strip=True)) if review.select_one('span.ipc-voting__label__count--down') else 0
+
+    return ReviewRecord(review_summary, review_text, review_rating, author_tag, review_date, found_helpful, not_helpful)
+
+def select_reviews(soup):
+    """Review elements of a page, whichever layout it uses."""
+    for selector in REVIEW_SELECTORS:
+        reviews = soup.select(selector)
+        if reviews:
+            return reviews
+    return []
+
+def parse_review_chunk(html_chunk):
+    """Parse a list of review outerHTML strings into ReviewRecords, in order (runs in a parse worker)."""
+    soup = BeautifulSoup(''.join(html_chunk), 'html.parser')
+    return [parse_review(review, button_type(review)) for review in select_reviews(soup)]
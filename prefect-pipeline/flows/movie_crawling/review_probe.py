@@ -0,0 +1,86 @@
+from .base_scraper import IMDB_BASE_URL, USER_AGENT
+from .review_parser import button_type, parse_review, select_reviews
+from bs4 import BeautifulSoup, SoupStrainer
+import logging
+import os
+import re
+import requests
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+
+REVIEW_PROBE_TTL = float(os.getenv('REVIEW_PROBE_TTL', '3600'))  # Seconds a probed review count is reused
+TOTAL_REVIEWS_RE = re.compile(r'(\d[\d,]*)')
+# The count element of the current layout, found without parsing the whole page
+TOTAL_REVIEWS_ELEMENT_RE = re.compile(r'data-testid="tturv-total-reviews"[^>]*>(.*?)</div>', re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+# The first (newest) review item of the current layout
+FIRST_REVIEW_RE = re.compile(r'<article[^>]*class="[^"]*user-review-item[^"]*".*?</article>', re.S)
+
+_cache = {}
+_cache_lock = threading.Lock()
+_session = threading.local()
+
+def review_url(movie_id, base_url=IMDB_BASE_URL):
+    return f"{base_url}/title/{movie_id}/reviews/?sort=submission_date%2Cdesc&dir=desc"
+
+def parse_total_reviews(html):
+    """Review count of a review page (current or older layout), None if not on the page."""
+    element = TOTAL_REVIEWS_ELEMENT_RE.search(html)
+    if element:
+        text = TAG_RE.sub(' ', element.group(1))
+    else:
+        element = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('div')).select_one('div.header span')
+        text = element.get_text(' ', strip=True) if element else ''
+    match = TOTAL_REVIEWS_RE.search(text)
+    return int(match.group(1).replace(',', '')) if match else None
+
+def parse_newest_review(html):
+    """First review of a review page sorted newest first (a ReviewRecord), None if there is none."""
+    element = FIRST_REVIEW_RE.search(html)
+    fragment = element.group(0) if element else html
+    reviews = select_reviews(BeautifulSoup(fragment, 'html.parser', parse_only=SoupStrainer(['article', 'div'])))
+    return parse_review(reviews[0], button_type(reviews[0])) if reviews else None
+
+def _get_session():
+    """One keep-alive HTTP session per thread."""
+    if not hasattr(_session, 'value'):
+        _session.value = requests.Session()
+        _session.value.headers.update({'User-Agent': USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'})
+    return _session.value
+
+def probe_reviews(movie_id, ttl=None, base_url=IMDB_BASE_URL):
+    """
+    Current review count and newest review of a movie, from one plain HTTP request or from a probe less than
+    ttl seconds ago. Returns (None, None) when the count cannot be read, so the caller falls back to the browser.
+    """
+    ttl = REVIEW_PROBE_TTL if ttl is None else ttl
+    with _cache_lock:
+        cached = _cache.get(movie_id)
+    if cached and time.monotonic() - cached[2] < ttl:
+        return cached[0], cached[1]
+
+    try:
+        response = _get_session().get(review_url(movie_id, base_url), timeout=10)
+        response.raise_for_status()
+        total_reviews = parse_total_reviews(response.text)
+        newest_review = parse_newest_review(response.text) if total_reviews else None
+    except Exception as e:
+        logging.warning(f"Review count probe failed for {movie_id}: {e}")
+        return None, None
+    if total_reviews is None:
+        logging.warning(f"No review count in the review page of {movie_id}.")
+        return None, None
+
+    with _cache_lock:
+        _cache[movie_id] = (total_reviews, newest_review, time.monotonic())
+    return total_reviews, newest_review
+
+def probe_review_count(movie_id, ttl=None, base_url=IMDB_BASE_URL):
+    """Current review count of a movie (see probe_reviews), None when it cannot be read."""
+    return probe_reviews(movie_id, ttl, base_url)[0]
+
+def clear_probe_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -1,34 +1,80 @@
 import requests
 import logging
+import os
+import re
 import time
+from urllib.parse import urlparse, parse_qsl, urlencode
 from .rate_limit_exception import RateLimitException
+from .rate_limiter import get_rate_limiter, parse_retry_after
+from monitoring.metrics import record_http_request, record_http_retry, record_rate_limited
 
 logging.basicConfig(level=logging.INFO)
 
 class TMDBApi:
-    def __init__(self, api_key):
+    def __init__(self, api_key, base_url=None, http_cache=None):
         self.api_key = api_key
-        self.base_url = "https://api.themoviedb.org/3"
+        # Store of ETags for conditional requests (etl.http_cache.MongoHttpCache): get(key) -> {'etag', 'fetched_at'}, set(key, etag)
+        self.http_cache = http_cache
+        # Override to point at a local stand-in server (see bench/mock_tmdb.py)
+        self.base_url = (base_url or os.getenv('TMDB_BASE_URL') or "https://api.themoviedb.org/3").rstrip('/')
         self.timeout = 10
+        self.max_attempts = int(os.getenv('TMDB_MAX_ATTEMPTS', '6'))
+        self.rate_limiter = get_rate_limiter('tmdb')
 
-    def _make_request(self, url):
-        """Helper method to send GET requests and handle rate limiting and errors."""
-        for attempt in range(3):  # Retry up to 3 times
+    def _endpoint(self, url):
+        """Metric label of a request URL, e.g. /movie/{id}/credits."""
+        path = urlparse(url).path[len(urlparse(self.base_url).path):]
+        return re.sub(r'/(tt)?\d+', '/{id}', path)
+
+    def _cache_key(self, url):
+        """URL without the API key, e.g. /movie/550?language=en-US."""
+        parsed = urlparse(url)
+        query = urlencode([(key, value) for key, value in parse_qsl(parsed.query) if key != 'api_key'])
+        return parsed.path[len(urlparse(self.base_url).path):] + (f'?{query}' if query else '')
+
+    def _make_request(self, url, if_changed=False):
+        """
+        Helper method to send GET requests through the shared rate limiter and handle errors.
+        With if_changed, the request is conditional on the cached ETag and returns None when nothing changed.
+        """
+        endpoint = self._endpoint(url)
+        rate_limited = False
+        headers = {}
+        cached = None
+        if if_changed and self.http_cache is not None:
+            cached = self.http_cache.get(self._cache_key(url))
+            if cached and cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+        for attempt in range(self.max_attempts):
+            if attempt:
+                record_http_retry(endpoint)
+            self.rate_limiter.acquire()
             try:
-                response = requests.get(url, timeout=self.timeout)
+                response = requests.get(url, headers=headers, timeout=self.timeout)
+                record_http_request(endpoint, response.status_code)
                 response.raise_for_status()
-                return response.json()
+                self.rate_limiter.on_success(response.headers)
+                if response.status_code == 304:
+                    return None
+                body = response.json()
+                if if_changed and self.http_cache is not None and response.headers.get('ETag'):
+                    self.http_cache.set(self._cache_key(url), response.headers['ETag'])
+                return body
             except requests.exceptions.HTTPError as e:
-                if e.response.status_code == 429:
-                    wait_time = 2 ** attempt  # Exponential backoff
-                    logging.warning(f"Rate limit exceeded. Waiting {wait_time} seconds...")
-                    time.sleep(wait_time)
-                elif e.response.status_code in {500, 503}:
+                rate_limited = e.response.status_code == 429
+                if rate_limited:
+                    record_rate_limited(endpoint)
+                    # The limiter pauses every worker until Retry-After, the next acquire() waits for it
+                    retry_after = parse_retry_after(e.response.headers.get('Retry-After'))
+                    self.rate_limiter.on_rate_limited(retry_after or 2 ** attempt)
+                elif e.response.status_code in {500, 502, 503, 504}:
                     logging.error(f"Server error {e.response.status_code}. Retrying...")
-                    time.sleep(2)
+                    time.sleep(min(2 ** attempt, 30))
                 else:
                     logging.error(f"HTTP error: {e}")
                     raise e
+        if rate_limited:
+            raise RateLimitException(f"Rate limit still exceeded after {self.max_attempts} attempts: {endpoint}")
         raise Exception(f"Failed to fetch data after multiple attempts: {url}")
 
     def get_movie_genres(self):
@@ -47,20 +93,31 @@ class TMDBApi:
         else:
             return None  # Return None if no movie found
 
-    def get_movie_details(self, tmdb_id):
-        """Get the movie details."""
+    def get_movie_details(self, tmdb_id, if_changed=False):
+        """Get the movie details (None if if_changed and they did not change since the cached response)."""
         url = f"{self.base_url}/movie/{tmdb_id}?api_key={self.api_key}&language=en-US"
-        return self._make_request(url)
+        return self._make_request(url, if_changed)
 
     def get_cast_and_crew(self, tmdb_id):
         """Get the cast and crew of a movie."""
         url = f"{self.base_url}/movie/{tmdb_id}/credits?api_key={self.api_key}"
         return self._make_request(url)
 
-    def get_person_details(self, person_id):
-        """Get the details of a person."""
+    def get_person_details(self, person_id, if_changed=False):
+        """Get the details of a person (None if if_changed and they did not change since the cached response)."""
         url = f"{self.base_url}/person/{person_id}?api_key={self.api_key}&language=en-US"
-        return self._make_request(url)
+        return self._make_request(url, if_changed)
+
+    def get_changed_ids(self, kind, start_date, end_date):
+        """Get the ids of the movies or people ('movie' or 'person') changed between two dates (at most 14 days apart)."""
+        ids, page, total_pages = set(), 1, 1
+        while page <= total_pages:
+            url = f"{self.base_url}/{kind}/changes?api_key={self.api_key}&start_date={start_date}&end_date={end_date}&page={page}"
+            response = self._make_request(url)
+            ids.update(result['id'] for result in response.get('results', []) if not result.get('adult'))
+            total_pages = response.get('total_pages', 1)
+            page += 1
+        return ids
 
     def get_actor_details(self, cast):
         """Get the details of all actors in the cast."""
@@ -1,36 +1,96 @@
+import atexit
+import hashlib
+import json
 import logging
 import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
-def setup_reviews_logger(movie_id):
-    # Initialize logs/reviews_log folder
-    os.makedirs('logs/reviews_log', exist_ok=True)
-    
-    # Initialize logger base in movie_id
-    logger = logging.getLogger(movie_id)
-    logger.setLevel(logging.INFO)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(50 * 2 ** 20)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+BLOCKING_LEVEL = logging.WARNING  # Records at this level or above wait briefly for room instead of being dropped
 
-    # check if logger is already have handler to avoid adding many times
-    if not logger.handlers:
-        # create file handler for each movie_id
-        file_handler = logging.FileHandler(f'logs/reviews_log/{movie_id}.log')
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the movie id as a field (tracebacks are already in the message)."""
 
-    return logger
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'movie_id': getattr(record, 'movie_id', None),
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'dropped', None):
+            entry['dropped'] = record.dropped
+        return json.dumps(entry, ensure_ascii=False)
 
-def setup_movies_scraper_logger():
-    # Initialize logs/movies_log folder
-    os.makedirs('logs/movies_log', exist_ok=True)
+class DroppingQueueHandler(QueueHandler):
+    """
+    Enqueue records for the listener thread without ever blocking the scrapers for long.
+    When the queue is full, records below WARNING are dropped; the count is reported on the next record written.
+    """
 
-    # Initialize logger for movies scraper
-    logger = logging.getLogger('movies_scraper')
-    logger.setLevel(logging.INFO)
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, record):
+        # The listener may format the record as soon as it is queued: set the count first
+        with self._lock:
+            record.dropped, self.dropped = self.dropped, 0
+        try:
+            if record.levelno >= BLOCKING_LEVEL:
+                self.queue.put(record, timeout=0.1)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self.dropped += record.dropped + 1
+
+_listener = None
+_queue_handler = None
+_setup_lock = threading.Lock()
 
+def _get_queue_handler():
+    """Start the single log sink (logs/scraper.jsonl, rotated) and its listener thread once per process."""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _queue_handler is None:
+            log_dir = os.getenv('LOG_DIR', 'logs')
+            os.makedirs(log_dir, exist_ok=True)
+            file_handler = RotatingFileHandler(os.path.join(log_dir, 'scraper.jsonl'), maxBytes=LOG_MAX_BYTES,
+                                               backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+            file_handler.setFormatter(JsonFormatter())
+
+            log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+            _listener = QueueListener(log_queue, file_handler)
+            _listener.start()
+            atexit.register(_listener.stop)  # Flush the queue on exit
+            _queue_handler = DroppingQueueHandler(log_queue)
+    return _queue_handler
+
+def get_scraper_logger(name):
+    """Logger of a scraper component, writing asynchronously to the shared sink."""
+    logger = logging.getLogger(f'movie_crawling.{name}')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False  # Only the shared sink, not the root handlers as well
     if not logger.handlers:
-        file_handler = logging.FileHandler('logs/movies_log/movies_scraper.log')
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        logger.addHandler(_get_queue_handler())
+    return logger
+
+def setup_reviews_logger(movie_id):
+    # One shared logger for all movies, the movie id goes into every record
+    return logging.LoggerAdapter(get_scraper_logger('reviews'), {'movie_id': movie_id})
+
+def setup_movies_scraper_logger():
+    return get_scraper_logger('movies')
 
-    return logger
\ No newline at end of file
+def review_hash(movie_id, review):
+    """Stable content hash of a review, used as its key within the movie."""
+    content = '\x1f'.join(str(review.get(field) or '') for field in ('Author', 'Date', 'Review Summary', 'Review'))
+    return hashlib.sha1(f'{movie_id}\x1f{content}'.encode('utf-8')).hexdigest()